@@ -0,0 +1,134 @@
+import argparse
+import csv
+import json
+import sys
+from collections import OrderedDict
+
+from queries import DISPLAY_COLUMNS, load_state, query_products
+
+OUTPUT_FORMATS = ['csv', 'jsonl']
+
+# Most recently used answers kept to answer repeated queries
+MAX_ANSWERS = 1024
+
+
+def parse_query(line):
+    """
+    Parses one query line.
+
+    A query is a JSON object such as
+    `{"view": "machine", "name": "Bakery", "sort": "profit_per_minute", "limit": 5}`.
+    Only `view` is required. `transitive` includes products using an ingredient anywhere 
+    in their recipe chain, and `format` optionally overrides the output format.
+
+    Args:
+        line (str): JSON-encoded query.
+
+    Returns:
+        dict: The parsed query.
+
+    Raises:
+        ValueError: If the line is not a JSON object, has unknown fields, or a field
+            of the wrong type.
+    """
+    query = json.loads(line)
+
+    if not isinstance(query, dict):
+        raise ValueError("Query must be a JSON object")
+
+    if unknown_fields := set(query) - {'view', 'name', 'sort', 'limit', 'transitive', 'format'}:
+        raise ValueError(f"Unknown query fields: {', '.join(sorted(unknown_fields))}")
+
+    if wrong_types := [field for field in ('view', 'name', 'sort')
+                       if field in query and not isinstance(query[field], str)]:
+        raise ValueError(f"Query fields must be strings: {', '.join(wrong_types)}")
+
+    if 'limit' in query and (not isinstance(query['limit'], int) or isinstance(query['limit'], bool)):
+        raise ValueError(f"Limit must be an integer, got {query['limit']!r}")
+
+    if query.get('format', OUTPUT_FORMATS[0]) not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format '{query['format']}'. Expected one of: {', '.join(OUTPUT_FORMATS)}")
+
+    return query
+
+
+def run_batch(query_lines, output, default_format='csv', config_file="config.yaml", errors=sys.stderr):
+    """
+    Answers a stream of queries against data preprocessed only once.
+
+    Results are written to `output` as soon as each query is answered. Every result
+    row starts with the number of its query (the line number in the input), so the
+    results of several queries can be told apart. The answers of the `MAX_ANSWERS` most 
+    recently used queries are kept, so repeated queries are only answered once. Invalid 
+    queries are reported on `errors` and skipped.
+
+    Args:
+        query_lines (Iterable[str]): JSON query lines. Blank lines are ignored.
+        output (TextIO): Stream the results are written to.
+        default_format (str): Either 'csv' or 'jsonl', used when a query has no `format`.
+        config_file (str): Path to the YAML configuration file.
+        errors (TextIO): Stream invalid queries are reported to.
+
+    Returns:
+        int: Number of invalid queries.
+    """
+    state = load_state(config_file)
+    csv_writer = csv.writer(output, lineterminator='\n')
+    csv_header_written = False
+    failures = 0
+
+    # Repeated queries are answered from the most recently used answers
+    answered = OrderedDict()
+
+    for line_number, line in enumerate(query_lines, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            query = parse_query(line)
+            query_key = (query.get('view'), query.get('name'), query.get('sort', 'profit_per_minute'),
+                         query.get('limit'), bool(query.get('transitive', False)))
+            if (records := answered.get(query_key)) is not None:
+                answered.move_to_end(query_key)
+            else:
+                products = query_products(state, *query_key)
+                records = answered[query_key] = json.loads(products.to_json(orient='records'))
+                if len(answered) > MAX_ANSWERS:
+                    answered.popitem(last=False)
+        except (ValueError, TypeError) as error:
+            print(f"Query {line_number}: {error}", file=errors)
+            failures += 1
+            continue
+
+        if query.get('format', default_format) == 'jsonl':
+            for record in records:
+                output.write(json.dumps({'query': line_number, **record}) + '\n')
+        else:
+            if not csv_header_written:
+                csv_writer.writerow(['query'] + DISPLAY_COLUMNS)
+                csv_header_written = True
+            csv_writer.writerows([line_number, *record.values()] for record in records)
+
+        output.flush()
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer a batch of Hay Day product queries (one JSON object per line) non-interactively."
+    )
+    parser.add_argument('queries', nargs='?', type=argparse.FileType('r'), default=sys.stdin,
+                        help="File of queries. Reads standard input if omitted.")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                        help="Default output format of the results.")
+    parser.add_argument('--config', default='config.yaml', help="Path to the YAML configuration file.")
+    args = parser.parse_args()
+
+    failures = run_batch(args.queries, sys.stdout, args.format, args.config)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,649 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from compact import build_compact_model, compact_tables, frame_memory_usage, load_memory_usage, model_memory_usage
+from ingredient import build_ingredient_index, sort_ingredient_products
+from machine import get_available_machines, sort_machine_products
+from instrumentation import PROFILE_ENV, PROFILE_OUTPUT_ENV
+from preprocessing import load_config, load_data, calculate_production_cost, convert_time, run_preprocessing
+from ranking import build_rankings, top_products
+from synthetic import generate_catalogue, write_catalogue
+
+# Time formats accepted by `convert_time`, with their synthetic value generators
+TIME_FORMATS = [
+    lambda rng: f"{rng.integers(1, 5)}d {rng.integers(0, 24)}h",
+    lambda rng: f"{rng.integers(1, 24)}h {rng.integers(1, 60)}min",
+    lambda rng: f"{rng.integers(1, 5)}d",
+    lambda rng: f"{rng.integers(1, 24)} h",
+    lambda rng: f"{rng.integers(1, 60)} min",
+    lambda rng: "Instant",
+]
+
+# Default files the synthetic benchmark results are appended to and compared with
+HISTORY_FILE = os.path.join('benchmarks', 'history.jsonl')
+BASELINE_FILE = os.path.join('benchmarks', 'baseline.json')
+
+# Slowdowns below this many seconds are timer noise, not regressions
+REGRESSION_MARGIN = 0.005
+
+# Cost modes of the pipeline benchmark, by the value of the 'true_cost' config flag
+PIPELINE_MODES = {'market': False, 'true_cost': True}
+
+# Runs the stages of `run_preprocessing` on a config file (argv[1]) with the given
+# 'true_cost' flag (argv[2])
+PIPELINE_SCRIPT = """
+import sys
+from preprocessing import convert_time, load_config, load_data, process_items
+config = {**load_config(sys.argv[1]), 'true_cost': sys.argv[2] == 'True'}
+items_df, recipes_df, plants_df = load_data(config)
+process_items(convert_time(items_df), recipes_df, plants_df, config)
+"""
+
+BENCHMARKS = ['production_cost', 'convert_time', 'pipeline', 'queries', 'memory', 'startup']
+
+# Benchmarks run when none is named
+DEFAULT_BENCHMARKS = ['production_cost', 'convert_time']
+
+# Sort key of the query benchmarks
+QUERY_SORT_KEY = 'profit_per_minute'
+
+# Modules whose import time is reported by the startup benchmark
+STARTUP_MODULES = ['main', 'snapshot', 'machine', 'ingredient', 'queries']
+
+# Modules of the fast startup path, held to the startup budget once their bytecode is cached
+FAST_STARTUP_MODULES = ['main', 'snapshot']
+
+
+def scale_catalogue(items_df, recipes_df, scale):
+    """
+    Builds a larger catalogue by repeating the items and recipes `scale` times.
+
+    Every copy gets its own suffix (e.g. "Bread #2") so that products, ingredients
+    and item names stay unique, and the recipes of a copy only reference items of
+    the same copy. The result has the compact column types of `load_data`.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name'.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        scale (int): Number of copies of the catalogue to generate.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Scaled items and recipes DataFrames.
+    """
+    scaled_items = []
+    scaled_recipes = []
+
+    for copy in range(scale):
+        suffix = f" #{copy}"
+
+        items_copy = items_df.copy()
+        items_copy['name'] = items_copy['name'].astype(str) + suffix
+        scaled_items.append(items_copy)
+
+        recipes_copy = recipes_df.copy()
+        recipes_copy['product'] = recipes_copy['product'].astype(str) + suffix
+        recipes_copy['ingredient'] = recipes_copy['ingredient'].astype(str) + suffix
+        scaled_recipes.append(recipes_copy)
+
+    items_df, recipes_df, _ = compact_tables(pd.concat(scaled_items, ignore_index=True),
+                                             pd.concat(scaled_recipes, ignore_index=True),
+                                             pd.DataFrame({'fruit': pd.Series(dtype=object)}))
+
+    return items_df, recipes_df
+
+
+def nested_scan_production_cost(items_df, recipes_df):
+    """
+    Reference implementation of the production cost that scans `items_df` for every
+    recipe row. Kept only to benchmark and cross-check `calculate_production_cost`.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name' and 'cost'.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+
+    Returns:
+        pd.DataFrame: Updated `items_df` with an additional 'production_cost' column.
+    """
+    product_costs = {}
+
+    for product in recipes_df['product'].unique():
+        product_recipe = recipes_df[recipes_df['product'] == product]
+        total_cost = 0
+
+        for _, row in product_recipe.iterrows():
+
+            if not any(items_df['name'] == row['ingredient']):
+                raise ValueError(f"Ingredient '{row['ingredient']}' in recipes_df is missing from items_df")
+
+            ingredient_cost = items_df.loc[items_df['name'] == row['ingredient'], 'cost'].values[0]
+            total_cost += ingredient_cost * row['quantity']
+
+        product_costs[product] = total_cost
+
+    items_df['production_cost'] = items_df['name'].astype(object).map(product_costs)
+
+    return items_df
+
+
+def row_scan_convert_time(items_df):
+    """
+    Reference implementation of `convert_time` that parses and writes back one row
+    at a time. Kept only to benchmark and cross-check `convert_time`.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing a 'time' column.
+
+    Returns:
+        pd.DataFrame: Updated DataFrame with 'time' converted to minutes.
+    """
+    for index, row in items_df.iterrows():
+        value = row['time']
+
+        if 'd' in value and 'h' in value:
+            days = int(value.split('d')[0].strip())
+            hours = int(value.split('d')[1].split('h')[0].strip())
+            items_df.at[index, 'time'] = (days * 24 + hours) * 60
+        elif 'h' in value and 'min' in value:
+            hours = int(value.split('h')[0].strip())
+            minutes = int(value.split('h')[1].split('min')[0].strip())
+            items_df.at[index, 'time'] = hours * 60 + minutes
+        elif 'd' in value:
+            days = int(value.split('d')[0].strip())
+            items_df.at[index, 'time'] = days * 24 * 60
+        elif 'h' in value:
+            hours = int(value.split('h')[0].strip())
+            items_df.at[index, 'time'] = hours * 60
+        elif 'min' in value:
+            minutes = int(value.split('min')[0].strip())
+            items_df.at[index, 'time'] = minutes
+        elif 'Instant' in value:
+            items_df.at[index, 'time'] = 0
+        else:
+            raise ValueError(f"Unrecognized time format: {value}")
+
+    items_df['time'] = items_df['time'].round(0)
+
+    return items_df
+
+
+def generate_time_column(rows, seed=0):
+    """
+    Generates a DataFrame with a synthetic 'time' column covering every supported format.
+
+    A pool of distinct values is drawn first and then sampled, which keeps generating
+    a million rows fast.
+
+    Args:
+        rows (int): Number of rows to generate.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: DataFrame with a single 'time' column of strings.
+    """
+    rng = np.random.default_rng(seed)
+    pool = np.array([TIME_FORMATS[i % len(TIME_FORMATS)](rng) for i in range(5000)], dtype=object)
+
+    return pd.DataFrame({'time': pool[rng.integers(0, len(pool), rows)]})
+
+
+def time_call(func, *args, repeat=1):
+    """
+    Times a function call and returns the best wall time over `repeat` runs.
+
+    Args:
+        func (Callable): Function to time.
+        *args: Arguments passed to `func`. DataFrames are copied before every run.
+        repeat (int): Number of runs.
+
+    Returns:
+        tuple[float, Any]: Best wall time in seconds and the result of the last run.
+    """
+    best = float('inf')
+    result = None
+
+    for _ in range(repeat):
+        call_args = [arg.copy() if isinstance(arg, pd.DataFrame) else arg for arg in args]
+        start = time.perf_counter()
+        result = func(*call_args)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def benchmark_production_cost(config, scale, repeat=3, include_reference=True):
+    """
+    Benchmarks `calculate_production_cost` on a catalogue scaled up `scale` times.
+
+    The nested-scan reference implementation is timed as well (once, since it is
+    slow) and both `production_cost` columns are checked to be identical.
+
+    Args:
+        config (dict): Configuration dictionary containing file paths.
+        scale (int): Number of copies of the catalogue to benchmark on.
+        repeat (int): Number of runs for the indexed engine.
+        include_reference (bool): Whether to time the nested-scan reference too.
+
+    Returns:
+        dict: Catalogue size and timings in seconds.
+    """
+    items_df, recipes_df, _ = load_data(config)
+    items_df, recipes_df = scale_catalogue(items_df, recipes_df, scale)
+
+    results = {'items': len(items_df), 'recipe_rows': len(recipes_df)}
+
+    results['indexed_s'], indexed = time_call(calculate_production_cost, items_df, recipes_df, repeat=repeat)
+
+    if include_reference:
+        results['nested_scan_s'], reference = time_call(nested_scan_production_cost, items_df, recipes_df)
+        pd.testing.assert_series_equal(indexed['production_cost'], reference['production_cost'])
+
+    return results
+
+
+def benchmark_convert_time(rows, repeat=3, include_reference=True):
+    """
+    Benchmarks `convert_time` on a synthetic column of `rows` time values.
+
+    The row-by-row reference implementation is timed as well (once, since it is
+    slow) and both results are checked to be equal.
+
+    Args:
+        rows (int): Number of synthetic time values.
+        repeat (int): Number of runs for the vectorized parser.
+        include_reference (bool): Whether to time the row-by-row reference too.
+
+    Returns:
+        dict: Row count and timings in seconds.
+    """
+    items_df = generate_time_column(rows)
+
+    results = {'rows': rows}
+
+    results['vectorized_s'], vectorized = time_call(convert_time, items_df, repeat=repeat)
+
+    if include_reference:
+        results['row_scan_s'], reference = time_call(row_scan_convert_time, items_df)
+        np.testing.assert_array_equal(vectorized['time'].to_numpy(), reference['time'].to_numpy(dtype='int64'))
+
+    return results
+
+
+def time_pipeline(config_file):
+    """
+    Times every stage of the preprocessing pipeline, with market and true ingredient costs.
+
+    For each mode of `PIPELINE_MODES`, the pipeline runs in a fresh interpreter with
+    `HAYDAY_PROFILE=time`, so the stages are timed by their own `instrumentation.stage`
+    records, without memory tracing. A stage called several times is timed in total.
+    `run_preprocessing` is then timed once more end to end, uninstrumented, in this
+    process.
+
+    Args:
+        config_file (str): Path to the YAML configuration file of the catalogue.
+
+    Returns:
+        tuple: A tuple containing:
+            - timings (dict[str, float]): Wall time of each stage in seconds, keyed
+              '<mode>.<stage>', and of 'run_preprocessing'.
+            - config (dict): The loaded configuration.
+            - items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+            - recipes_df (pd.DataFrame): DataFrame containing recipe details.
+    """
+    timings = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        profile_file = os.path.join(directory, 'profile.json')
+        env = {**os.environ, 'PYTHONPATH': os.path.dirname(os.path.abspath(__file__)),
+               PROFILE_ENV: 'time', PROFILE_OUTPUT_ENV: profile_file}
+
+        for mode, true_cost in PIPELINE_MODES.items():
+            subprocess.run([sys.executable, '-c', PIPELINE_SCRIPT, config_file, str(true_cost)],
+                           env=env, capture_output=True, check=True)
+            with open(profile_file) as file:
+                for record in json.load(file):
+                    name = f"{mode}.{record['stage']}"
+                    timings[name] = timings.get(name, 0.0) + record['wall_time']
+
+    timings['run_preprocessing'], (config, items_df, recipes_df, _) = time_call(run_preprocessing, config_file)
+
+    return timings, config, items_df, recipes_df
+
+
+def time_queries(config, items_df, recipes_df, repeat=3):
+    """
+    Times the query paths of `machine.py` and `ingredient.py` on a preprocessed catalogue.
+
+    The machine queries use the first available machine, and the ingredient queries
+    the ingredient with the most direct consumers.
+
+    Args:
+        config (dict): Configuration containing settings like which machines to ignore.
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        recipes_df (pd.DataFrame): DataFrame containing recipe details.
+        repeat (int): Number of runs of each query; the best time is kept.
+
+    Returns:
+        dict[str, float]: Best wall time of each query in seconds.
+    """
+    timings = {}
+    machine = get_available_machines(config, items_df)[0]
+
+    timings['sort_machine_products'], _ = time_call(
+        sort_machine_products, config, items_df, machine, QUERY_SORT_KEY, repeat=repeat)
+    timings['sort_machine_products_all'], _ = time_call(
+        sort_machine_products, config, items_df, None, QUERY_SORT_KEY, repeat=repeat)
+    timings['sort_machine_products_all_top10'], _ = time_call(
+        sort_machine_products, config, items_df, None, QUERY_SORT_KEY, 10, repeat=repeat)
+
+    timings['build_rankings'], rankings = time_call(build_rankings, config, items_df, [QUERY_SORT_KEY])
+    timings['top_products'], _ = time_call(
+        top_products, items_df, rankings, machine, QUERY_SORT_KEY, 10, repeat=repeat)
+
+    timings['build_ingredient_index'], index = time_call(
+        build_ingredient_index, recipes_df, items_df, config.get('animal_feed', {}))
+    ingredient = max(index['ingredients'], key=lambda name: len(index['consumers'][name]))
+    timings['sort_ingredient_products'], _ = time_call(
+        sort_ingredient_products, items_df, index, ingredient, QUERY_SORT_KEY, repeat=repeat)
+    timings['sort_ingredient_products_transitive'], _ = time_call(
+        sort_ingredient_products, items_df, index, ingredient, QUERY_SORT_KEY, True, repeat=repeat)
+
+    return timings
+
+
+def benchmark_synthetic(items, layers, benchmarks, seed=0):
+    """
+    Benchmarks the pipeline and the queries on a generated catalogue.
+
+    The catalogue is written to a temporary directory, so that loading the CSV files
+    is part of the pipeline timings, and removed afterwards.
+
+    Args:
+        items (int): Approximate number of items of the catalogue.
+        layers (int): Number of product layers of the recipe graph.
+        benchmarks (Iterable[str]): Any of 'pipeline', 'queries' and 'memory'.
+        seed (int): Seed of the catalogue generator.
+
+    Returns:
+        dict: Catalogue size and the timings in seconds, keyed 'pipeline.<stage>',
+        'queries.<query>' and 'memory.build_compact_model'. With 'memory', also the
+        bytes held by the CSV files read as plain tables and by the loaded compact
+        tables, and by the preprocessed DataFrames and their compact model.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = write_catalogue(directory, *generate_catalogue(items, layers, seed))
+        pipeline_timings, config, items_df, recipes_df = time_pipeline(config_file)
+        if 'memory' in benchmarks:
+            load_memory = load_memory_usage(config)
+
+    timings = {}
+    if 'pipeline' in benchmarks:
+        timings.update({f"pipeline.{name}": seconds for name, seconds in pipeline_timings.items()})
+    if 'queries' in benchmarks:
+        timings.update({f"queries.{name}": seconds
+                        for name, seconds in time_queries(config, items_df, recipes_df).items()})
+
+    results = {'benchmark': 'synthetic', 'items': len(items_df), 'recipe_rows': len(recipes_df), 'layers': layers,
+               'timings': timings}
+
+    if 'memory' in benchmarks:
+        timings['memory.build_compact_model'], model = time_call(build_compact_model, items_df, recipes_df)
+        results['memory'] = {**load_memory,
+                             'frames_bytes': frame_memory_usage(items_df, recipes_df),
+                             'compact_bytes': model_memory_usage(model)}
+
+    return results
+
+
+def measure_import_time(module, pycache_prefix):
+    """
+    Imports a module in a fresh interpreter and returns how long the import took.
+
+    The time is read from `python -X importtime`, so interpreter startup is left out.
+    Bytecode is read from and written to `pycache_prefix`: an empty directory gives
+    the cold time, when every module is compiled from source, and a directory filled
+    by a previous import gives the warm time.
+
+    Args:
+        module (str): Name of a module of `src`.
+        pycache_prefix (str): Directory of the bytecode cache.
+
+    Returns:
+        float: Import time in seconds, nested imports included.
+    """
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+    env.update(PYTHONPATH=source_dir, PYTHONPYCACHEPREFIX=pycache_prefix)
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                               env=env, capture_output=True, text=True, check=True)
+
+    # Lines read "import time: self [us] | cumulative | name", nested imports indented
+    for line in completed.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].rstrip() == f" {module}":
+            return int(fields[1]) / 1e6
+
+    raise ValueError(f"No import time reported for module '{module}'")
+
+
+def benchmark_startup(modules=STARTUP_MODULES, repeat=5):
+    """
+    Measures the cold and warm import time of each module.
+
+    Args:
+        modules (Iterable[str]): Names of modules of `src`.
+        repeat (int): Number of warm imports; the best time is kept.
+
+    Returns:
+        dict: Timings in seconds, keyed 'startup.<module>.cold' and 'startup.<module>.warm'.
+    """
+    timings = {}
+
+    for module in modules:
+        with tempfile.TemporaryDirectory() as pycache_prefix:
+            timings[f"startup.{module}.cold"] = measure_import_time(module, pycache_prefix)
+            timings[f"startup.{module}.warm"] = min(measure_import_time(module, pycache_prefix)
+                                                    for _ in range(repeat))
+
+    return {'benchmark': 'startup', 'timings': timings}
+
+
+def baseline_key(results):
+    """
+    Returns the key of a benchmark run in the baseline file, e.g. "10000x6" for a
+    synthetic catalogue or "startup".
+    """
+    if results['benchmark'] == 'startup':
+        return 'startup'
+
+    return f"{results['items']}x{results['layers']}"
+
+
+def append_history(path, results):
+    """
+    Appends a benchmark run to the history file, one JSON object per line.
+
+    Args:
+        path (str): Path of the history file. Its directory is created if missing.
+        results (dict): Results from `benchmark_synthetic` or `benchmark_startup`.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    with open(path, 'a') as file:
+        file.write(json.dumps({'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'), **results}) + '\n')
+
+
+def load_baselines(path):
+    """
+    Loads the stored baselines, or an empty dictionary if there are none yet.
+
+    Args:
+        path (str): Path of the baseline file.
+
+    Returns:
+        dict[str, dict[str, float]]: Timings of each run, keyed by `baseline_key`.
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_baselines(path, baselines):
+    """
+    Writes the baselines to a JSON file.
+
+    Args:
+        path (str): Path of the baseline file. Its directory is created if missing.
+        baselines (dict[str, dict[str, float]]): Timings of each run, keyed by `baseline_key`.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    with open(path, 'w') as file:
+        json.dump(baselines, file, indent=2, sort_keys=True)
+
+
+def find_regressions(timings, baseline, tolerance, margin=REGRESSION_MARGIN):
+    """
+    Compares timings with a baseline and returns the ones that got slower.
+
+    A timing regresses when it exceeds its baseline by more than `tolerance` (relative)
+    and by more than `margin` seconds, so that tiny timings do not trip on noise.
+    Timings without a baseline are skipped.
+
+    Args:
+        timings (dict[str, float]): Timings of the current run, in seconds.
+        baseline (dict[str, float]): Stored timings of the same run.
+        tolerance (float): Allowed relative slowdown, e.g. 0.25 for 25%.
+        margin (float): Allowed absolute slowdown in seconds.
+
+    Returns:
+        list[tuple[str, float, float]]: Name, baseline and current time of every regression.
+    """
+    return [
+        (name, baseline[name], seconds) for name, seconds in timings.items()
+        if name in baseline and seconds > baseline[name] * (1 + tolerance) and seconds - baseline[name] > margin
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Hay Day preprocessing pipeline.")
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help=f"Benchmarks to run, among {', '.join(BENCHMARKS)} "
+                             f"(default: {' '.join(DEFAULT_BENCHMARKS)}).")
+    parser.add_argument('--config', default='config.yaml', help="Path to the YAML configuration file.")
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 5, 10],
+                        help="Catalogue scale factors for the production cost benchmark.")
+    parser.add_argument('--time-rows', type=int, nargs='+', default=[1_000_000],
+                        help="Synthetic row counts for the time parsing benchmark.")
+    parser.add_argument('--skip-reference', action='store_true',
+                        help="Do not time the slow reference implementations.")
+    parser.add_argument('--items', type=int, nargs='+', default=[10_000, 100_000],
+                        help="Synthetic catalogue sizes for the pipeline, query and memory benchmarks.")
+    parser.add_argument('--layers', type=int, default=6, help="Depth of the synthetic recipe graph.")
+    parser.add_argument('--startup-budget', type=float, default=0.05,
+                        help="Warm import time in seconds allowed for the fast startup path.")
+    parser.add_argument('--history', default=HISTORY_FILE,
+                        help="File the synthetic and startup results are appended to.")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="File of the stored baseline timings.")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store the synthetic and startup results as the new baselines instead of comparing.")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Relative slowdown over the baseline flagged as a regression.")
+    args = parser.parse_args()
+    # Checked here rather than with `choices`, which rejects an empty list of benchmarks
+    if unknown_benchmarks := [name for name in args.benchmarks if name not in BENCHMARKS]:
+        parser.error(f"unknown benchmarks: {', '.join(unknown_benchmarks)}")
+    args.benchmarks = args.benchmarks or DEFAULT_BENCHMARKS
+
+    if 'production_cost' in args.benchmarks:
+        config = load_config(args.config)
+
+        print(f"{'scale':>6} {'items':>8} {'recipes':>8} {'indexed (s)':>12} {'nested scan (s)':>16}")
+        for scale in args.scale:
+            results = benchmark_production_cost(config, scale, include_reference=not args.skip_reference)
+            nested = f"{results['nested_scan_s']:.4f}" if 'nested_scan_s' in results else '-'
+            print(f"{scale:>6} {results['items']:>8} {results['recipe_rows']:>8} "
+                  f"{results['indexed_s']:>12.4f} {nested:>16}")
+
+    if 'convert_time' in args.benchmarks:
+        print(f"\n{'rows':>10} {'vectorized (s)':>15} {'row scan (s)':>13}")
+        for rows in args.time_rows:
+            results = benchmark_convert_time(rows, include_reference=not args.skip_reference)
+            row_scan = f"{results['row_scan_s']:.4f}" if 'row_scan_s' in results else '-'
+            print(f"{rows:>10} {results['vectorized_s']:>15.4f} {row_scan:>13}")
+
+    synthetic_benchmarks = [name for name in args.benchmarks if name in ('pipeline', 'queries', 'memory')]
+    runs = [(benchmark_synthetic, (items, args.layers, synthetic_benchmarks))
+            for items in (args.items if synthetic_benchmarks else [])]
+    if 'startup' in args.benchmarks:
+        runs.append((benchmark_startup, ()))
+
+    if not runs:
+        return
+
+    baselines = load_baselines(args.baseline)
+    regressions = []
+    over_budget = []
+
+    for benchmark, benchmark_args in runs:
+        results = benchmark(*benchmark_args)
+        append_history(args.history, results)
+        key = baseline_key(results)
+        baseline = baselines.get(key, {})
+
+        if results['benchmark'] == 'startup':
+            print("\nImport times (cold: no bytecode cache, warm: cached)")
+        else:
+            print(f"\n{results['items']} items, {results['recipe_rows']} recipe rows, {args.layers} layers")
+        print(f"{'stage':<64} {'time (s)':>10} {'baseline (s)':>13}")
+        for name, seconds in results['timings'].items():
+            stored = f"{baseline[name]:.4f}" if name in baseline else '-'
+            print(f"{name:<64} {seconds:>10.4f} {stored:>13}")
+
+        if memory := results.get('memory'):
+            print(f"CSV tables {memory['csv_bytes'] / 2**20:.1f} MiB, loaded tables "
+                  f"{memory['loaded_bytes'] / 2**20:.1f} MiB "
+                  f"({1 - memory['loaded_bytes'] / memory['csv_bytes']:.0%} smaller)")
+            print(f"DataFrames {memory['frames_bytes'] / 2**20:.1f} MiB, compact model "
+                  f"{memory['compact_bytes'] / 2**20:.1f} MiB "
+                  f"({1 - memory['compact_bytes'] / memory['frames_bytes']:.0%} smaller)")
+
+        over_budget += [(name, seconds) for name, seconds in results['timings'].items()
+                        if name in {f"startup.{module}.warm" for module in FAST_STARTUP_MODULES}
+                        and seconds > args.startup_budget]
+
+        if args.save_baseline:
+            baselines[key] = {**baseline, **results['timings']}
+        else:
+            regressions += [(key, *regression)
+                            for regression in find_regressions(results['timings'], baseline, args.tolerance)]
+
+    if args.save_baseline:
+        save_baselines(args.baseline, baselines)
+        print(f"\nBaselines saved to {args.baseline}")
+    elif regressions:
+        print("\nRegressions:")
+        for key, name, stored, seconds in regressions:
+            print(f"{key} {name}: {stored:.4f}s -> {seconds:.4f}s ({seconds / stored - 1:+.0%})")
+
+    if over_budget:
+        print(f"\nOver the {args.startup_budget:.3f}s startup budget:")
+        for name, seconds in over_budget:
+            print(f"{name}: {seconds:.4f}s")
+
+    if over_budget or (regressions and not args.save_baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import pickle
+
+from instrumentation import stage
+from preprocessing import load_config, run_preprocessing
+from snapshot import hash_files
+
+CACHE_DIR = ".cache"
+
+# Source files whose code shapes the preprocessed tables
+PIPELINE_SOURCES = ["preprocessing.py", "graph.py", "compact.py"]
+
+# Most recently written cache entries kept across all config files
+MAX_CACHE_ENTRIES = 8
+
+
+def compute_cache_key(config_file: str) -> str:
+    """
+    Hashes everything the preprocessed tables are derived from.
+
+    The key covers the configuration file, every data file it points to and the
+    source of the preprocessing pipeline itself, so editing any of them produces
+    a different key.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+
+    Returns:
+        str: Hex digest identifying the current inputs.
+    """
+    config = load_config(config_file)
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+
+    paths = [config_file]
+    paths += [config['files'][key] for key in sorted(config['files'])]
+    paths += [os.path.join(source_dir, source) for source in PIPELINE_SOURCES]
+
+    return hash_files(paths)
+
+
+def _evict_stale_entries(cache_dir, config_prefix, cache_file):
+    """
+    Removes the older cache entries of a config file, then the least recently written
+    entries of other config files beyond `MAX_CACHE_ENTRIES`.
+    """
+    same_config, other_configs = [], []
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if entry.startswith("preprocessing-") and entry.endswith(".pkl") and path != cache_file:
+            (same_config if entry.startswith(config_prefix) else other_configs).append(path)
+
+    def written_at(path):
+        try:
+            return os.path.getmtime(path)
+        except FileNotFoundError:
+            return 0.0
+
+    other_configs.sort(key=written_at, reverse=True)
+
+    for path in same_config + other_configs[MAX_CACHE_ENTRIES - 1:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already evicted by another process
+            pass
+
+
+@stage
+def cached_preprocessing(config_file: str = "config.yaml", cache_dir: str = CACHE_DIR) -> tuple:
+    """
+    Returns the output of `run_preprocessing`, reusing an on-disk copy when the inputs
+    have not changed.
+
+    The tables are stored as a pickle named after the config file path and
+    `compute_cache_key`. A warm start only hashes the inputs and unpickles the tables.
+    Any edit to the config, the CSVs or the pipeline code changes the key, so the stale
+    copy is ignored, recomputed and replaced. Entries of other config files are kept,
+    up to `MAX_CACHE_ENTRIES` in total.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+        cache_dir (str): Directory holding the cached tables.
+
+    Returns:
+        tuple: The same `(config, items_df, recipes_df, rare_ingredients)` tuple as
+        `run_preprocessing`.
+    """
+    config_prefix = f"preprocessing-{hashlib.sha256(os.path.abspath(config_file).encode()).hexdigest()[:16]}-"
+    cache_file = os.path.join(cache_dir, f"{config_prefix}{compute_cache_key(config_file)}.pkl")
+
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as file:
+            return pickle.load(file)
+
+    result = run_preprocessing(config_file)
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write to a temporary file first so a concurrent reader never sees a partial cache
+    temporary_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(temporary_file, 'wb') as file:
+        pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_file, cache_file)
+
+    _evict_stale_entries(cache_dir, config_prefix, cache_file)
+
+    return result
@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache import CACHE_DIR, cached_preprocessing, compute_cache_key
+
+EXPORT_DIR = os.path.join(CACHE_DIR, "columnar")
+
+MANIFEST_FILE = "manifest.json"
+
+# Seconds after which a generation directory that no manifest lists is considered
+# abandoned, e.g. by a crashed export, and removed
+ABANDONED_GENERATION_SECONDS = 3600
+
+
+def _export_column(directory, table, position, column, values):
+    """
+    Writes a column as .npy files and returns its manifest entry.
+
+    Numbers and booleans are written as they are. Other columns are written as the
+    codes of a categorical, with their distinct values as fixed-width strings, so
+    both can be memory-mapped.
+    """
+    entry = {'name': column, 'file': f"{table}.{position}.npy"}
+
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        np.save(os.path.join(directory, entry['file']), values.to_numpy())
+        return entry
+
+    categorical = pd.Categorical(values)
+    np.save(os.path.join(directory, entry['file']), categorical.codes)
+
+    entry['categories_file'] = f"{table}.{position}.categories.npy"
+    np.save(os.path.join(directory, entry['categories_file']), np.asarray(categorical.categories, dtype=str))
+
+    return entry
+
+
+def export_tables(tables, directory=EXPORT_DIR, digest=None):
+    """
+    Writes tables column by column, in a layout other processes can memory-map.
+
+    Every export goes to a new generation directory and the manifest is replaced
+    last, atomically, so readers see either the previous export or the new one. The
+    previous generation is kept, so a reader that has just read the previous manifest
+    can still load its columns; only the generation before it is removed. Generation
+    directories no manifest lists, such as those of a concurrent export still being
+    written, are left alone until they are `ABANDONED_GENERATION_SECONDS` old.
+
+    Args:
+        tables (dict[str, pd.DataFrame]): Tables to export, by name. Their index is
+            not exported.
+        directory (str): Directory of the export.
+        digest (str | None): Identifier of the inputs the tables were computed from,
+            e.g. `cache.compute_cache_key`, stored in the manifest.
+
+    Returns:
+        dict: The manifest written.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    generation = f"{digest[:16] if digest else 'export'}-{os.getpid()}-{time.monotonic_ns()}"
+    generation_dir = os.path.join(directory, generation)
+    os.makedirs(generation_dir)
+
+    try:
+        previous = read_manifest(directory)
+    except FileNotFoundError:
+        previous = {}
+
+    manifest = {
+        'digest': digest,
+        'generation': generation,
+        'previous_generation': previous.get('generation'),
+        'tables': {
+            table: {
+                'rows': len(table_df),
+                'columns': [_export_column(generation_dir, table, position, column, table_df[column])
+                            for position, column in enumerate(table_df.columns)],
+            }
+            for table, table_df in tables.items()
+        },
+    }
+
+    temporary_file = os.path.join(directory, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(temporary_file, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temporary_file, os.path.join(directory, MANIFEST_FILE))
+
+    kept = {generation, manifest['previous_generation']}
+    expired = {previous.get('previous_generation')} - kept
+
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if entry in kept or not os.path.isdir(path):
+            continue
+        try:
+            if entry in expired or time.time() - os.path.getmtime(path) > ABANDONED_GENERATION_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        except FileNotFoundError:
+            # Already removed by another export
+            pass
+
+    return manifest
+
+
+def read_manifest(directory=EXPORT_DIR):
+    """
+    Reads the manifest of an export.
+
+    Args:
+        directory (str): Directory of the export.
+
+    Returns:
+        dict: The manifest written by `export_tables`.
+
+    Raises:
+        FileNotFoundError: If nothing was exported to the directory.
+    """
+    with open(os.path.join(directory, MANIFEST_FILE)) as file:
+        return json.load(file)
+
+
+def load_columns(table, directory=EXPORT_DIR, manifest=None):
+    """
+    Memory-maps the columns of an exported table.
+
+    Nothing is copied: the arrays are read-only views of the exported files, shared
+    by every process mapping them.
+
+    Args:
+        table (str): Name of the table.
+        directory (str): Directory of the export.
+        manifest (dict | None): Manifest of the export. Read from `directory` if not given.
+
+    Returns:
+        dict[str, tuple[np.ndarray, np.ndarray | None]]: Values of each column, and
+        for text columns the codes with their distinct values.
+
+    Raises:
+        ValueError: If the table was not exported.
+    """
+    manifest = manifest or read_manifest(directory)
+    if table not in manifest['tables']:
+        raise ValueError(f"Unknown table '{table}'. Expected one of: {', '.join(manifest['tables'])}")
+
+    generation_dir = os.path.join(directory, manifest['generation'])
+
+    return {
+        entry['name']: (
+            np.load(os.path.join(generation_dir, entry['file']), mmap_mode='r'),
+            np.load(os.path.join(generation_dir, entry['categories_file']), mmap_mode='r')
+            if 'categories_file' in entry else None,
+        )
+        for entry in manifest['tables'][table]['columns']
+    }
+
+
+def load_tables(directory=EXPORT_DIR, decode_text=True):
+    """
+    Loads every exported table as a DataFrame backed by memory-mapped columns.
+
+    Numeric columns are not copied. Text columns are categoricals whose codes are
+    not copied either; with `decode_text`, they are turned back into plain string
+    columns (a copy per process) so the tables work with every function of the
+    pipeline.
+
+    Args:
+        directory (str): Directory of the export.
+        decode_text (bool): Whether to turn text columns back into string columns.
+
+    Returns:
+        dict[str, pd.DataFrame]: The exported tables, by name.
+    """
+    manifest = read_manifest(directory)
+    tables = {}
+
+    for table in manifest['tables']:
+        columns = {}
+        for column, (values, categories) in load_columns(table, directory, manifest).items():
+            values = np.asarray(values)
+            if categories is not None:
+                values = pd.Categorical.from_codes(values, categories=pd.Index(categories, dtype=object),
+                                                   validate=False)
+                if decode_text:
+                    values = np.asarray(values, dtype=object)
+            columns[column] = values
+        tables[table] = pd.DataFrame(columns, copy=False)
+
+    return tables
+
+
+def is_current(config_file="config.yaml", directory=EXPORT_DIR):
+    """
+    Checks that an export was computed from the current inputs.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+        directory (str): Directory of the export.
+
+    Returns:
+        bool: Whether the export exists and matches the current cache key.
+    """
+    try:
+        return read_manifest(directory)['digest'] == compute_cache_key(config_file)
+    except FileNotFoundError:
+        return False
+
+
+def export_preprocessing(config_file="config.yaml", directory=EXPORT_DIR):
+    """
+    Exports the preprocessed items and recipes, unless the export is already current.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+        directory (str): Directory of the export.
+
+    Returns:
+        dict: The manifest of the export.
+    """
+    if is_current(config_file, directory):
+        return read_manifest(directory)
+
+    _, items_df, recipes_df, _ = cached_preprocessing(config_file)
+
+    return export_tables({'items': items_df, 'recipes': recipes_df}, directory, compute_cache_key(config_file))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the preprocessed tables for memory-mapped sharing.")
+    parser.add_argument('--config', default='config.yaml', help="Path to the YAML configuration file.")
+    parser.add_argument('--output', default=EXPORT_DIR, help="Directory of the export.")
+    args = parser.parse_args()
+
+    manifest = export_preprocessing(args.config, args.output)
+
+    for table, details in manifest['tables'].items():
+        print(f"{table}: {details['rows']} rows, {len(details['columns'])} columns")
+    print(f"Exported to {os.path.join(args.output, manifest['generation'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+# Columns of the loaded tables holding item names, interned into one shared dictionary
+ITEM_NAME_COLUMNS = {'items': ['name'], 'recipes': ['product', 'ingredient'], 'plants': ['fruit']}
+
+
+def _compact_column(values):
+    """
+    Returns the smallest representation of a column that keeps its values.
+
+    Integers that fit are stored as int32 and floats as float32. Other columns are
+    integer-coded: the codes are returned with the distinct values they refer to.
+
+    Returns:
+        tuple[np.ndarray, pd.Index | None]: The column, and its distinct values for
+        integer-coded columns.
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(), None
+
+    if pd.api.types.is_integer_dtype(values):
+        array = values.to_numpy()
+        if len(array) == 0 or (array.min() >= INT32_MIN and array.max() <= INT32_MAX):
+            return array.astype(np.int32), None
+        return array, None
+
+    if pd.api.types.is_float_dtype(values):
+        return values.to_numpy(dtype=np.float32), None
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int32), values.cat.categories
+
+    codes, categories = pd.factorize(values)
+    return codes.astype(np.int32), categories
+
+
+def compact_tables(items_df, recipes_df, plants_df):
+    """
+    Converts the loaded tables to compact column types.
+
+    Every column naming an item ('name', 'product', 'ingredient' and 'fruit') becomes
+    a categorical over one shared dictionary of item names, listed in catalogue order,
+    so the code of a name is the position of its item in `items_df`. Names missing from
+    the catalogue are appended after the items, and keep their text for error messages.
+    Other text columns such as 'machine' are categoricals of their own, integers that
+    fit are stored as int32 and floats as float32.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, with unique names.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        plants_df (pd.DataFrame): DataFrame containing plant details, including 'fruit'.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: The compact items, recipes
+        and plants.
+    """
+    tables = {'items': items_df, 'recipes': recipes_df, 'plants': plants_df}
+
+    names = pd.Index(items_df['name'].dropna())
+    referenced = pd.Index(pd.unique(np.concatenate([
+        tables[table][column].dropna().to_numpy(dtype=object)
+        for table, columns in ITEM_NAME_COLUMNS.items() for column in columns
+    ])))
+    item_dtype = pd.CategoricalDtype(names.append(referenced.difference(names, sort=False)))
+
+    compact = {}
+    for table, table_df in tables.items():
+        columns = {}
+        for column in table_df.columns:
+            values = table_df[column]
+            if column in ITEM_NAME_COLUMNS[table]:
+                columns[column] = values.astype(item_dtype)
+            elif pd.api.types.is_object_dtype(values):
+                columns[column] = values.astype(pd.CategoricalDtype(pd.unique(values.dropna())))
+            else:
+                columns[column] = _compact_column(values)[0]
+        compact[table] = pd.DataFrame(columns, index=table_df.index)
+
+    return compact['items'], compact['recipes'], compact['plants']
+
+
+def item_codes(values, names):
+    """
+    Returns the position of every value in `names`, or -1 for unknown values.
+
+    Categorical values are looked up once per distinct value and then broadcast through
+    their codes, so columns from `compact_tables` are joined on integers only.
+
+    Args:
+        values (pd.Series): Item names to look up.
+        names (pd.Series | pd.Index): Unique item names, in order.
+
+    Returns:
+        np.ndarray: Position of each value in `names`, as int32.
+    """
+    names = pd.Index(np.asarray(names, dtype=object))
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        positions = np.append(names.get_indexer(values.cat.categories.astype(object)), -1)
+        return positions[values.cat.codes.to_numpy()].astype(np.int32)
+
+    return names.get_indexer(values.to_numpy(dtype=object)).astype(np.int32)
+
+
+def _build_csr(rows, columns, values, size):
+    """
+    Groups edges by row as compressed sparse rows.
+
+    Args:
+        rows (np.ndarray): Row of every edge.
+        columns (np.ndarray): Column of every edge.
+        values (np.ndarray): Value of every edge.
+        size (int): Number of rows.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Start of every row's edges (with one
+        extra entry for the end), and the columns and values of the edges in row order.
+    """
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(size + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+
+    return indptr, columns[order], values[order]
+
+
+def build_compact_model(items_df, recipes_df):
+    """
+    Builds a compact, integer-coded copy of the items and recipes.
+
+    Every item gets an integer ID (its position in `items_df`) and every machine an
+    integer ID (its position in `machines`). Numeric columns are stored as int32 or
+    float32 arrays, and text columns such as 'machine' or 'rare_ingredients' as int32
+    codes into their distinct values. The recipes are stored as compressed sparse rows
+    in both directions, so the ingredients of a product and the consumers of an
+    ingredient are contiguous slices. Names are kept once, in `names`, to map IDs back
+    for display.
+
+    Float columns lose precision beyond about 7 significant digits.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name'.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+
+    Returns:
+        dict: A dictionary containing:
+            - names (pd.Index): Name of each item ID.
+            - machines (pd.Index): Name of each machine ID.
+            - columns (dict[str, np.ndarray]): Every other column of `items_df`, by
+              item ID. 'machine' holds machine IDs.
+            - categories (dict[str, pd.Index]): Distinct values of the integer-coded
+              columns, including 'machine'.
+            - recipes (dict[str, np.ndarray]): 'indptr', 'ingredients' and 'quantities'
+              of each product ID.
+            - consumers (dict[str, np.ndarray]): 'indptr', 'products' and 'quantities'
+              of each ingredient ID.
+
+    Raises:
+        ValueError: If item names are not unique, or recipes use items missing from
+            `items_df`. All missing items are reported together.
+    """
+    names = pd.Index(items_df['name'].to_numpy(dtype=object))
+    if not names.is_unique:
+        duplicates = names[names.duplicated()].unique()
+        raise ValueError(f"Duplicate item names in items_df: {', '.join(map(str, duplicates))}")
+
+    products = item_codes(recipes_df['product'], names)
+    ingredients = item_codes(recipes_df['ingredient'], names)
+
+    if (missing := (products == -1) | (ingredients == -1)).any():
+        missing_names = pd.unique(np.concatenate([recipes_df['product'].to_numpy()[products == -1],
+                                                  recipes_df['ingredient'].to_numpy()[ingredients == -1]]))
+        raise ValueError(f"Recipe items missing from items_df: {', '.join(map(str, missing_names))}")
+
+    columns = {}
+    categories = {}
+    for column in items_df.columns.drop('name'):
+        columns[column], column_categories = _compact_column(items_df[column])
+        if column_categories is not None:
+            categories[column] = column_categories
+
+    quantities, _ = _compact_column(recipes_df['quantity'])
+
+    recipe_indptr, recipe_ingredients, recipe_quantities = _build_csr(products, ingredients, quantities, len(names))
+    consumer_indptr, consumer_products, consumer_quantities = _build_csr(ingredients, products, quantities,
+                                                                         len(names))
+
+    return {
+        'names': names,
+        'machines': categories.get('machine', pd.Index([])),
+        'columns': columns,
+        'categories': categories,
+        'recipes': {'indptr': recipe_indptr, 'ingredients': recipe_ingredients, 'quantities': recipe_quantities},
+        'consumers': {'indptr': consumer_indptr, 'products': consumer_products, 'quantities': consumer_quantities},
+    }
+
+
+def item_ids(model, names):
+    """
+    Maps item names to their IDs.
+
+    Args:
+        model (dict): Compact model from `build_compact_model`.
+        names (Iterable[str]): Item names.
+
+    Returns:
+        np.ndarray: ID of each item.
+
+    Raises:
+        ValueError: If some names are unknown. All unknown names are reported together.
+    """
+    names = list(names)
+    ids = model['names'].get_indexer(names)
+
+    if unknown_names := [name for name, item_id in zip(names, ids) if item_id == -1]:
+        raise ValueError(f"Unknown items: {', '.join(unknown_names)}")
+
+    return ids.astype(np.int32)
+
+
+def ingredients_of(model, item_id):
+    """
+    Returns the ingredients of a product.
+
+    Args:
+        model (dict): Compact model from `build_compact_model`.
+        item_id (int): ID of the product.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: IDs and quantities of the ingredients.
+    """
+    recipes = model['recipes']
+    start, end = recipes['indptr'][item_id], recipes['indptr'][item_id + 1]
+
+    return recipes['ingredients'][start:end], recipes['quantities'][start:end]
+
+
+def consumers_of(model, item_id):
+    """
+    Returns the products that use an ingredient directly.
+
+    Args:
+        model (dict): Compact model from `build_compact_model`.
+        item_id (int): ID of the ingredient.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: IDs of the products and the quantity each uses.
+    """
+    consumers = model['consumers']
+    start, end = consumers['indptr'][item_id], consumers['indptr'][item_id + 1]
+
+    return consumers['products'][start:end], consumers['quantities'][start:end]
+
+
+def to_frame(model, ids=None, columns=None):
+    """
+    Rebuilds a displayable DataFrame from the compact model.
+
+    Args:
+        model (dict): Compact model from `build_compact_model`.
+        ids (np.ndarray | None): Item IDs of the rows, in order. Defaults to every item.
+        columns (Iterable[str] | None): Columns to include besides 'name'. Defaults to
+            every column.
+
+    Returns:
+        pd.DataFrame: The rows with their names, and integer-coded columns decoded.
+    """
+    ids = np.arange(len(model['names'])) if ids is None else np.asarray(ids)
+    frame = {'name': model['names'][ids]}
+
+    for column in (model['columns'] if columns is None else columns):
+        values = model['columns'][column][ids]
+        frame[column] = model['categories'][column][values] if column in model['categories'] else values
+
+    return pd.DataFrame(frame)
+
+
+def model_memory_usage(model):
+    """
+    Returns the memory held by a compact model, in bytes, strings included.
+
+    Args:
+        model (dict): Compact model from `build_compact_model`.
+
+    Returns:
+        int: Bytes used by the arrays and the name mappings.
+    """
+    arrays = [*model['columns'].values(), *model['recipes'].values(), *model['consumers'].values()]
+    mappings = [model['names'], *model['categories'].values()]
+
+    return sum(array.nbytes for array in arrays) + sum(index.memory_usage(deep=True) for index in mappings)
+
+
+def frame_memory_usage(*frames):
+    """
+    Returns the memory held by DataFrames, in bytes, strings included.
+
+    Args:
+        *frames (pd.DataFrame): DataFrames to measure.
+
+    Returns:
+        int: Bytes used by the DataFrames.
+    """
+    return int(sum(frame.memory_usage(deep=True).sum() for frame in frames))
+
+
+def load_memory_usage(config):
+    """
+    Measures the memory saved by loading the CSV files with compact column types.
+
+    Args:
+        config (dict): Configuration dictionary containing file paths.
+
+    Returns:
+        dict[str, int]: Bytes held by the tables read with plain `pd.read_csv`
+        ('csv_bytes') and by the tables of `preprocessing.load_data` ('loaded_bytes').
+    """
+    from preprocessing import load_data
+
+    files = config['files']
+    plain_tables = [pd.read_csv(files[key]) for key in ('items_csv', 'recipes_csv', 'plants_csv')]
+
+    return {'csv_bytes': frame_memory_usage(*plain_tables), 'loaded_bytes': frame_memory_usage(*load_data(config))}
+
+
+def load_compact_model(config_file="config.yaml"):
+    """
+    Loads the preprocessed data and builds its compact model.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+
+    Returns:
+        tuple[dict, dict]: The configuration and the compact model.
+    """
+    from cache import cached_preprocessing
+
+    config, items_df, recipes_df, _ = cached_preprocessing(config_file)
+
+    return config, build_compact_model(items_df, recipes_df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the memory saved by the compact tables and model.")
+    parser.add_argument('--config', default='config.yaml', help="Path to the YAML configuration file.")
+    args = parser.parse_args()
+
+    from cache import cached_preprocessing
+
+    config, items_df, recipes_df, _ = cached_preprocessing(args.config)
+    model = build_compact_model(items_df, recipes_df)
+
+    memory = load_memory_usage(config)
+    frames, compact = frame_memory_usage(items_df, recipes_df), model_memory_usage(model)
+    print(f"CSV tables:    {memory['csv_bytes'] / 1024:>10.1f} KiB")
+    print(f"Loaded tables: {memory['loaded_bytes'] / 1024:>10.1f} KiB "
+          f"({1 - memory['loaded_bytes'] / memory['csv_bytes']:.0%} smaller)")
+    print(f"Preprocessed:  {frames / 1024:>10.1f} KiB")
+    print(f"Compact model: {compact / 1024:>10.1f} KiB ({1 - compact / frames:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    main()
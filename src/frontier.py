@@ -0,0 +1,283 @@
+from itertools import combinations
+
+import numpy as np
+
+from cache import cached_preprocessing
+from ingredient import build_ingredient_index, get_ingredient_choice, get_products_using
+from machine import SORT_MAPPING, get_available_machines, get_machine_choice
+
+FRONTIER_COLUMNS = list(SORT_MAPPING.values())
+
+DEFAULT_FRONTIER_COLUMNS = ('profit_per_minute', 'experience_per_minute')
+
+
+def skyline(values):
+    """
+    Finds the rows of a matrix that no other row dominates.
+
+    A row dominates another when it is at least as large in every column and larger in
+    at least one. Identical rows do not dominate each other, so both are kept. With
+    two columns, the rows are sorted once and swept while tracking the best second
+    value, in O(n log n). With more columns, the rows are sorted by decreasing sum, so
+    every dominating row comes before the rows it dominates, and each row is only
+    compared with the frontier found so far (sort-filter-skyline).
+
+    Args:
+        values (np.ndarray): n x d matrix of values to maximize. Rows with missing
+            values are never on the frontier.
+
+    Returns:
+        np.ndarray: Positions of the non-dominated rows, in the sort order described above.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    candidates = np.flatnonzero(~np.isnan(values).any(axis=1))
+    values = values[candidates]
+
+    if len(candidates) == 0:
+        return candidates
+
+    if values.shape[1] == 2:
+        order = np.lexsort((-values[:, 1], -values[:, 0]))
+        x, y = values[order, 0], values[order, 1]
+
+        # Best second value among the rows with a larger (or equal) first value, and
+        # the row that first reached it
+        best_before = np.concatenate([[-np.inf], np.maximum.accumulate(y)[:-1]])
+        improves = y > best_before
+        best_row = np.maximum.accumulate(np.where(improves, np.arange(len(y)), 0))
+        best_row_before = np.concatenate([[0], best_row[:-1]])
+
+        keep = improves | ((y == best_before) & (x[best_row_before] == x))
+
+        return candidates[order[keep]]
+
+    order = np.argsort(-values.sum(axis=1), kind='stable')
+    frontier = []
+
+    for row in order:
+        point = values[row]
+        window = values[frontier]
+        if not ((window >= point).all(axis=1) & (window > point).any(axis=1)).any():
+            frontier.append(row)
+
+    return candidates[np.array(frontier, dtype=np.int64)]
+
+
+def frontier_rows(values, rows):
+    """
+    Returns the rows on the Pareto frontier, sorted by decreasing values.
+
+    Args:
+        values (np.ndarray): Matrix of the columns to maximize, one row per item.
+        rows (np.ndarray): Positions of the candidate rows in `values`.
+
+    Returns:
+        np.ndarray: Positions of the non-dominated rows, sorted by the first column,
+        then the next ones, in descending order.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    frontier = rows[skyline(values[rows])]
+
+    return frontier[np.lexsort([-values[frontier, column] for column in reversed(range(values.shape[1]))])]
+
+
+def _check_columns(columns):
+    """
+    Raises a ValueError if the columns cannot define a Pareto frontier.
+    """
+    if len(columns) < 2:
+        raise ValueError("A Pareto frontier needs at least two columns")
+
+    if unknown_columns := [column for column in columns if column not in FRONTIER_COLUMNS]:
+        raise ValueError(f"Unknown frontier columns: {', '.join(unknown_columns)}")
+
+
+def pareto_products(items_df, rows, columns):
+    """
+    Returns the products among the given rows that are on the Pareto frontier.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        rows (np.ndarray): Positions of the candidate products in `items_df`, e.g. the
+            products of a machine or the products using an ingredient.
+        columns (Sequence[str]): Two or more columns to maximize.
+
+    Returns:
+        pd.DataFrame: The non-dominated products, sorted by the first column.
+
+    Raises:
+        ValueError: If fewer than two columns are given, or some are unknown.
+    """
+    _check_columns(columns)
+
+    return items_df.iloc[frontier_rows(items_df[list(columns)].to_numpy(dtype=np.float64), rows)]
+
+
+def build_frontiers(config, items_df, column_sets=None):
+    """
+    Precomputes the Pareto frontier of every available machine.
+
+    Args:
+        config (dict): Configuration containing settings like which machines to ignore.
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        column_sets (Iterable[tuple[str, ...]] | None): Column combinations to
+            precompute. Defaults to every pair of `FRONTIER_COLUMNS`.
+
+    Returns:
+        dict[tuple[str, ...], dict[str, np.ndarray]]: Positions in `items_df` of the
+        frontier of each machine, for each column combination.
+
+    Raises:
+        ValueError: If a column combination has fewer than two columns or unknown ones.
+    """
+    column_sets = list(column_sets or combinations(FRONTIER_COLUMNS, 2))
+    machine_rows = items_df.groupby('machine', sort=False, observed=True).indices
+    frontiers = {}
+
+    for columns in column_sets:
+        _check_columns(columns)
+        values = items_df[list(columns)].to_numpy(dtype=np.float64)
+        frontiers[columns] = {
+            machine: frontier_rows(values, machine_rows[machine])
+            for machine in get_available_machines(config, items_df)
+        }
+
+    return frontiers
+
+
+def ingredient_frontier(items_df, ingredient_index, ingredient, columns, transitive=False):
+    """
+    Returns the products using an ingredient that are on the Pareto frontier.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        ingredient_index (dict): Index from `ingredient.build_ingredient_index`.
+        ingredient (str): Name of the ingredient.
+        columns (Sequence[str]): Two or more columns to maximize.
+        transitive (bool): Whether to include products that use the ingredient
+            anywhere in their recipe chain, not only directly.
+
+    Returns:
+        pd.DataFrame: The non-dominated products, sorted by the first column.
+
+    Raises:
+        ValueError: If fewer than two columns are given, or some are unknown.
+    """
+    rows = ingredient_index['rows']
+    product_labels = [rows[product] for product in get_products_using(ingredient_index, ingredient, transitive)
+                      if product in rows]
+
+    return pareto_products(items_df, items_df.index.get_indexer(product_labels), columns)
+
+
+def get_frontier_view():
+    """
+    Prompts the user to compare the products of a machine or of an ingredient.
+
+    Returns:
+        str: Either 'machine' or 'ingredient'.
+    """
+    while True:
+        input_value = input("\n1. By Machine  2. By Ingredient: ").strip()
+
+        if input_value in ['1', '2']:
+            return 'machine' if input_value == '1' else 'ingredient'
+
+        print("Invalid input. Please enter 1 or 2.")
+
+
+def get_transitive_choice():
+    """
+    Prompts the user whether to include the products using an ingredient indirectly.
+
+    Returns:
+        bool: Whether to include products that use the ingredient through an
+        intermediate product. Defaults to False if no input is given.
+    """
+    while True:
+        input_value = input("Include products using it through other products? (y/N): ").strip().lower()
+
+        if input_value in ['', 'n', 'no', 'y', 'yes']:
+            return input_value in ['y', 'yes']
+
+        print("Invalid input. Please enter y or n.")
+
+
+def get_frontier_columns():
+    """
+    Prompts the user to select the columns of the Pareto frontier.
+
+    Returns:
+        tuple[str, ...]: The selected columns, or `DEFAULT_FRONTIER_COLUMNS` if no
+        input is given.
+    """
+    print("\nCompare products on (at least two):")
+    for number, column in enumerate(FRONTIER_COLUMNS, start=1):
+        print(f"{number}. {column.replace('_', ' ').title()}")
+
+    while True:
+        input_value = input("Enter the numbers separated by commas (default 2,3): ").strip()
+
+        if not input_value:
+            return DEFAULT_FRONTIER_COLUMNS
+
+        choices = [choice.strip() for choice in input_value.split(',')]
+        if (len(set(choices)) >= 2
+                and all(choice.isdigit() and 1 <= int(choice) <= len(FRONTIER_COLUMNS) for choice in choices)):
+            return tuple(dict.fromkeys(FRONTIER_COLUMNS[int(choice) - 1] for choice in choices))
+
+        print(f"Invalid input. Please enter at least two different numbers between 1 and {len(FRONTIER_COLUMNS)}.")
+
+
+def display_frontier(config, items_df, recipes_df, frontiers=None, ingredient_index=None):
+    """
+    Displays the Pareto frontier of a user-selected machine or ingredient.
+
+    For a machine, if none is chosen, the frontier of every available machine is
+    displayed. For an ingredient, the frontier is taken among the products using it,
+    optionally including those using it through intermediate products.
+
+    Args:
+        config (dict): Configuration containing settings like which machines to ignore.
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        recipes_df (pd.DataFrame): DataFrame containing product recipes and their ingredients.
+        frontiers (dict | None): Precomputed machine frontiers from `build_frontiers`.
+            Frontiers of other column combinations are computed on demand.
+        ingredient_index (dict | None): Index from `ingredient.build_ingredient_index`.
+            Built from `recipes_df` if not given.
+    """
+    if get_frontier_view() == 'ingredient':
+        if ingredient_index is None:
+            ingredient_index = build_ingredient_index(recipes_df, items_df, config.get('animal_feed', {}))
+
+        ingredient = get_ingredient_choice(ingredient_index['ingredients'])
+        transitive = get_transitive_choice()
+        columns = get_frontier_columns()
+
+        print(f"\n{ingredient}")
+        print(ingredient_frontier(items_df, ingredient_index, ingredient, columns, transitive)[
+            ['name', 'machine', *columns, 'rare_ingredients']].to_string())
+        return
+
+    available_machines = get_available_machines(config, items_df)
+    machine_choice = get_machine_choice(available_machines)
+    columns = get_frontier_columns()
+
+    machines = [available_machines[machine_choice]] if machine_choice != -1 else available_machines
+    machine_frontiers = (frontiers or {}).get(columns) or build_frontiers(config, items_df, [columns])[columns]
+
+    for machine in machines:
+        print(f"\n{machine}")
+        print(items_df.iloc[machine_frontiers[machine]][['name', 'machine', *columns, 'rare_ingredients']].to_string())
+
+
+def sortby_frontier():
+    """
+    Preprocesses data and displays the Pareto frontier of the chosen machine or ingredient.
+    """
+    config, items_df, recipes_df, _ = cached_preprocessing()
+    display_frontier(config, items_df, recipes_df, build_frontiers(config, items_df))
+
+
+if __name__ == "__main__":
+    sortby_frontier()
@@ -0,0 +1,122 @@
+from collections import deque
+
+
+def build_dependency_graph(recipes_df, feed_to_item_map=None):
+    """
+    Builds the recipe dependency graph as an adjacency list.
+
+    Every product maps to the ingredients it consumes together with their quantities.
+    Items produced by animals (e.g. Egg) depend only on their feed (e.g. Chicken feed) 
+    with a quantity of 1, following the `animal_feed` section of the config.
+
+    Args:
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        feed_to_item_map (dict): Mapping of feed names to their corresponding item names.
+
+    Returns:
+        dict[str, list[tuple[str, float]]]: Ingredients and quantities of each product.
+    """
+    graph = {}
+
+    for product, ingredient, quantity in zip(recipes_df['product'],
+                                             recipes_df['ingredient'],
+                                             recipes_df['quantity']):
+        graph.setdefault(product, []).append((ingredient, quantity))
+
+    for feed, item_name in (feed_to_item_map or {}).items():
+        graph[item_name] = [(feed, 1)]
+
+    return graph
+
+
+def reverse_dependencies(graph):
+    """
+    Inverts a dependency graph so that every ingredient maps to the products consuming it.
+
+    Args:
+        graph (dict[str, list[tuple[str, float]]]): Ingredients and quantities of each product.
+
+    Returns:
+        dict[str, list[tuple[str, float]]]: Consumer products and quantities of each ingredient.
+    """
+    consumers = {}
+
+    for product, ingredients in graph.items():
+        for ingredient, quantity in ingredients:
+            consumers.setdefault(ingredient, []).append((product, quantity))
+
+    return consumers
+
+
+def topological_order(graph):
+    """
+    Orders every node of the graph so that ingredients come before the products using them.
+
+    Uses Kahn's algorithm, so the cost is linear in the number of recipe edges.
+
+    Args:
+        graph (dict[str, list[tuple[str, float]]]): Ingredients and quantities of each product.
+
+    Returns:
+        list[str]: All products and ingredients in dependency order.
+
+    Raises:
+        ValueError: If the recipes contain a cycle. The message lists the products involved.
+    """
+    consumers = reverse_dependencies(graph)
+    nodes = set(graph) | set(consumers)
+    pending = {node: len(graph.get(node, [])) for node in nodes}
+
+    ready = deque(sorted(node for node, count in pending.items() if count == 0))
+    order = []
+
+    while ready:
+        node = ready.popleft()
+        order.append(node)
+
+        for product, _ in consumers.get(node, []):
+            pending[product] -= 1
+            if pending[product] == 0:
+                ready.append(product)
+
+    if len(order) < len(nodes):
+        raise ValueError(f"Cycle detected in recipes involving: {', '.join(sorted(_cyclic_nodes(graph, pending)))}")
+
+    return order
+
+
+def _cyclic_nodes(graph, pending):
+    """
+    Narrows the nodes left over by Kahn's algorithm down to the ones on a cycle.
+
+    Leftover products that merely consume a cyclic product are peeled off from the top, 
+    so only the nodes that actually take part in a cycle remain.
+
+    Args:
+        graph (dict[str, list[tuple[str, float]]]): Ingredients and quantities of each product.
+        pending (dict[str, int]): Unresolved ingredient count of each node after sorting.
+
+    Returns:
+        set[str]: Nodes that lie on a cycle.
+    """
+    remaining = {node for node, count in pending.items() if count > 0}
+    consumer_count = dict.fromkeys(remaining, 0)
+
+    for product in remaining:
+        for ingredient, _ in graph.get(product, []):
+            if ingredient in remaining:
+                consumer_count[ingredient] += 1
+
+    unused = deque(node for node, count in consumer_count.items() if count == 0)
+
+    while unused:
+        node = unused.popleft()
+        remaining.discard(node)
+
+        for ingredient, _ in graph.get(node, []):
+            if ingredient in remaining:
+                consumer_count[ingredient] -= 1
+                if consumer_count[ingredient] == 0:
+                    unused.append(ingredient)
+
+    return remaining
@@ -0,0 +1,350 @@
+import numpy as np
+import pandas as pd
+
+from graph import build_dependency_graph, reverse_dependencies, topological_order
+from preprocessing import (
+    aggregate_recipe_costs,
+    build_cost_index,
+    calculate_chain_profit_per_minute,
+    calculate_profit_and_experience_per_minute,
+    evaluate_chain_times,
+    evaluate_true_costs,
+    find_cost_leaves,
+    update_cost_for_feed,
+    update_cost_from_treesnbush,
+    update_items_with_no_cost,
+)
+
+DELTA_FIELDS = ['cost', 'plantprice', 'time']
+
+
+def build_dependency_index(recipes_df, config):
+    """
+    Builds the dependency structures needed to update single prices incrementally.
+
+    Args:
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        config (dict): Configuration dictionary containing 'animal_feed' and 'true_cost'.
+
+    Returns:
+        dict: A dictionary containing:
+            - graph (dict): Ingredients and quantities of each product.
+            - consumers (dict): Products consuming each ingredient (the reverse index).
+            - order (list[str]): All nodes in topological order.
+            - feed_to_item_map (dict): Mapping of feed names to their corresponding item names.
+            - true_cost (bool): Whether costs follow the full bill of materials.
+    """
+    feed_to_item_map = config.get('animal_feed', {})
+    graph = build_dependency_graph(recipes_df, feed_to_item_map)
+
+    return {
+        'graph': graph,
+        'consumers': reverse_dependencies(graph),
+        'order': topological_order(graph),
+        'feed_to_item_map': feed_to_item_map,
+        'true_cost': config.get('true_cost', False),
+    }
+
+
+def find_dependent_items(index, changed_items):
+    """
+    Finds the changed items and every item using them anywhere in its recipe chain.
+
+    Args:
+        index (dict): Dependency index from `build_dependency_index`.
+        changed_items (Iterable[str]): Names of the changed items.
+
+    Returns:
+        set[str]: Names of the changed items and of their direct and indirect consumers.
+    """
+    dependent = set(changed_items)
+    pending = list(dependent)
+
+    while pending:
+        for product, _ in index['consumers'].get(pending.pop(), []):
+            if product not in dependent:
+                dependent.add(product)
+                pending.append(product)
+
+    return dependent
+
+
+def find_affected_items(index, changed_items):
+    """
+    Finds every item whose cost columns depend on the changed items.
+
+    With market pricing, a price change only reaches the direct consumers of an item,
+    plus the animal products of any feed among them. With `true_cost`, it travels up
+    the whole recipe graph.
+
+    Args:
+        index (dict): Dependency index from `build_dependency_index`.
+        changed_items (Iterable[str]): Names of the items whose price changed.
+
+    Returns:
+        set[str]: Names of the changed items and of every item depending on them.
+    """
+    if index['true_cost']:
+        affected = find_dependent_items(index, changed_items)
+    else:
+        affected = set(changed_items)
+        for item_name in changed_items:
+            affected.update(product for product, _ in index['consumers'].get(item_name, []))
+
+    # Feeds and their animal products always share a production cost
+    for feed, item_name in index['feed_to_item_map'].items():
+        if feed in affected or item_name in affected:
+            affected.update([feed, item_name])
+
+    return affected
+
+
+def recompute_items(items_df, recipes_df, plants_df, index, names):
+    """
+    Recomputes the cost, profit and per-minute columns of the given items only.
+
+    The rows are pushed through the same passes as `update_costs`,
+    `calculate_profit_and_experience_per_minute` and
+    `calculate_chain_profit_per_minute`, with ingredients priced from the
+    current `items_df`, so the result matches a full `run_preprocessing`.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        plants_df (pd.DataFrame): DataFrame containing plant details, including 'fruit'
+            and 'plantprice'.
+        index (dict): Dependency index from `build_dependency_index`.
+        names (set[str]): Names of the items to recompute.
+
+    Returns:
+        pd.DataFrame: `items_df`, updated in place for the given rows.
+    """
+    affected_df = items_df[items_df['name'].isin(names)].copy()
+    affected_plants_df = plants_df[plants_df['fruit'].isin(affected_df['name'])]
+    feed_to_item_map = {
+        feed: item_name for feed, item_name in index['feed_to_item_map'].items()
+        if feed in names
+    }
+
+    if index['true_cost']:
+        known_df = items_df[~items_df['name'].isin(names)].dropna(subset=['production_cost'])
+        memo = dict(zip(known_df['name'], known_df['production_cost']))
+        memo.update({
+            name: round(cost) for name, cost in find_cost_leaves(affected_df, affected_plants_df).items()
+        })
+
+        true_costs = evaluate_true_costs(index['graph'],
+                                         [node for node in index['order'] if node in names],
+                                         dict(zip(items_df['name'], items_df['cost'])),
+                                         set(index['feed_to_item_map']),
+                                         memo)
+        affected_df['production_cost'] = affected_df['name'].astype(object).map(true_costs)
+    else:
+        affected_recipes_df = recipes_df[recipes_df['product'].isin(names)]
+        product_costs = aggregate_recipe_costs(affected_recipes_df, build_cost_index(items_df))
+
+        affected_df['production_cost'] = affected_df['name'].astype(object).map(product_costs).astype(float)
+        affected_df = update_cost_from_treesnbush(affected_df, affected_plants_df)
+        affected_df = update_cost_for_feed(affected_df, feed_to_item_map)
+        affected_df = update_items_with_no_cost(affected_df)
+
+    affected_df['production_cost'] = affected_df['production_cost'].round(0)
+    affected_df = calculate_profit_and_experience_per_minute(affected_df)
+    affected_df = calculate_chain_profit_per_minute(affected_df)
+
+    columns = ['production_cost', 'total_profit', 'profit_per_minute', 'experience_per_minute',
+               'serial_profit_per_minute', 'parallel_profit_per_minute']
+    items_df.loc[affected_df.index, columns] = affected_df[columns]
+
+    return items_df
+
+
+def recompute_times(items_df, index, names):
+    """
+    Recomputes the per-minute and chain time columns of the given items only.
+
+    The chain times of the given items are re-evaluated in topological order, with
+    the chain times of their other ingredients read from `items_df`, so the result
+    matches a full `run_preprocessing`.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        index (dict): Dependency index from `build_dependency_index`.
+        names (set[str]): Names of the items to recompute, including every consumer
+            of an item whose time changed (see `find_dependent_items`).
+
+    Returns:
+        pd.DataFrame: `items_df`, updated in place for the given rows.
+    """
+    affected_df = items_df[items_df['name'].isin(names)].copy()
+    nodes = [node for node in index['order'] if node in names]
+
+    serial_times, parallel_times = evaluate_chain_times(index['graph'],
+                                                        nodes,
+                                                        dict(zip(items_df['name'], items_df['time'])),
+                                                        set(index['feed_to_item_map']),
+                                                        dict(zip(items_df['name'], items_df['serial_chain_time'])),
+                                                        dict(zip(items_df['name'], items_df['parallel_chain_time'])))
+
+    # Items outside the recipe graph only count their own time, like in `calculate_chain_times`
+    serial_times = {node: serial_times[node] for node in nodes}
+    parallel_times = {node: parallel_times[node] for node in nodes}
+
+    affected_df = calculate_profit_and_experience_per_minute(affected_df)
+    affected_df['serial_chain_time'] = affected_df['name'].astype(object).map(serial_times).fillna(affected_df['time'])
+    affected_df['parallel_chain_time'] = affected_df['name'].astype(object).map(parallel_times).fillna(affected_df['time'])
+    affected_df = calculate_chain_profit_per_minute(affected_df)
+
+    columns = ['profit_per_minute', 'experience_per_minute', 'serial_chain_time', 'parallel_chain_time',
+               'serial_profit_per_minute', 'parallel_profit_per_minute']
+    items_df.loc[affected_df.index, columns] = affected_df[columns]
+
+    return items_df
+
+
+def _plant_mask(items_df, plants_df, name):
+    """
+    Selects the plants of a fruit, or of a tree or bush by name.
+    """
+    plant_fruits = items_df.loc[items_df['machine'] == name, 'name']
+
+    return (plants_df['fruit'] == name) | plants_df['fruit'].isin(plant_fruits)
+
+
+def _set_values(df, rows, column, values):
+    """
+    Sets values in a column, widening it to float first if they do not fit its type.
+    """
+    values = np.asarray(values)
+    if not np.array_equal(values, values.astype(df[column].dtype)):
+        df[column] = df[column].astype(float)
+
+    df.loc[rows, column] = values.astype(df[column].dtype)
+
+
+def find_invalid_deltas(items_df, plants_df, deltas):
+    """
+    Checks changes without applying them.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        plants_df (pd.DataFrame): DataFrame containing plant details, including 'fruit'
+            and 'plantprice'.
+        deltas (Iterable[tuple[str, str, float]]): Name, field and new value of each change.
+
+    Returns:
+        list[tuple[tuple[str, str, float], str]]: Every invalid change with the reason
+        it cannot be applied.
+    """
+    item_names = set(items_df['name'])
+    invalid = []
+
+    for name, field, value in deltas:
+        if field not in DELTA_FIELDS:
+            error = f"Unsupported delta field '{field}'. Expected one of: {', '.join(DELTA_FIELDS)}"
+        elif field == 'plantprice':
+            error = None if _plant_mask(items_df, plants_df, name).any() else f"Plant '{name}' not found in plants_df"
+        elif name not in item_names:
+            error = f"Item '{name}' not found in items_df"
+        elif field == 'time' and value < 0:
+            error = f"Negative time for item '{name}': {value}"
+        else:
+            error = None
+
+        if error is not None:
+            invalid.append(((name, field, value), error))
+
+    return invalid
+
+
+def apply_deltas(items_df, recipes_df, plants_df, index, deltas):
+    """
+    Applies several changes at once and updates only the rows they affect.
+
+    Every change is checked before any is applied, and the affected rows are
+    recomputed once for the whole batch, so a batch costs about as much as its
+    largest change. Later changes of the same field override earlier ones.
+
+    Supported deltas are an item's market `cost` (e.g. "Milk cost = 40"), a tree or
+    bush `plantprice`, addressed by fruit or by plant name (e.g. "Apple" or
+    "Apple tree plantprice = 200"), and an item's production `time` in minutes. A
+    time change also updates the chain times of every product using the item
+    anywhere in its recipe chain.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        plants_df (pd.DataFrame): DataFrame containing plant details, including 'fruit'
+            and 'plantprice'.
+        index (dict): Dependency index from `build_dependency_index`.
+        deltas (Iterable[tuple[str, str, float]]): Name, field and new value of each change.
+
+    Returns:
+        set[str]: Names of the items whose rows were recomputed.
+
+    Raises:
+        ValueError: If a field is not supported, an item or plant is not found, or a
+            time is negative. All invalid changes are reported together and nothing
+            is applied.
+    """
+    deltas = list(deltas)
+    if invalid := find_invalid_deltas(items_df, plants_df, deltas):
+        raise ValueError('\n'.join(dict.fromkeys(error for _, error in invalid)))
+
+    # Later changes of the same field override earlier ones
+    latest = {(name, field): value for name, field, value in deltas}
+    item_deltas = [(name, field, value) for (name, field), value in latest.items() if field != 'plantprice']
+    positions = pd.Index(items_df['name']).get_indexer([name for name, _, _ in item_deltas])
+
+    for field in ('cost', 'time'):
+        if changed := [(position, value) for (_, delta_field, value), position in zip(item_deltas, positions)
+                       if delta_field == field]:
+            rows, values = zip(*changed)
+            if field == 'time':
+                values = [round(value) for value in values]
+            _set_values(items_df, items_df.index[list(rows)], field, values)
+
+    cost_changes = {name for name, field, _ in item_deltas if field == 'cost'}
+    time_changes = {name for name, field, _ in item_deltas if field == 'time'}
+
+    for (name, field), value in latest.items():
+        if field == 'plantprice':
+            plant_mask = _plant_mask(items_df, plants_df, name)
+            _set_values(plants_df, plants_df.index[plant_mask], 'plantprice', [value] * plant_mask.sum())
+            cost_changes.update(plants_df.loc[plant_mask, 'fruit'])
+
+    affected = find_affected_items(index, cost_changes) if cost_changes else set()
+    if affected:
+        recompute_items(items_df, recipes_df, plants_df, index, affected)
+
+    timed = find_dependent_items(index, time_changes)
+    if timed:
+        recompute_times(items_df, index, timed)
+
+    return affected | timed
+
+
+def apply_delta(items_df, recipes_df, plants_df, index, name, field, value):
+    """
+    Applies a single change and updates only the rows it affects.
+
+    See `apply_deltas` for the supported changes.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        plants_df (pd.DataFrame): DataFrame containing plant details, including 'fruit'
+            and 'plantprice'.
+        index (dict): Dependency index from `build_dependency_index`.
+        name (str): Name of the item, fruit or plant to change.
+        field (str): One of 'cost', 'plantprice' or 'time'.
+        value (float): New value of the field.
+
+    Returns:
+        set[str]: Names of the items whose rows were recomputed.
+
+    Raises:
+        ValueError: If the field is not supported, the item or plant is not found, or
+            the time is negative.
+    """
+    return apply_deltas(items_df, recipes_df, plants_df, index, [(name, field, value)])
@@ -1,27 +1,88 @@
 import math
 import pandas as pd
 
-from preprocessing import run_preprocessing
+from cache import cached_preprocessing
+from graph import build_dependency_graph, reverse_dependencies, topological_order
+from machine import get_sort
+from ranking import rank_rows
 
-def get_unique_sorted_ingredients(recipes_df: pd.DataFrame,
-                                   items_df: pd.DataFrame) -> list[str]:
+
+def build_ingredient_index(recipes_df: pd.DataFrame,
+                           items_df: pd.DataFrame,
+                           feed_to_item_map: dict = None) -> dict:
     """
-    Returns a sorted list of names from items_df that appear in the 'ingredient'
-    column of recipes_df.
+    Builds an inverted index from every ingredient to the products that consume it.
+
+    The index is built once from `recipes_df` so that each lookup only costs the size 
+    of its result. It also keeps the sorted ingredient list, the row of every item in 
+    `items_df`, and the transitive closure of the consumers (every product that uses 
+    an ingredient anywhere in its recipe chain). The closure follows the same graph as 
+    the cost calculations, so an animal product (e.g. Egg) uses its feed (e.g. Chicken 
+    feed) and everything the feed is made of.
 
     Args:
-        recipes_df (pd.DataFrame): DataFrame with an 'ingredient' column (by name).
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
         items_df (pd.DataFrame): DataFrame with a 'name' column.
+        feed_to_item_map (dict): Mapping of feed names to their corresponding item names,
+            from the `animal_feed` section of the config.
 
     Returns:
-        list[str]: Alphabetically sorted unique ingredient names.
+        dict: A dictionary containing:
+            - consumers (dict[str, dict[str, int]]): Quantity of the ingredient used by 
+              each direct consumer product.
+            - closure (dict[str, frozenset[str]]): All products using the ingredient 
+              directly or through an intermediate product.
+            - ingredients (list[str]): Alphabetically sorted unique ingredient names.
+            - rows (dict[str, int]): Index label of each item in `items_df`.
     """
-    ingredient_names = set(recipes_df['ingredient'].unique())
-    item_names = set(items_df['name'].dropna())
+    rows = dict(zip(items_df['name'], items_df.index))
+    consumers = {}
+
+    for product, ingredient, quantity in zip(recipes_df['product'],
+                                             recipes_df['ingredient'],
+                                             recipes_df['quantity']):
+        product_quantities = consumers.setdefault(ingredient, {})
+        product_quantities[product] = product_quantities.get(product, 0) + quantity
+
+    graph = build_dependency_graph(recipes_df, feed_to_item_map)
+    graph_consumers = reverse_dependencies(graph)
+
+    # Consumers come after their ingredients in topological order, so walking it
+    # backwards completes the closure of every consumer before it is needed
+    closure = {}
+    for node in reversed(topological_order(graph)):
+        closure[node] = frozenset().union(
+            *({product} | closure[product] for product, _ in graph_consumers.get(node, ()))
+        )
+
+    return {
+        'consumers': consumers,
+        'closure': closure,
+        'ingredients': sorted(set(consumers).intersection(rows)),
+        'rows': rows,
+    }
+
 
-    matching_names = ingredient_names.intersection(item_names)
+def get_products_using(ingredient_index: dict,
+                       ingredient: str,
+                       transitive: bool = False) -> list[str]:
+    """
+    Looks up the products that use an ingredient.
+
+    Args:
+        ingredient_index (dict): Index from `build_ingredient_index`.
+        ingredient (str): Name of the ingredient.
+        transitive (bool): Whether to include products that use the ingredient 
+            anywhere in their recipe chain, not only directly.
+
+    Returns:
+        list[str]: Names of the products using the ingredient.
+    """
+    if transitive:
+        return list(ingredient_index['closure'].get(ingredient, ()))
+
+    return list(ingredient_index['consumers'].get(ingredient, {}))
 
-    return sorted(matching_names)
 
 def get_ingredient_choice(ingredients, num_columns=5):
     """
@@ -62,187 +123,85 @@ def get_ingredient_choice(ingredients, num_columns=5):
         else:
             print(f"Invalid choice. Please enter a number between 1 and {len(ingredients)}.")
 
-def get_sort():
-    """
-    Prompts the user to select a sorting option for displaying product data.
-    
-    The user is presented with a list of sorting options, including:
-    1. Total Profit
-    2. Profit Per Minute
-    3. Experience Per Minute
-    4. Total Experience
-    
-    The function ensures that the user selects a valid input (1-4). If the user 
-    inputs an invalid value, they will be prompted again until a valid selection 
-    is made.
-
-    Returns:
-        str: The key corresponding to the selected sorting option. The returned 
-             value will be one of 'total_profit', 'profit_per_minute', 
-             'experience_per_minute', or 'experience'.
-    """
 
-    print("\nSort by:")
-    print("1. Total Profit")
-    print("2. Profit Per Minute")
-    print("3. Experience Per Minute")
-    print("4. Total Experience")
-    
-    while True:
-        input_value = input("Enter the number corresponding to your choice (1/2/3/4): ").strip()
-        
-        if input_value in ['1', '2', '3', '4']:  # Only accept 1-4
-            sort_choice = int(input_value)
-            break
-        else:
-            print("Invalid input. Please choose a number between 1 and 4.")
-    
-    sort_mapping = {
-        1: 'total_profit',
-        2: 'profit_per_minute',
-        3: 'experience_per_minute',
-        4: 'experience'
-    }
-
-    return sort_mapping[sort_choice]
-
-
-def append_rare_ingredients(sorted_machine_data: pd.DataFrame,
-                            items_df: pd.DataFrame,
-                            recipes_df: pd.DataFrame,
-                            rare_ingredients: list[str]) -> pd.DataFrame:
+def sort_ingredient_products(items_df: pd.DataFrame,
+                             ingredient_index: dict,
+                             ingredient: str,
+                             sort_criterion,
+                             transitive: bool = False,
+                             limit: int = None) -> pd.DataFrame:
     """
-    Appends a column `rare_ingredients` to `sorted_machine_data`, showing rare ingredients used.
+    Returns the products that use an ingredient, sorted by the given criterion.
 
-    This version does not use item_id. It matches product names and rare ingredient names directly.
+    With a limit, only the best products are selected and sorted, instead of sorting 
+    every product.
 
     Args:
-        sorted_machine_data (pd.DataFrame): DataFrame containing product data.
-        items_df (pd.DataFrame): DataFrame listing all items with their names.
-        recipes_df (pd.DataFrame): DataFrame listing product recipes (product, ingredient, quantity).
-        rare_ingredients (list[str]): List of rare ingredient names.
+        items_df (pd.DataFrame): DataFrame containing information about available items.
+        ingredient_index (dict): Index from `build_ingredient_index`.
+        ingredient (str): Name of the ingredient.
+        sort_criterion (str | list[str] | dict[str, float]): Column to sort the products 
+            by, in descending order, or a multi-key or weighted criterion from `parse_sort`.
+        transitive (bool): Whether to include products that use the ingredient 
+            anywhere in their recipe chain, not only directly.
+        limit (int | None): Maximum number of products to return.
 
     Returns:
-        pd.DataFrame: Updated `sorted_machine_data` with a `rare_ingredients` column.
+        pd.DataFrame: The sorted product data.
     """
+    rows = ingredient_index['rows']
+    product_labels = [rows[product] for product in get_products_using(ingredient_index, ingredient, transitive)
+                      if product in rows]
 
-    # Filter recipes for the products in sorted_machine_data
-    filtered_recipes = recipes_df[recipes_df['product'].isin(sorted_machine_data['name'])]
-
-    # Further filter only rare ingredients
-    rare_recipes = filtered_recipes[filtered_recipes['ingredient'].isin(rare_ingredients)]
-
-    # Aggregate rare ingredients by product name
-    rare_recipe_agg = (
-        rare_recipes.groupby('product')
-        .apply(
-            lambda x: ', '.join(
-                f"{q} {ingredient}" for q, ingredient in zip(x['quantity'], x['ingredient'])
-            ),
-            include_groups=False
-        )
-        .reset_index()
-    )
-
-    if not rare_recipe_agg.empty:
-        rare_recipe_agg.rename(columns={0: 'rare_ingredients'}, inplace=True)
-        sorted_machine_data = sorted_machine_data.merge(
-            rare_recipe_agg, left_on='name', right_on='product', how='left'
-        )
-        sorted_machine_data.drop(columns=['product'], inplace=True)
-    else:
-        sorted_machine_data['rare_ingredients'] = ''
-
-    sorted_machine_data['rare_ingredients'] = (
-        sorted_machine_data['rare_ingredients'].fillna('')
-    )
-
-    return sorted_machine_data
+    return items_df.iloc[rank_rows(items_df, items_df.index.get_indexer(product_labels), sort_criterion, limit)]
 
 
 def display_products(items_df: pd.DataFrame,
                      recipes_df: pd.DataFrame,
-                     rare_ingredients: list[str]) -> None:
+                     ingredient_index: dict = None,
+                     limit: int = None) -> None:
     """
     Displays products that use a selected ingredient, sorted by a user-defined criterion,
-    and appends rare ingredients used in each product.
+    along with the rare ingredients used in each product.
 
     The function filters products that use the chosen ingredient, sorts them based on
-    a user-defined sorting option, and appends a column showing rare ingredients used.
+    a user-defined sorting option, and shows the 'rare_ingredients' column computed 
+    during preprocessing.
 
     Args:
-        items_df (pd.DataFrame): DataFrame containing information about available items.
+        items_df (pd.DataFrame): DataFrame containing information about available items, 
+            including the 'rare_ingredients' column from preprocessing.
         recipes_df (pd.DataFrame): DataFrame containing product recipes and their ingredients.
-        rare_ingredients (list[str]): List of rare ingredient names.
+        ingredient_index (dict): Index from `build_ingredient_index`. Built from 
+            `recipes_df` if not given.
+        limit (int | None): Maximum number of products to display.
 
     Returns:
         None: This function does not return any values but directly prints the sorted product data.
     """
-    unique_ingredients = get_unique_sorted_ingredients(recipes_df, items_df)
-    ingredient_choice = get_ingredient_choice(unique_ingredients)
-
-    # Get all products that use the selected ingredient by name
-    products_using_ingredient = recipes_df[
-        recipes_df['ingredient'] == ingredient_choice
-    ]['product'].unique()
+    if ingredient_index is None:
+        ingredient_index = build_ingredient_index(recipes_df, items_df)
 
-    # Filter items_df for those product names
-    filtered_items = items_df[items_df['name'].isin(products_using_ingredient)]
+    ingredient_choice = get_ingredient_choice(ingredient_index['ingredients'])
 
-    sort_criterion = get_sort()
-
-    sorted_filtered_items = filtered_items.sort_values(by=sort_criterion,
-                                                       ascending=False)
-
-    sorted_filtered_items = append_rare_ingredients(sorted_filtered_items,
-                                                    items_df,
-                                                    recipes_df,
-                                                    rare_ingredients)
+    sorted_filtered_items = sort_ingredient_products(items_df,
+                                                     ingredient_index,
+                                                     ingredient_choice,
+                                                     get_sort(),
+                                                     limit=limit)
 
     print(sorted_filtered_items[
         ['name', 'machine', 'total_profit', 'profit_per_minute',
-         'experience_per_minute', 'experience', 'rare_ingredients']
+         'experience_per_minute', 'experience', 'serial_profit_per_minute',
+         'parallel_profit_per_minute', 'rare_ingredients']
     ].to_string())
 
 
-'''def display_products(items_df, recipes_df, rare_ingredients) -> None:
-    """
-    Displays products that use a selected ingredient, sorted by a user-defined criterion,
-    and appends rare ingredients used in each product.
-
-    The function filters products that use the chosen ingredient, sorts them based on
-    a user-defined sorting option, and appends a column showing rare ingredients used.
-
-    Args:
-        items_df (pd.DataFrame): DataFrame containing information about available items.
-        recipes_df (pd.DataFrame): DataFrame containing product recipes and their ingredients.
-        rare_ingredients (list): List of rare ingredient names.
-
-    Returns:
-        None: This function does not return any values but directly prints the sorted product data.
-    """
-    
-    unique_ingredients = get_unique_sorted_ingredients(recipes_df, items_df)
-    ingredient_choice = get_ingredient_choice(unique_ingredients)
-
-    id_choice = items_df[items_df['name'] == ingredient_choice]['item_id'].iloc[0]
-    product_ids_using_ingredient = recipes_df[recipes_df['ingredient'] == id_choice]['product_item_id'].unique()
-    filtered_items = items_df[items_df['item_id'].isin(product_ids_using_ingredient)]
-
-    sort_criterion = get_sort()
-    
-    sorted_filtered_items = filtered_items.sort_values(by=sort_criterion, ascending=False)
-    sorted_filtered_items = append_rare_ingredients(sorted_filtered_items, items_df, recipes_df, rare_ingredients)
-    
-    print(sorted_filtered_items[['name', 'machine', 'total_profit', 'profit_per_minute', 
-                                 'experience_per_minute', 'experience', 'rare_ingredients']].to_string())
-'''
-    
-
 def sortby_ingredient():
 
-    _, items_df, recipes_df, rare_ingredients = run_preprocessing()
-    display_products(items_df, recipes_df, rare_ingredients)
+    config, items_df, recipes_df, _ = cached_preprocessing()
+    display_products(items_df, recipes_df,
+                     build_ingredient_index(recipes_df, items_df, config.get('animal_feed', {})))
     
 if __name__ == "__main__":
     sortby_ingredient()
\ No newline at end of file
@@ -0,0 +1,171 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+# Set to 1 to record every pipeline stage, or to "time" to skip memory tracing
+PROFILE_ENV = "HAYDAY_PROFILE"
+
+# Path of a JSON file the recorded stages are written to on exit
+PROFILE_OUTPUT_ENV = "HAYDAY_PROFILE_OUTPUT"
+
+ENABLED = os.environ.get(PROFILE_ENV, '').lower() not in ('', '0', 'false', 'no')
+
+# Memory tracing slows the stages down several times, so timings can be taken without it
+TRACE_MEMORY = os.environ.get(PROFILE_ENV, '').lower() != 'time'
+
+# Most recent stage calls kept, so long-running processes do not grow without bound
+MAX_RECORDS = 10000
+
+# Recorded stages, in the order they started
+_records = deque(maxlen=MAX_RECORDS)
+
+# Stages currently running, innermost last
+_active = []
+
+
+def _count_rows(result):
+    """
+    Returns the number of rows of the DataFrames in a stage result.
+    """
+    if isinstance(result, tuple):
+        return sum(_count_rows(value) for value in result)
+
+    return len(result) if hasattr(result, 'columns') else 0
+
+
+def _track_peak():
+    """
+    Folds the traced memory peak since the last reset into every running stage.
+    """
+    peak = tracemalloc.get_traced_memory()[1]
+    for record in _active:
+        record['_peak'] = max(record['_peak'], peak)
+    tracemalloc.reset_peak()
+
+
+def stage(func):
+    """
+    Records the wall time, rows and peak memory of every call to a pipeline stage.
+
+    Only active when the `HAYDAY_PROFILE` environment variable is set when the module
+    is imported. Otherwise the function is returned unchanged, so instrumented stages
+    cost nothing. Stages may be nested: each record keeps its depth, and the peak
+    memory of a stage includes the stages it calls. With `HAYDAY_PROFILE=time`, memory
+    is not traced and only wall times and rows are recorded. A stage that raises is
+    recorded as failed, without rows. Only the last `MAX_RECORDS` calls are kept.
+
+    Args:
+        func (Callable): Stage to instrument.
+
+    Returns:
+        Callable: The instrumented stage, or `func` itself when profiling is disabled.
+    """
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _track_peak()
+
+        record = {'stage': func.__name__, 'depth': len(_active), '_start_memory': tracemalloc.get_traced_memory()[0],
+                  '_peak': 0}
+        _records.append(record)
+        _active.append(record)
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            record['wall_time'] = time.perf_counter() - start
+            if TRACE_MEMORY:
+                _track_peak()
+            _active.pop()
+
+            record['failed'] = failed
+            record['rows'] = None if failed else _count_rows(result)
+            peak, start_memory = record.pop('_peak'), record.pop('_start_memory')
+            record['peak_memory'] = max(peak - start_memory, 0) if TRACE_MEMORY else None
+
+    return wrapper
+
+
+def get_records():
+    """
+    Returns the stages recorded so far.
+
+    Returns:
+        list[dict]: One record per stage call, in the order the calls started, with
+        'stage', 'depth', 'wall_time' (seconds), 'rows' (None if the stage raised),
+        'peak_memory' (bytes, None when memory is not traced) and 'failed'.
+    """
+    return [record for record in _records if 'wall_time' in record]
+
+
+def reset_records():
+    """
+    Forgets the stages recorded so far.
+    """
+    _records.clear()
+
+
+def format_table(records):
+    """
+    Formats stage records as a human-readable table, nested stages indented.
+
+    Args:
+        records (list[dict]): Records from `get_records`.
+
+    Returns:
+        str: The table.
+    """
+    names = ['  ' * record['depth'] + record['stage'] + (' (failed)' if record['failed'] else '')
+             for record in records]
+    width = max([len('Stage')] + [len(name) for name in names])
+
+    lines = [f"{'Stage':<{width}}  {'Time (ms)':>10}  {'Rows':>10}  {'Peak (KiB)':>11}"]
+    for name, record in zip(names, records):
+        rows = '-' if record['rows'] is None else record['rows']
+        peak = '-' if record['peak_memory'] is None else f"{record['peak_memory'] / 1024:.1f}"
+        lines.append(f"{name:<{width}}  {record['wall_time'] * 1000:>10.2f}  {rows:>10}  {peak:>11}")
+
+    return '\n'.join(lines)
+
+
+def export_json(path, records):
+    """
+    Writes stage records to a JSON file.
+
+    Args:
+        path (str): Path of the JSON file.
+        records (list[dict]): Records from `get_records`.
+    """
+    with open(path, 'w') as file:
+        json.dump(records, file, indent=2)
+
+
+def _report():
+    """
+    Prints the recorded stages on exit, and exports them if requested.
+    """
+    if not (records := get_records()):
+        return
+
+    print(format_table(records), file=sys.stderr)
+
+    if output := os.environ.get(PROFILE_OUTPUT_ENV):
+        export_json(output, records)
+
+
+if ENABLED:
+    atexit.register(_report)
@@ -1,7 +1,17 @@
 import math
-import pandas as pd
+import numpy as np
 
-from preprocessing import run_preprocessing
+from cache import cached_preprocessing
+from ranking import rank_rows
+
+SORT_MAPPING = {
+    1: 'total_profit',
+    2: 'profit_per_minute',
+    3: 'experience_per_minute',
+    4: 'experience',
+    5: 'serial_profit_per_minute',
+    6: 'parallel_profit_per_minute'
+}
 
 def get_machine_choice(available_machines, num_columns=3) -> int:
     """
@@ -63,15 +73,18 @@ def get_sort():
     2. Profit Per Minute
     3. Experience Per Minute
     4. Total Experience
+    5. Profit Per Minute, including the serial time to make the ingredients
+    6. Profit Per Minute, including the parallel time to make the ingredients
     
-    The function ensures that the user selects a valid input (1-4). If the user 
+    The function ensures that the user selects a valid input (1-6). If the user 
     inputs an invalid value, they will be prompted again until a valid selection 
     is made.
 
     Returns:
         str: The key corresponding to the selected sorting option. The returned 
              value will be one of 'total_profit', 'profit_per_minute', 
-             'experience_per_minute', or 'experience'.
+             'experience_per_minute', 'experience', 'serial_profit_per_minute', 
+             or 'parallel_profit_per_minute'.
     """
 
     print("\nSort by:")
@@ -79,118 +92,95 @@ def get_sort():
     print("2. Profit Per Minute")
     print("3. Experience Per Minute")
     print("4. Total Experience")
+    print("5. Profit Per Minute (Serial Chain)")
+    print("6. Profit Per Minute (Parallel Chain)")
     
     while True:
-        input_value = input("Enter the number corresponding to your choice (1/2/3/4): ").strip()
+        input_value = input("Enter the number corresponding to your choice (1/2/3/4/5/6): ").strip()
         
-        if input_value in ['1', '2', '3', '4']:  # Only accept 1-4
+        if input_value in ['1', '2', '3', '4', '5', '6']:  # Only accept 1-6
             sort_choice = int(input_value)
             break
         else:
-            print("Invalid input. Please choose a number between 1 and 4.")
+            print("Invalid input. Please choose a number between 1 and 6.")
     
-    sort_mapping = {
-        1: 'total_profit',
-        2: 'profit_per_minute',
-        3: 'experience_per_minute',
-        4: 'experience'
-    }
+    return SORT_MAPPING[sort_choice]
 
-    return sort_mapping[sort_choice]
 
+def get_available_machines(config, items_df):
+    """
+    Returns the machines whose products can be displayed, skipping the ignored ones.
 
-def append_rare_ingredients(sorted_machine_data: pd.DataFrame, 
-                            items_df: pd.DataFrame, 
-                            recipes_df: pd.DataFrame, 
-                            rare_ingredients: list[str]) -> pd.DataFrame:
+    Args:
+        config (dict): Configuration containing settings like which machines to ignore.
+        items_df (pd.DataFrame): DataFrame containing information about available items.
+
+    Returns:
+        np.ndarray: Names of the available machines, in order of first appearance.
     """
-    Appends a column `rare_ingredients` to `sorted_machine_data`, showing rare ingredients used.
+    ignore_machines = config.get('ignore_machines', [])
+
+    return items_df[~items_df['machine'].isin(ignore_machines)]['machine'].unique()
+
 
-    This function maps rare ingredient names to their IDs, filters the `recipes_df`, and aggregates 
-    the rare ingredients used per product.
+def sort_machine_products(config, items_df, machine, sort_criterion, limit=None):
+    """
+    Returns the products of a machine sorted by the given criterion.
+
+    If no machine is given, the products of all available machines are returned, 
+    sorted by machine and then by the criterion. With a limit, only the best products 
+    are selected and sorted, instead of sorting every product.
 
     Args:
-        sorted_machine_data (pd.DataFrame): DataFrame containing product data.
-        items_df (pd.DataFrame): DataFrame mapping ingredient IDs to names.
-        recipes_df (pd.DataFrame): DataFrame listing product recipes (product, ingredient, quantity).
-        rare_ingredients (List[str]): List of rare ingredient names.
+        config (dict): Configuration containing settings like which machines to ignore.
+        items_df (pd.DataFrame): DataFrame containing information about available items.
+        machine (str | None): Name of the machine, or None for all available machines.
+        sort_criterion (str | list[str] | dict[str, float]): Column to sort the products 
+            by, in descending order, or a multi-key or weighted criterion from `parse_sort`.
+        limit (int | None): Maximum number of products to return.
 
     Returns:
-        pd.DataFrame: Updated `sorted_machine_data` with a `rare_ingredients` column.
+        pd.DataFrame: The sorted product data.
     """
-
-    rare_ingredient_ids = items_df[items_df['name'].isin(rare_ingredients)]['item_id'].tolist()
-
-    filtered_recipes = recipes_df[recipes_df['product'].isin(sorted_machine_data['item_id'])]
-
-    rare_recipe_agg = (
-        filtered_recipes[filtered_recipes['ingredient'].isin(rare_ingredient_ids)]
-        .merge(items_df[['item_id', 'name']], left_on='ingredient', right_on='item_id', how='left')
-        .groupby('product')
-        .apply(
-            lambda x: ', '.join(
-                f"{q} {ingredient_name}" 
-                for q, ingredient_name in zip(x['quantity'], x['name'])
-            ),
-            include_groups=False
-        )
-        .reset_index()
-    )
-
-    if not rare_recipe_agg.empty:
-        rare_recipe_agg.rename(columns={0: 'rare_ingredients'}, inplace=True)
-        sorted_machine_data = sorted_machine_data.merge(
-            rare_recipe_agg, left_on='item_id', right_on='product_item_id', how='left'
-        )
-        sorted_machine_data.drop(columns=['product_item_id'], inplace=True)
+    if machine is not None:
+        rows = np.flatnonzero((items_df['machine'] == machine).to_numpy())
     else:
-        sorted_machine_data['rare_ingredients'] = ''
-
-    sorted_machine_data['rare_ingredients'] = (
-        sorted_machine_data['rare_ingredients'].fillna('')
-    )
-    
-    print(sorted_machine_data[['name', 'machine', 'total_profit', 'profit_per_minute', 
-                            'experience_per_minute', 'experience', 'rare_ingredients']].to_string())
+        rows = np.flatnonzero(~items_df['machine'].isin(config.get('ignore_machines', [])).to_numpy())
 
-    return sorted_machine_data
+    return items_df.iloc[rank_rows(items_df, rows, sort_criterion, limit, by_machine=machine is None)]
 
 
-def display_products(config, items_df, recipes_df, rare_ingredients):
+def display_products(config, items_df, limit=None):
     """
     Displays products sorted by a user-selected sorting criterion for a given machine.
     
     The function filters out machines to ignore based on the configuration, prompts 
     the user to choose a machine, and then sorts the products from the chosen machine 
     according to a user-defined sorting method. If no machine is chosen, all products 
-    are displayed sorted by machine and the selected sorting criterion.
+    are displayed sorted by machine and the selected sorting criterion. The rare 
+    ingredients used by each product are shown alongside.
 
     Args:
         config (dict): Configuration containing settings like which machines to ignore.
-        items_df (pd.DataFrame): DataFrame containing information about available items.
-        recipes_df (pd.DataFrame): DataFrame containing product recipes.
-        rare_ingredients (list): List of rare ingredients used for additional display logic.
+        items_df (pd.DataFrame): DataFrame containing information about available items, 
+            including the 'rare_ingredients' column from preprocessing.
+        limit (int | None): Maximum number of products to display.
 
     Returns:
         pd.DataFrame: A DataFrame containing the sorted product data based on the user's 
                       machine selection and sorting criteria.
     """
-    ignore_machines = config.get('ignore_machines', [])
-    
-    available_machines = items_df[~items_df['machine'].isin(ignore_machines)]['machine'].unique()
+    available_machines = get_available_machines(config, items_df)
     
     machine_choice = get_machine_choice(available_machines)
 
-    if machine_choice != -1:
-        machine_data = items_df[items_df['machine'] == available_machines[machine_choice]]
-        sorted_machine_data = machine_data.sort_values(by=get_sort(), ascending=False)
+    machine = available_machines[machine_choice] if machine_choice != -1 else None
 
-    else:
-        sorted_machine_data = items_df[~items_df['machine'].isin(ignore_machines)] \
-            .sort_values(by=['machine', get_sort()], ascending=[True, False])
+    sorted_machine_data = sort_machine_products(config, items_df, machine, get_sort(), limit)
 
-        
-    append_rare_ingredients(sorted_machine_data, items_df, recipes_df, rare_ingredients)
+    print(sorted_machine_data[['name', 'machine', 'total_profit', 'profit_per_minute', 
+                               'experience_per_minute', 'experience', 'serial_profit_per_minute',
+                               'parallel_profit_per_minute', 'rare_ingredients']].to_string())
     
     return sorted_machine_data
 
@@ -199,15 +189,15 @@ def sortby_machine():
     """
     Preprocesses data and displays products sorted by the chosen machine and sorting option.
 
-    This function runs the preprocessing step to prepare the required data and then 
-    calls the `display_products` function to display the products from the selected machine 
-    sorted according to the user's chosen sorting criterion.
+    This function loads the preprocessed data (from the cache when the inputs have not 
+    changed) and then calls the `display_products` function to display the products from 
+    the selected machine sorted according to the user's chosen sorting criterion.
 
     Returns:
         None: This function does not return any values but directly prints the sorted products.
     """
-    config, items_df, recipes_df, rare_ingredients = run_preprocessing()
-    display_products(config, items_df, recipes_df, rare_ingredients)
+    config, items_df, _, _ = cached_preprocessing()
+    display_products(config, items_df)
 
 
 if __name__ == "__main__":
@@ -1,22 +1,32 @@
-from machine import sortby_machine
-from ingredient import sortby_ingredient
-
 def main():
+    # The views are imported once chosen, so that the menu shows up before pandas loads
     while True:
         print("\nChoose an option to get information:")
         print("1. By Machine")
         print("2. By Ingredient")
+        print("3. Pareto Frontier")
+        print("4. Interactive Session (keeps the data loaded across queries)")
         
-        choice = input("Enter the number corresponding to your choice (1/2): ").strip()
+        choice = input("Enter the number corresponding to your choice (1/2/3/4): ").strip()
         
         if choice == '1':
+            from machine import sortby_machine
             sortby_machine()
             break
         elif choice == '2':
+            from ingredient import sortby_ingredient
             sortby_ingredient()
             break
+        elif choice == '3':
+            from frontier import sortby_frontier
+            sortby_frontier()
+            break
+        elif choice == '4':
+            from session import run_session, start_session
+            run_session(start_session())
+            break
         else:
-            print("Invalid choice. Please enter 1 or 2.")
+            print("Invalid choice. Please enter 1, 2, 3 or 4.")
 
 
 if __name__ == "__main__":
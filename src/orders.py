@@ -0,0 +1,519 @@
+import argparse
+import heapq
+import math
+import re
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from cache import cached_preprocessing
+from graph import build_dependency_graph, reverse_dependencies, topological_order
+from preprocessing import FEED_YIELD
+
+ORDER_ENTRY_PATTERN = re.compile(r'^\s*(?P<quantity>\d+)\s*x?\s+(?P<name>\S.*?)\s*$')
+
+ORDER_TABLE_COLUMNS = ['order_id', 'name', 'quantity', 'coins', 'experience']
+
+# Rows read at a time from order files
+CHUNK_SIZE = 1_000_000
+
+# Offending rows listed in the errors of an order table
+MAX_REPORTED_ROWS = 10
+
+
+def parse_order(text):
+    """
+    Parses an order such as "3 Cake, 2 Cheese, 5 Bacon".
+
+    Entries are separated by commas and each starts with a whole quantity, optionally
+    followed by an 'x' ("3x Cake"). An item listed several times is added up.
+
+    Args:
+        text (str): Order to parse.
+
+    Returns:
+        dict[str, int]: Quantity of each ordered item.
+
+    Raises:
+        ValueError: If some entries are not recognized. All malformed entries are
+            reported together.
+    """
+    order = Counter()
+    malformed = []
+
+    for entry in text.split(','):
+        if not entry.strip():
+            continue
+        if (match := ORDER_ENTRY_PATTERN.match(entry)) is None or int(match['quantity']) == 0:
+            malformed.append(repr(entry.strip()))
+            continue
+        order[match['name']] += int(match['quantity'])
+
+    if malformed:
+        raise ValueError(f"Unrecognized order entries: {', '.join(malformed)}")
+
+    return dict(order)
+
+
+def build_order_model(items_df, recipes_df, config):
+    """
+    Expands the bill of materials of every product once, so orders are evaluated quickly.
+
+    The recipe graph includes animal products, which consume one of their feeds. Items
+    without a recipe are raw inputs. Products are expanded in topological order and the
+    expansion of each one is memoized, so a sub-product shared by many recipes (e.g.
+    Butter) is only expanded once. Expansions are per item: a feed recipe yields
+    `FEED_YIELD` feeds, so one feed accounts for a third of its recipe.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name',
+            'machine' and 'time' (in minutes).
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        config (dict): Configuration dictionary containing 'animal_feed'.
+
+    Returns:
+        dict: Order model holding the recipe graph, the consumers of every item, the
+        topological rank, machine, time and yield of every product, and the memoized
+        raw materials and machine minutes of one unit of every item.
+
+    Raises:
+        ValueError: If a recipe item is missing from `items_df`, or if the recipes
+            contain a cycle.
+    """
+    feed_to_item_map = config.get('animal_feed', {})
+    graph = build_dependency_graph(recipes_df, feed_to_item_map)
+    order = topological_order(graph)
+    machines = dict(zip(items_df['name'], items_df['machine']))
+    times = dict(zip(items_df['name'], items_df['time']))
+
+    if missing_items := [node for node in order if node not in machines]:
+        raise ValueError(f"Recipe items missing from items_df: {', '.join(missing_items)}")
+
+    yields = {product: FEED_YIELD if product in feed_to_item_map else 1 for product in graph}
+    unit_raw = {}
+    unit_minutes = {}
+
+    for node in order:
+        if node not in graph:
+            unit_raw[node] = {node: 1}
+            unit_minutes[node] = {}
+            continue
+
+        raw = Counter()
+        minutes = Counter({machines[node]: times[node]})
+
+        for ingredient, quantity in graph[node]:
+            for name, amount in unit_raw[ingredient].items():
+                raw[name] += quantity * amount
+            for machine, amount in unit_minutes[ingredient].items():
+                minutes[machine] += quantity * amount
+
+        unit_raw[node] = {name: amount / yields[node] for name, amount in raw.items()}
+        unit_minutes[node] = {machine: amount / yields[node] for machine, amount in minutes.items()}
+
+    return {
+        'graph': graph,
+        'consumers': reverse_dependencies(graph),
+        'rank': {node: rank for rank, node in enumerate(order)},
+        'machines': machines,
+        'times': times,
+        'yields': yields,
+        'unit_raw': unit_raw,
+        'unit_minutes': unit_minutes,
+    }
+
+
+def _is_positive_integer(value):
+    """
+    Checks that a value is a whole number of at least 1, booleans excluded.
+    """
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool) and value > 0
+
+
+def _check_order(model, order, machine_counts=None):
+    """
+    Raises a ValueError listing every problem of an order: ordered items that are not in
+    the model, and quantities or machine counts that are not positive integers.
+    """
+    errors = []
+
+    if missing_items := [name for name in order if name not in model['machines']]:
+        errors.append(f"Ordered items missing from items_df: {', '.join(missing_items)}")
+
+    if invalid_quantities := [f"{name}: {quantity!r}" for name, quantity in order.items()
+                              if not _is_positive_integer(quantity)]:
+        errors.append(f"Order quantities must be positive integers: {', '.join(invalid_quantities)}")
+
+    if invalid_counts := [f"{machine}: {count!r}" for machine, count in (machine_counts or {}).items()
+                          if not _is_positive_integer(count)]:
+        errors.append(f"Machine counts must be positive integers: {', '.join(invalid_counts)}")
+
+    if errors:
+        raise ValueError('\n'.join(errors))
+
+
+def explode_order(model, order):
+    """
+    Totals the raw materials and machine minutes needed to make an order from scratch.
+
+    Args:
+        model (dict): Order model from `build_order_model`.
+        order (dict[str, int]): Quantity of each ordered item.
+
+    Returns:
+        dict: A dictionary containing:
+            - raw (dict[str, float]): Quantity of each raw input.
+            - machine_minutes (dict[str, float]): Minutes of work for each machine.
+
+    Raises:
+        ValueError: If an ordered item is missing from the model, or a quantity is not
+            a positive integer.
+    """
+    _check_order(model, order)
+
+    raw = Counter()
+    machine_minutes = Counter()
+
+    for name, quantity in order.items():
+        for raw_name, amount in model['unit_raw'].get(name, {name: 1}).items():
+            raw[raw_name] += quantity * amount
+        for machine, amount in model['unit_minutes'].get(name, {}).items():
+            machine_minutes[machine] += quantity * amount
+
+    return {'raw': dict(raw), 'machine_minutes': dict(machine_minutes)}
+
+
+def schedule_order(model, order, machine_counts=None):
+    """
+    Estimates how long an order takes with list scheduling.
+
+    The order is broken down into whole recipe runs (batches): each product needs enough
+    batches for the order and for the batches of the products using it. Raw inputs are
+    assumed to be in stock. A product's batches can start once every batch of its
+    ingredients is done, and each machine runs as many batches at once as it has units.
+    When batches compete for a machine, the one on the longest remaining chain of
+    recipes (the critical path) goes first.
+
+    Args:
+        model (dict): Order model from `build_order_model`.
+        order (dict[str, int]): Quantity of each ordered item.
+        machine_counts (dict[str, int] | None): Number of units of each machine, one by
+            default.
+
+    Returns:
+        dict: A dictionary containing:
+            - batches (dict[str, int]): Number of recipe runs of each product.
+            - makespan (float): Minutes until the whole order is ready.
+
+    Raises:
+        ValueError: If an ordered item is missing from the model, or a quantity or
+            machine count is not a positive integer. All problems are reported together.
+    """
+    _check_order(model, order, machine_counts)
+
+    graph, consumers, rank = model['graph'], model['consumers'], model['rank']
+    machines, times = model['machines'], model['times']
+    machine_counts = machine_counts or {}
+
+    # Products in the order and everything they are made from, consumers first
+    products = set()
+    stack = [name for name in order if name in graph]
+    while stack:
+        if (node := stack.pop()) not in products:
+            products.add(node)
+            stack.extend(ingredient for ingredient, _ in graph[node] if ingredient in graph)
+    products = sorted(products, key=rank.get, reverse=True)
+
+    required = Counter({name: quantity for name, quantity in order.items() if name in graph})
+    batches = {}
+    critical_path = {}
+
+    for product in products:
+        batches[product] = math.ceil(required[product] / model['yields'][product])
+        for ingredient, quantity in graph[product]:
+            if ingredient in graph:
+                required[ingredient] += batches[product] * quantity
+
+        critical_path[product] = times[product] + max(
+            (critical_path[consumer] for consumer, _ in consumers.get(product, []) if consumer in critical_path),
+            default=0,
+        )
+
+    pending = {product: sum(ingredient in graph for ingredient, _ in graph[product]) for product in products}
+    not_started = dict(batches)
+    free_units = {}
+    ready = {}
+    running = []
+    now = 0
+
+    def make_ready(product):
+        machine = machines[product]
+        free_units.setdefault(machine, machine_counts.get(machine, 1))
+        heapq.heappush(ready.setdefault(machine, []), (-critical_path[product], product))
+
+    def dispatch(machine):
+        queue = ready.get(machine, [])
+        while free_units[machine] > 0 and queue:
+            product = queue[0][1]
+            free_units[machine] -= 1
+            heapq.heappush(running, (now + times[product], product))
+
+            not_started[product] -= 1
+            if not_started[product] == 0:
+                heapq.heappop(queue)
+
+    for product in products:
+        if pending[product] == 0:
+            make_ready(product)
+    for machine in list(ready):
+        dispatch(machine)
+
+    unfinished = dict(batches)
+
+    while running:
+        now, product = heapq.heappop(running)
+        machine = machines[product]
+        free_units[machine] += 1
+        unfinished[product] -= 1
+
+        if unfinished[product] == 0:
+            for consumer, _ in consumers.get(product, []):
+                if consumer in pending:
+                    pending[consumer] -= 1
+                    if pending[consumer] == 0:
+                        make_ready(consumer)
+                        dispatch(machines[consumer])
+
+        dispatch(machine)
+
+    return {'batches': batches, 'makespan': now}
+
+
+def evaluate_order(model, order, machine_counts=None):
+    """
+    Evaluates the raw materials, machine minutes and makespan of an order.
+
+    Args:
+        model (dict): Order model from `build_order_model`.
+        order (dict[str, int]): Quantity of each ordered item.
+        machine_counts (dict[str, int] | None): Number of units of each machine, one by
+            default.
+
+    Returns:
+        dict: The results of `explode_order` and `schedule_order` combined.
+
+    Raises:
+        ValueError: If the order or the machine counts are invalid, see `schedule_order`.
+    """
+    _check_order(model, order, machine_counts)
+
+    return {**explode_order(model, order), **schedule_order(model, order, machine_counts)}
+
+
+def build_valuation_model(items_df):
+    """
+    Extracts the per-item vectors used to value orders in bulk.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details, including
+            'name', 'production_cost', 'time' (in minutes) and 'experience'.
+
+    Returns:
+        dict: Index of item names and the matching 'production_cost', 'time' and
+        'experience' arrays.
+    """
+    return {
+        'names': pd.Index(items_df['name']),
+        'production_cost': items_df['production_cost'].to_numpy(dtype=np.float64),
+        'time': items_df['time'].to_numpy(dtype=np.float64),
+        'experience': items_df['experience'].to_numpy(dtype=np.float64),
+    }
+
+
+def _describe_rows(labels):
+    """
+    Lists the index labels of offending rows, up to `MAX_REPORTED_ROWS` of them.
+    """
+    listed = ', '.join(map(str, labels[:MAX_REPORTED_ROWS]))
+
+    return listed if len(labels) <= MAX_REPORTED_ROWS else f"{listed}... ({len(labels)} rows)"
+
+
+def value_orders(model, orders_df):
+    """
+    Values many orders at once from a long-format table.
+
+    The table has one row per ordered item, with the columns of `ORDER_TABLE_COLUMNS`.
+    The coin and experience rewards belong to the whole order and are read from the
+    first row of each order. Items are joined to the per-item vectors by position and
+    totalled per order with `np.bincount`, so there is no Python loop over orders.
+
+    An order costs the production cost of its items and takes the production time of
+    its items, made one after the other. Its experience is the reward plus the
+    experience of making the items.
+
+    Args:
+        model (dict): Per-item vectors from `build_valuation_model`.
+        orders_df (pd.DataFrame): Long-format table of orders.
+
+    Returns:
+        pd.DataFrame: One row per order, in order of first appearance, with 'order_id',
+        'coins', 'experience', 'production_cost', 'production_minutes', 'net_profit',
+        'profit_per_minute' and 'experience_per_minute'.
+
+    Raises:
+        ValueError: If columns are missing from `orders_df`, or listing every problem of
+            the rows: ordered items missing from the items or without a production
+            cost, and rows without an order ID.
+    """
+    if missing_columns := [column for column in ORDER_TABLE_COLUMNS if column not in orders_df.columns]:
+        raise ValueError(f"Columns missing from orders_df: {', '.join(missing_columns)}")
+
+    errors = []
+    rows = model['names'].get_indexer(orders_df['name'])
+
+    if (rows < 0).any():
+        missing_items = orders_df['name'].to_numpy()[rows < 0]
+        errors.append(f"Ordered items missing from items_df: {', '.join(map(str, pd.unique(missing_items)))}")
+
+    if (no_cost := (rows >= 0) & np.isnan(model['production_cost'][rows])).any():
+        errors.append(f"Ordered items without a production cost: "
+                      f"{', '.join(map(str, pd.unique(orders_df['name'].to_numpy()[no_cost])))} "
+                      f"(rows {_describe_rows(orders_df.index[no_cost])})")
+
+    order_ids = orders_df['order_id']
+    if (no_id := order_ids.isna() | (order_ids == '')).any():
+        errors.append(f"Rows without an order_id: {_describe_rows(orders_df.index[no_id.to_numpy()])}")
+
+    if errors:
+        raise ValueError('\n'.join(errors))
+
+    codes, order_ids = pd.factorize(orders_df['order_id'])
+    _, first_rows = np.unique(codes, return_index=True)
+    quantities = orders_df['quantity'].to_numpy(dtype=np.float64)
+
+    def per_order(values):
+        return np.bincount(codes, weights=quantities * values[rows], minlength=len(order_ids))
+
+    coins = orders_df['coins'].to_numpy(dtype=np.float64)[first_rows]
+    experience = orders_df['experience'].to_numpy(dtype=np.float64)[first_rows] + per_order(model['experience'])
+    production_cost = per_order(model['production_cost'])
+    production_minutes = per_order(model['time'])
+    net_profit = coins - production_cost
+
+    # Orders taking no production time get a per-minute value of zero
+    profit_per_minute = np.zeros(len(order_ids))
+    np.divide(net_profit, production_minutes, out=profit_per_minute, where=production_minutes > 0)
+    experience_per_minute = np.zeros(len(order_ids))
+    np.divide(experience, production_minutes, out=experience_per_minute, where=production_minutes > 0)
+
+    return pd.DataFrame({
+        'order_id': order_ids,
+        'coins': coins,
+        'experience': experience,
+        'production_cost': production_cost,
+        'production_minutes': production_minutes,
+        'net_profit': net_profit,
+        'profit_per_minute': profit_per_minute,
+        'experience_per_minute': experience_per_minute,
+    })
+
+
+def value_order_chunks(model, chunks):
+    """
+    Values a stream of order table chunks, such as `pd.read_csv(..., chunksize=...)`.
+
+    The rows of an order must be contiguous, but an order may be split across two
+    chunks: the rows of the last order of each chunk are held back and valued with the
+    next chunk.
+
+    Args:
+        model (dict): Per-item vectors from `build_valuation_model`.
+        chunks (Iterable[pd.DataFrame]): Consecutive chunks of a long-format order table.
+
+    Yields:
+        pd.DataFrame: Values of the orders completed so far, as returned by `value_orders`.
+    """
+    carried = None
+
+    for chunk in chunks:
+        if carried is not None:
+            chunk = pd.concat([carried, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+
+        last_order = chunk['order_id'].iloc[-1]
+        last_rows = (chunk['order_id'] == last_order).to_numpy()
+        carried = chunk[last_rows]
+
+        if not last_rows.all():
+            yield value_orders(model, chunk[~last_rows])
+
+    if carried is not None and not carried.empty:
+        yield value_orders(model, carried)
+
+
+def value_order_file(model, path, chunk_size=CHUNK_SIZE):
+    """
+    Values an order table stored in a CSV file, reading it in chunks.
+
+    Args:
+        model (dict): Per-item vectors from `build_valuation_model`.
+        path (str): Path of the CSV file, with the columns of `ORDER_TABLE_COLUMNS`.
+        chunk_size (int): Number of rows read at a time.
+
+    Yields:
+        pd.DataFrame: Values of the orders of each chunk, as returned by `value_orders`.
+    """
+    with pd.read_csv(path, chunksize=chunk_size) as reader:
+        yield from value_order_chunks(model, reader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expand orders into raw materials, machine minutes and makespan, "
+                                                 "or value a table of orders in bulk.")
+    parser.add_argument('orders', nargs='*', help="Orders such as '3 Cake, 2 Cheese'. Reads one order per line "
+                                                  "from standard input if omitted.")
+    parser.add_argument('--table', help="Value the orders of a long-format CSV table instead, with columns: "
+                                        f"{', '.join(ORDER_TABLE_COLUMNS)}. Results are written as CSV.")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows of the table read at a time.")
+    args = parser.parse_args()
+
+    config, items_df, recipes_df, _ = cached_preprocessing()
+
+    if args.table:
+        start = time.perf_counter()
+        valued = 0
+        for position, values in enumerate(value_order_file(build_valuation_model(items_df), args.table, args.chunk_size)):
+            values.to_csv(sys.stdout, header=position == 0, index=False)
+            valued += len(values)
+        print(f"\nValued {valued} orders in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+        return
+
+    model = build_order_model(items_df, recipes_df, config)
+
+    start = time.perf_counter()
+    evaluated = 0
+
+    for text in args.orders or (line for line in sys.stdin if line.strip()):
+        try:
+            result = evaluate_order(model, parse_order(text))
+        except ValueError as error:
+            print(f"{text.strip()}: {error}", file=sys.stderr)
+            continue
+
+        evaluated += 1
+        print(text.strip())
+        print(f"  Makespan: {result['makespan']} min")
+        print("  Raw materials: " + ', '.join(f"{amount:g} {name}" for name, amount in sorted(result['raw'].items())))
+        print("  Machine minutes: " + ', '.join(f"{machine} {minutes:g}" for machine, minutes
+                                                in sorted(result['machine_minutes'].items())))
+
+    print(f"\nEvaluated {evaluated} orders in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
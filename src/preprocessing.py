@@ -1,6 +1,21 @@
+import math
+import numpy as np
 import pandas as pd
 import yaml
 
+from compact import compact_tables, item_codes
+from graph import build_dependency_graph, topological_order
+from instrumentation import stage
+
+# Number of feeds produced by one feed recipe
+FEED_YIELD = 3
+
+# Max number of fruits you can get from one tree/bush
+TREE_YIELD = 13
+
+# Honeycomb is not grown from a tree or bush with a plant price
+HONEYCOMB_COST = 120 / 2.5
+
 def load_config(config_file: str) -> dict:
     """
     Loads a configuration file in YAML format.
@@ -15,24 +30,41 @@ def load_config(config_file: str) -> dict:
         return yaml.safe_load(file)
 
 
+@stage
 def load_data(config):
     """
     Loads data from CSV files into DataFrames.
 
+    The tables use the compact column types of `compact.compact_tables`: item names
+    are categoricals over one shared dictionary, other text columns are categoricals,
+    and numbers are stored as int32 or float32.
+
     Args:
         config (dict): Configuration dictionary containing file paths.
 
     Returns:
         tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: DataFrames for 
         items, recipes, and plants.
+
+    Raises:
+        ValueError: If several items share a name, since recipes refer to items by 
+            name. All duplicate names are reported together.
     """
     items_df = pd.read_csv(config['files']['items_csv'])
     recipes_df = pd.read_csv(config['files']['recipes_csv'])
     plants_df = pd.read_csv(config['files']['plants_csv'])
 
-    return items_df, recipes_df, plants_df 
+    if (duplicate_names := items_df.loc[items_df['name'].duplicated(), 'name'].unique()).size > 0:
+        raise ValueError(f"Duplicate item names in items_df: {', '.join(map(str, duplicate_names))}")
+
+    return compact_tables(items_df, recipes_df, plants_df)
+
 
+# Matches "Xd Yh", "Xh Ymin", "Xd", "Xh" and "Xmin" (spaces optional)
+TIME_PATTERN = r'^\s*(?:(?P<days>\d+)\s*d)?\s*(?:(?P<hours>\d+)\s*h)?\s*(?:(?P<minutes>\d+)\s*min)?\s*$'
 
+
+@stage
 def convert_time(items_df):
     """
     Converts time values in the 'time' column to minutes.
@@ -45,84 +77,115 @@ def convert_time(items_df):
         - "Xmin" → Keeps minutes as is.
         - "Instant" → Sets time to 0 minutes.
 
+    The distinct values of the column are parsed at once with a single regular 
+    expression and broadcast back to every row.
+
     Args:
         items_df (pd.DataFrame): DataFrame containing a 'time' column.
 
     Returns:
-        pd.DataFrame: Updated DataFrame with 'time' converted to minutes.
+        pd.DataFrame: Updated DataFrame with 'time' converted to int32 minutes.
 
     Raises:
-        ValueError: If an unrecognized time format is encountered.
-    """
-    for index, row in items_df.iterrows():
-        value = row['time']
-
-        if 'd' in value and 'h' in value:
-            days = int(value.split('d')[0].strip())
-            hours = int(value.split('d')[1].split('h')[0].strip())
-            items_df.at[index, 'time'] = (days * 24 + hours) * 60
-        elif 'h' in value and 'min' in value: 
-            hours = int(value.split('h')[0].strip()) 
-            minutes = int(value.split('h')[1].split('min')[0].strip())
-            items_df.at[index, 'time'] = hours * 60 + minutes
-        elif 'd' in value:  # Example: "1 d"
-            days = int(value.split('d')[0].strip())
-            items_df.at[index, 'time'] = days * 24 * 60
-        elif 'h' in value:  # Example: "8 h"
-            hours = int(value.split('h')[0].strip()) 
-            items_df.at[index, 'time'] = hours * 60
-        elif 'min' in value:  # Example: "45 min"
-            minutes = int(value.split('min')[0].strip())
-            items_df.at[index, 'time'] = minutes
-        elif 'Instant' in value:
-            items_df.at[index, 'time'] = 0
-        else:
-            raise ValueError(f"Unrecognized time format: {value}")
-        
-    items_df['time'] = items_df['time'].round(0)
+        ValueError: If unrecognized time formats are encountered. All malformed values 
+            are reported together with their row numbers.
+    """
+    codes, unique_values = pd.factorize(items_df['time'])
+
+    time_values = pd.Series(unique_values, dtype='string')
+    parts = time_values.str.extract(TIME_PATTERN).astype('Int64')
+
+    instant = (time_values.str.strip() == 'Instant').fillna(False)
+    malformed = ~(parts.notna().any(axis=1) | instant).to_numpy()
+
+    # Missing values are not factorized and get the code -1
+    if (malformed_rows := malformed[codes] | (codes == -1)).any():
+        malformed_values = ', '.join(f"row {row}: {value!r}" for row, value in items_df.loc[malformed_rows, 'time'].items())
+        raise ValueError(f"Unrecognized time formats: {malformed_values}")
+
+    minutes = (parts['days'].fillna(0) * 24 + parts['hours'].fillna(0)) * 60 + parts['minutes'].fillna(0)
+
+    items_df['time'] = minutes.to_numpy(dtype='int32')[codes]
 
     return items_df
 
 
-def calculate_production_cost(items_df, recipes_df):
+def build_cost_index(items_df):
     """
-    Calculates the production cost of each product based on its ingredients.
+    Builds a name → market cost lookup from `items_df`.
 
-    This function computes the total cost of producing each product by summing the 
-    costs of its ingredients, considering their respective quantities in the recipe.
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name' and 'cost'.
+            Names must be unique, as checked by `load_data`.
+
+    Returns:
+        pd.Series: Market cost of each item, indexed by item name.
+    """
+    return pd.Series(items_df['cost'].values, index=items_df['name'], name='cost')
+
+
+def aggregate_recipe_costs(recipes_df, cost_index):
+    """
+    Sums the ingredient costs of every product in `recipes_df` in one grouped pass.
+
+    Each recipe row is priced through `cost_index` and weighted by its quantity, 
+    then the rows are aggregated per product. Names are resolved to integer positions 
+    once per distinct name (see `compact.item_codes`), so both steps work on arrays.
 
     Args:
-        items_df (pd.DataFrame): DataFrame containing item details, including 'item_id' and 'cost'.
         recipes_df (pd.DataFrame): DataFrame containing recipe details, with 'product', 
             'ingredient', and 'quantity' columns.
+        cost_index (pd.Series): Cost of each ingredient, indexed by name.
 
     Returns:
-        pd.DataFrame: Updated `items_df` with an additional 'production_cost' column.
+        pd.Series: Total ingredient cost of each product, indexed by product name.
 
     Raises:
-        IndexError: If an ingredient in `recipes_df` is not found in `items_df`.
+        ValueError: If any ingredient in `recipes_df` is not found in `cost_index`. 
+            All missing ingredients are reported together.
     """
+    ingredients = item_codes(recipes_df['ingredient'], cost_index.index)
+
+    if (missing_ingredients := pd.unique(recipes_df['ingredient'].to_numpy(dtype=object)[ingredients == -1])).size > 0:
+        raise ValueError(f"Ingredients in recipes_df missing from items_df: {', '.join(missing_ingredients)}")
+
+    row_costs = cost_index.to_numpy(dtype=float)[ingredients] * recipes_df['quantity'].to_numpy()
+
+    # Missing costs count as zero, like a grouped sum
+    products, product_names = pd.factorize(recipes_df['product'])
+    product_costs = np.bincount(products, weights=np.nan_to_num(row_costs), minlength=len(product_names))
 
-    product_costs = {}
+    return pd.Series(product_costs, index=pd.Index(product_names, dtype=object))
 
-    for product in recipes_df['product'].unique():
-        product_recipe = recipes_df[recipes_df['product'] == product]
-        total_cost = 0
 
-        for _, row in product_recipe.iterrows():
+@stage
+def calculate_production_cost(items_df, recipes_df):
+    """
+    Calculates the production cost of each product based on its ingredients.
 
-            if not any(items_df['name'] == row['ingredient']): 
-                raise ValueError(f"Ingredient '{row['ingredient']}' in recipes_df is missing from items_df")
+    This function computes the total cost of producing each product by summing the 
+    costs of its ingredients, considering their respective quantities in the recipe.
+    Ingredient costs are looked up through a single name → cost index and the 
+    recipes are aggregated per product in one grouped pass.
 
-            ingredient_cost = items_df.loc[items_df['name'] == row['ingredient'], 'cost'].values[0]
-            total_cost += ingredient_cost * row['quantity']
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name' and 'cost'.
+        recipes_df (pd.DataFrame): DataFrame containing recipe details, with 'product', 
+            'ingredient', and 'quantity' columns.
+
+    Returns:
+        pd.DataFrame: Updated `items_df` with an additional 'production_cost' column.
 
-        product_costs[product] = total_cost
+    Raises:
+        ValueError: If any ingredient in `recipes_df` is not found in `items_df`.
+    """
+    product_costs = aggregate_recipe_costs(recipes_df, build_cost_index(items_df))
 
-    items_df['production_cost'] = items_df['name'].map(product_costs)
+    items_df['production_cost'] = items_df['name'].astype(object).map(product_costs)
 
     return items_df
 
+@stage
 def update_cost_from_treesnbush(items_df, plants_df):
     """ 
     Updates the production cost of items based on tree and bush plant prices.
@@ -150,11 +213,11 @@ def update_cost_from_treesnbush(items_df, plants_df):
     fruit_cost_map = dict(zip(plants_df['fruit'], plants_df['plantprice']))
 
     items_df.loc[items_df['name'].isin(fruit_cost_map.keys()), 'production_cost'] = (
-        items_df.loc[items_df['name'].isin(fruit_cost_map.keys()), 'name'].map(fruit_cost_map) / 13
+        items_df.loc[items_df['name'].isin(fruit_cost_map.keys()), 'name'].astype(object).map(fruit_cost_map) / TREE_YIELD
     )
 
     # Hard code for Honeycomb since it's a special case
-    items_df.loc[items_df['name'] == 'Honeycomb', 'production_cost'] = 120 / 2.5
+    items_df.loc[items_df['name'] == 'Honeycomb', 'production_cost'] = HONEYCOMB_COST
 
     return items_df
 
@@ -178,7 +241,7 @@ def update_feed_price(items_df, feed_to_item_map):
     
     for feed in feed_names:
         feed_price = items_df.loc[items_df['name'] == feed, 'production_cost'].values[0]
-        items_df.loc[items_df['name'] == feed, 'production_cost'] = feed_price / 3
+        items_df.loc[items_df['name'] == feed, 'production_cost'] = feed_price / FEED_YIELD
 
     return items_df
 
@@ -206,6 +269,7 @@ def update_item_production_cost(items_df, feed_to_item_map):
     return items_df
 
 
+@stage
 def update_cost_for_feed(items_df, feed_to_item_map):
     """
     Updates the production cost of feed items and assigns their cost to dependent items.
@@ -233,6 +297,7 @@ def update_cost_for_feed(items_df, feed_to_item_map):
 
     return items_df
 
+@stage
 def update_items_with_no_cost(items_df):
     """
     Assigns a production cost of 0 to items that should not have a cost.
@@ -258,6 +323,117 @@ def update_items_with_no_cost(items_df):
 
     return items_df
 
+def find_cost_leaves(items_df, plants_df):
+    """
+    Finds the items whose production cost does not depend on any recipe.
+
+    These are the leaves of the recipe graph: fruits priced from their tree or bush 
+    (see `update_cost_from_treesnbush`) and items from machines that do not require 
+    material costs (see `update_items_with_no_cost`).
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name' 
+            and 'machine'.
+        plants_df (pd.DataFrame): DataFrame containing plant details, including 'fruit' 
+            and 'plantprice'.
+
+    Returns:
+        dict[str, float]: Production cost of each leaf item, keyed by name.
+    """
+    leaves_df = items_df[['name', 'machine']].assign(production_cost=float('nan'))
+    leaves_df = update_cost_from_treesnbush(leaves_df, plants_df)
+    leaves_df = update_items_with_no_cost(leaves_df)
+    leaves_df = leaves_df.dropna(subset=['production_cost'])
+
+    return dict(zip(leaves_df['name'], leaves_df['production_cost']))
+
+
+def evaluate_true_costs(graph, order, market_costs, feed_names, memo):
+    """
+    Evaluates the true production cost of every node of the recipe graph.
+
+    Nodes are visited in `order` (ingredients before products) and each cost is memoized, 
+    so every node is computed exactly once and every recipe edge is read once. A product 
+    costs the sum of the true costs of its ingredients, and feeds are divided by 
+    `FEED_YIELD`. Ingredients that are neither in `memo` nor products are priced at their 
+    market cost. Costs are rounded to whole coins as they are computed, like the final 
+    `production_cost` column.
+
+    Args:
+        graph (dict[str, list[tuple[str, float]]]): Ingredients and quantities of each product.
+        order (list[str]): Nodes to evaluate, ingredients before products.
+        market_costs (dict[str, float]): Market cost of each item.
+        feed_names (set[str]): Names of the feed items.
+        memo (dict[str, float]): Already known costs, such as the leaves. Nodes found in 
+            it are not recomputed.
+
+    Returns:
+        dict[str, float]: `memo`, updated with the true production cost of each product.
+    """
+    for node in order:
+        if node in memo:
+            continue
+
+        if node in graph:
+            total_cost = sum(
+                quantity * memo.get(ingredient, market_costs.get(ingredient, float('nan')))
+                for ingredient, quantity in graph[node]
+            )
+            if node in feed_names:
+                total_cost /= FEED_YIELD
+            memo[node] = round(total_cost)
+
+    return memo
+
+
+@stage
+def calculate_true_production_cost(items_df, recipes_df, plants_df, config):
+    """
+    Calculates the full bill-of-materials production cost of each item.
+
+    Unlike `calculate_production_cost`, which prices ingredients at their market cost, 
+    this walks the recipe graph in topological order so that every ingredient is priced 
+    at what it costs to make. Fruits, Honeycomb and items from no-cost machines are 
+    treated as leaves, and animal products cost as much as one of their feeds.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name', 
+            'cost' and 'machine'.
+        recipes_df (pd.DataFrame): DataFrame containing recipe details, with 'product', 
+            'ingredient', and 'quantity' columns.
+        plants_df (pd.DataFrame): DataFrame containing plant details, including 'fruit' 
+            and 'plantprice'.
+        config (dict): Configuration dictionary containing mappings such as 'animal_feed'.
+
+    Returns:
+        pd.DataFrame: Updated `items_df` with an additional 'production_cost' column.
+
+    Raises:
+        ValueError: If an ingredient or feed is missing from `items_df`, or if the 
+            recipes contain a cycle.
+    """
+    feed_to_item_map = config.get('animal_feed', {})
+
+    if (missing_ingredients := recipes_df.loc[~recipes_df['ingredient'].isin(items_df['name']), 'ingredient'].unique()).size > 0:
+        raise ValueError(f"Ingredients in recipes_df missing from items_df: {', '.join(missing_ingredients)}")
+
+    if len(missing_feeds := set(feed_to_item_map.keys()) - set(items_df['name'])) > 0:
+        raise ValueError(f"Feeds missing from items_df: {', '.join(missing_feeds)}")
+
+    graph = build_dependency_graph(recipes_df, feed_to_item_map)
+    leaf_costs = {name: round(cost) for name, cost in find_cost_leaves(items_df, plants_df).items()}
+
+    true_costs = evaluate_true_costs(graph, 
+                                     topological_order(graph), 
+                                     dict(zip(items_df['name'], items_df['cost'])), 
+                                     set(feed_to_item_map),
+                                     leaf_costs)
+
+    items_df['production_cost'] = items_df['name'].astype(object).map(true_costs)
+
+    return items_df
+
+@stage
 def update_costs(items_df, recipes_df, plants_df, config):
     """
     Calculates the production cost of items based on recipes, plant prices, and feed costs.
@@ -268,24 +444,32 @@ def update_costs(items_df, recipes_df, plants_df, config):
     - Costs of animal feed, adjusted after dividing by 3.
     - Zero-cost assignments for items from specific machines.
 
+    If `true_cost` is enabled in the config, ingredients are priced at their own 
+    production cost instead of their market cost (see `calculate_true_production_cost`).
+
     Args:
         items_df (pd.DataFrame): DataFrame containing item details.
         recipes_df (pd.DataFrame): DataFrame with recipe information for crafting items.
         plants_df (pd.DataFrame): DataFrame with plant price data for fruit-based items.
-        config (dict): Configuration dictionary containing mappings such as 'animal_feed'.
+        config (dict): Configuration dictionary containing mappings such as 'animal_feed' 
+            and the optional 'true_cost' flag.
 
     Returns:
         pd.DataFrame: Updated `items_df` with the calculated 'production_cost'.
     """
-    items_df = calculate_production_cost(items_df, recipes_df)
-    items_df = update_cost_from_treesnbush(items_df, plants_df)
-    items_df = update_cost_for_feed(items_df, config.get('animal_feed', {}))
-    items_df = update_items_with_no_cost(items_df)
+    if config.get('true_cost', False):
+        items_df = calculate_true_production_cost(items_df, recipes_df, plants_df, config)
+    else:
+        items_df = calculate_production_cost(items_df, recipes_df)
+        items_df = update_cost_from_treesnbush(items_df, plants_df)
+        items_df = update_cost_for_feed(items_df, config.get('animal_feed', {}))
+        items_df = update_items_with_no_cost(items_df)
 
     items_df['production_cost'] = items_df['production_cost'].round(0)
 
     return items_df
 
+@stage
 def calculate_profit_and_experience_per_minute(items_df):
     """
     Calculates profit and experience gain per minute for each item.
@@ -312,6 +496,110 @@ def calculate_profit_and_experience_per_minute(items_df):
     return items_df
 
 
+def evaluate_chain_times(graph, order, times, feed_names, serial_times, parallel_times):
+    """
+    Evaluates the serial and parallel chain times of the nodes in `order`.
+
+    See `calculate_chain_times` for the definitions. The chain times of ingredients 
+    that are not in `order` are read from `serial_times` and `parallel_times`, which 
+    are updated in place, so a subset of the graph can be re-evaluated on its own.
+
+    Args:
+        graph (dict[str, list[tuple[str, float]]]): Ingredients and quantities of each product.
+        order (list[str]): Nodes to evaluate, ingredients before the products using them.
+        times (dict[str, float]): Production time of each item, in minutes.
+        feed_names (set[str]): Names of the feeds, made `FEED_YIELD` at a time.
+        serial_times (dict[str, float]): Known serial chain times.
+        parallel_times (dict[str, float]): Known parallel chain times.
+
+    Returns:
+        tuple[dict[str, float], dict[str, float]]: The updated serial and parallel chain times.
+    """
+    def batch_yield(node):
+        return FEED_YIELD if node in feed_names else 1
+
+    for node in order:
+        ingredients = graph.get(node, [])
+        time = times.get(node, float('nan'))
+
+        serial_times[node] = (time + sum(quantity * serial_times[ingredient] 
+                                         for ingredient, quantity in ingredients)) / batch_yield(node)
+        parallel_times[node] = time + max(
+            (parallel_times[ingredient] + (math.ceil(quantity / batch_yield(ingredient)) - 1) * times.get(ingredient, float('nan'))
+             for ingredient, quantity in ingredients),
+            default=0
+        )
+
+    return serial_times, parallel_times
+
+
+@stage
+def calculate_chain_times(items_df, recipes_df, config):
+    """
+    Calculates how long each item takes to make when its ingredients are made too.
+
+    Two times are computed over the recipe graph, animal products included:
+    - `serial_chain_time`: the item's own time plus the serial chain time of every
+      ingredient unit, i.e. the total work when everything is made one after the other.
+    - `parallel_chain_time`: the item's own time plus the longest ingredient chain,
+      assuming different machines work in parallel while units of the same ingredient
+      are made one after the other on its machine.
+
+    Items without a recipe only count their own time. A feed recipe yields `FEED_YIELD`
+    feeds, so one feed accounts for a third of its serial chain time, and a recipe
+    needing a few feeds waits for the whole batches that make them. Nodes are visited
+    in topological order and memoized, so the whole catalogue is computed in one pass
+    over the recipe edges.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name' 
+            and 'time' (in minutes).
+        recipes_df (pd.DataFrame): DataFrame containing recipe details, with 'product', 
+            'ingredient', and 'quantity' columns.
+        config (dict): Configuration dictionary containing mappings such as 'animal_feed'.
+
+    Returns:
+        pd.DataFrame: Updated `items_df` with additional 'serial_chain_time' and 
+        'parallel_chain_time' columns, in minutes.
+    """
+    feed_to_item_map = config.get('animal_feed', {})
+    graph = build_dependency_graph(recipes_df, feed_to_item_map)
+
+    serial_times, parallel_times = evaluate_chain_times(graph, 
+                                                        topological_order(graph), 
+                                                        dict(zip(items_df['name'], items_df['time'])), 
+                                                        set(feed_to_item_map), 
+                                                        {}, {})
+
+    items_df['serial_chain_time'] = items_df['name'].astype(object).map(serial_times).fillna(items_df['time'])
+    items_df['parallel_chain_time'] = items_df['name'].astype(object).map(parallel_times).fillna(items_df['time'])
+
+    return items_df
+
+
+@stage
+def calculate_chain_profit_per_minute(items_df):
+    """
+    Calculates profit per minute over the serial and parallel chain times of each item.
+
+    Items with zero chain time are assigned a per-minute value of zero, like
+    `calculate_profit_and_experience_per_minute`.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 
+            'total_profit', 'serial_chain_time' and 'parallel_chain_time'.
+
+    Returns:
+        pd.DataFrame: Updated `items_df` with 'serial_profit_per_minute' and 
+        'parallel_profit_per_minute' columns.
+    """
+    for chain in ['serial', 'parallel']:
+        chain_time = items_df[f'{chain}_chain_time']
+        items_df[f'{chain}_profit_per_minute'] = (items_df['total_profit'] / chain_time).where(chain_time > 0, 0)
+
+    return items_df
+
+
 def generate_rare_ingredients(config):
     """
     Generates a list of ingredient names that are marked as rare (`True`) in the config.
@@ -338,33 +626,102 @@ def generate_rare_ingredients(config):
     return rare_ingredients
 
 
-def run_preprocessing():
+@stage
+def annotate_rare_ingredients(items_df, recipes_df, rare_ingredients):
+    """
+    Adds a column describing the rare ingredients used by each product.
+
+    The descriptions (e.g. "2 Apple, 1 Honey") are built for every product in one 
+    grouped aggregation over `recipes_df`, in recipe order. Products without rare 
+    ingredients get an empty string.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name'.
+        recipes_df (pd.DataFrame): DataFrame containing recipe details, with 'product', 
+            'ingredient', and 'quantity' columns.
+        rare_ingredients (List[str]): List of rare ingredient names.
+
+    Returns:
+        pd.DataFrame: Updated `items_df` with an additional 'rare_ingredients' column.
+    """
+    rare_recipes = recipes_df[recipes_df['ingredient'].isin(rare_ingredients)]
+
+    descriptions = (
+        (rare_recipes['quantity'].astype(str) + ' ' + rare_recipes['ingredient'].astype(str))
+        .groupby(rare_recipes['product'], sort=False, observed=True)
+        .agg(', '.join)
+    )
+
+    items_df['rare_ingredients'] = items_df['name'].astype(object).map(descriptions).fillna('')
+
+    return items_df
+
+
+@stage
+def process_items(items_df, recipes_df, plants_df, config):
+    """
+    Runs the configuration-dependent steps of the pipeline on loaded data.
+
+    Costs, per-minute values, chain times and rare ingredient descriptions all depend 
+    on the configuration, while loading the files and converting times do not. Callers 
+    evaluating several configurations against the same data can therefore load and 
+    convert it once and call this function for each configuration.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, with 'time' in minutes.
+        recipes_df (pd.DataFrame): DataFrame containing recipe details.
+        plants_df (pd.DataFrame): DataFrame containing plant details.
+        config (dict): Configuration dictionary.
+
+    Returns:
+        tuple[pd.DataFrame, List[str]]: The processed `items_df` and the rare ingredient names.
+    """
+    items_df = update_costs(items_df, recipes_df, plants_df, config)
+    items_df = calculate_profit_and_experience_per_minute(items_df)
+    items_df = calculate_chain_times(items_df, recipes_df, config)
+    items_df = calculate_chain_profit_per_minute(items_df)
+
+    rare_ingredients=generate_rare_ingredients(config)
+    items_df = annotate_rare_ingredients(items_df, recipes_df, rare_ingredients)
+
+    return items_df, rare_ingredients
+
+
+@stage
+def run_preprocessing(config_file="config.yaml"):
     """
     Runs the full preprocessing pipeline for item, recipe, and plant data.
 
     This function:
-    1. Loads configuration settings from 'config.yaml'.
+    1. Loads configuration settings from `config_file`.
     2. Reads the necessary CSV files into DataFrames.
     3. Converts time values in `items_df` to minutes.
     4. Updates production costs based on recipes and plant data.
-    5. Computes profit per minute and experience per minute.
-    6. Identifies rare ingredients based on the configuration.
+    5. Computes profit per minute and experience per minute, also over the time 
+       needed to make the ingredients.
+    6. Identifies rare ingredients based on the configuration and describes the ones 
+       used by each product.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
 
     Returns:
         tuple: A tuple containing:
             - config (dict): The loaded configuration.
-            - items_df (pd.DataFrame): Processed DataFrame containing item details.
+            - items_df (pd.DataFrame): Processed DataFrame containing item details, 
+              including the 'rare_ingredients' descriptions.
             - recipes_df (pd.DataFrame): DataFrame containing recipe details.
             - rare_ingredients (List[int]): List of product IDs for rare ingredients.
     """
-    config = load_config("config.yaml")
+    config = load_config(config_file)
 
     items_df, recipes_df, plants_df = load_data(config)
 
     items_df = convert_time(items_df)
-    items_df = update_costs(items_df, recipes_df, plants_df, config)
-    items_df = calculate_profit_and_experience_per_minute(items_df)
+    items_df, rare_ingredients = process_items(items_df, recipes_df, plants_df, config)
+
+    return config, items_df, recipes_df, rare_ingredients
 
-    rare_ingredients=generate_rare_ingredients(config)
 
-    return config, items_df, recipes_df, rare_ingredients
\ No newline at end of file
+if __name__ == "__main__":
+    run_preprocessing()
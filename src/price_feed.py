@@ -0,0 +1,357 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from bisect import bisect_left, insort
+
+import numpy as np
+
+from cache import cached_preprocessing
+from incremental import DELTA_FIELDS, apply_deltas, build_dependency_index, find_invalid_deltas
+from machine import SORT_MAPPING
+from preprocessing import load_data
+from ranking import parse_sort, ranking_keys
+from scheduler import parse_session
+
+# Bytes read from the feed at once. Every complete line read is applied as one batch
+READ_SIZE = 1 << 16
+
+
+def parse_update(line):
+    """
+    Parses a feed line into the changes it carries.
+
+    A line is a JSON object naming an `item` (or a tree or bush for `plantprice`) and
+    giving any of its new `cost`, `plantprice` or `time`, e.g.
+    `{"item": "Milk", "cost": 40, "time": "25min"}`. Times are minutes or strings in
+    the formats of items.csv.
+
+    Args:
+        line (str): JSON line.
+
+    Returns:
+        list[tuple[str, str, float]]: Name, field and new value of each change.
+
+    Raises:
+        ValueError: If the line is not a JSON object, has no `item`, no change, unknown
+            fields or values that are not numbers.
+    """
+    try:
+        update = json.loads(line)
+    except json.JSONDecodeError as error:
+        raise ValueError(f"Invalid JSON: {error}")
+
+    if not isinstance(update, dict) or not isinstance(update.get('item'), str):
+        raise ValueError("An update must be a JSON object with an 'item' name")
+
+    name = update.pop('item')
+    if unknown_fields := [field for field in update if field not in DELTA_FIELDS]:
+        raise ValueError(f"Unknown update fields: {', '.join(unknown_fields)}. "
+                         f"Expected any of: {', '.join(DELTA_FIELDS)}")
+
+    if not update:
+        raise ValueError(f"No change given for '{name}'")
+
+    deltas = []
+    for field, value in update.items():
+        if field == 'time' and isinstance(value, str):
+            value = parse_session(value)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Invalid {field} for '{name}': {value!r}")
+        deltas.append((name, field, value))
+
+    return deltas
+
+
+def build_live_rankings(config, items_df, criterion):
+    """
+    Ranks the products of every available machine in sorted lists kept up to date.
+
+    Each product has a sort key (its `ranking_keys`, then its row position to break
+    ties like `rank_rows` does), and each machine a sorted list of its products' keys,
+    so moving a product costs a binary search and a list shift.
+
+    Args:
+        config (dict): Configuration containing settings like which machines to ignore.
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        criterion (str | list[str] | dict[str, float]): Ranking criterion, as returned
+            by `parse_sort`.
+
+    Returns:
+        dict: A dictionary containing:
+            - criterion: The ranking criterion.
+            - keys (dict[int, tuple]): Current sort key of each ranked row.
+            - machine_of (dict[int, str]): Machine of each ranked row.
+            - machines (dict[str, list[tuple]]): Sorted keys of each machine, best first.
+    """
+    rows = np.flatnonzero(~items_df['machine'].isin(config.get('ignore_machines', [])).to_numpy())
+    machine_of = dict(zip(rows.tolist(), items_df['machine'].to_numpy()[rows]))
+    keys = dict(zip(rows.tolist(), zip(*[key.tolist() for key in ranking_keys(items_df, rows, criterion)],
+                                        rows.tolist())))
+
+    machines = {}
+    for row, key in keys.items():
+        machines.setdefault(machine_of[row], []).append(key)
+    for ranking in machines.values():
+        ranking.sort()
+
+    return {'criterion': criterion, 'keys': keys, 'machine_of': machine_of, 'machines': machines}
+
+
+def machine_ranking(live, machine):
+    """
+    Returns the current ranking of a machine.
+
+    Args:
+        live (dict): Live rankings from `build_live_rankings`.
+        machine (str): Name of the machine.
+
+    Returns:
+        list[int]: Row positions of the machine's products, best first.
+    """
+    return [key[-1] for key in live['machines'].get(machine, [])]
+
+
+def update_rankings(live, items_df, rows):
+    """
+    Moves updated products to their new place and reports the ranks that changed.
+
+    Only the machines of products whose key changed are compared with their previous
+    ranking, and a product is only reported when its rank differs, not when its
+    values changed without overtaking or falling behind another product.
+
+    Args:
+        live (dict): Live rankings from `build_live_rankings`, updated in place.
+        items_df (pd.DataFrame): Preprocessed DataFrame with the updated values.
+        rows (Iterable[int]): Positions of the updated rows in `items_df`.
+
+    Returns:
+        list[dict]: One event per product whose rank changed, with its 'machine',
+        'name', 'old_rank' and 'new_rank' (1 for the best product of the machine).
+    """
+    rows = np.array([row for row in rows if row in live['keys']], dtype=np.int64)
+    if len(rows) == 0:
+        return []
+
+    new_keys = zip(*[key.tolist() for key in ranking_keys(items_df, rows, live['criterion'])], rows.tolist())
+    previous = {}
+
+    for row, key in zip(rows.tolist(), new_keys):
+        if key == (old_key := live['keys'][row]):
+            continue
+
+        machine = live['machine_of'][row]
+        ranking = live['machines'][machine]
+        if machine not in previous:
+            previous[machine] = machine_ranking(live, machine)
+
+        ranking.pop(bisect_left(ranking, old_key))
+        insort(ranking, key)
+        live['keys'][row] = key
+
+    names = items_df['name'].to_numpy()
+    events = []
+
+    for machine, before in previous.items():
+        after = machine_ranking(live, machine)
+
+        # A product whose rank changed leaves a different product at its old place
+        moved = [rank for rank, (old_row, new_row) in enumerate(zip(before, after)) if old_row != new_row]
+        old_ranks = {before[rank]: rank for rank in moved}
+        new_ranks = {after[rank]: rank for rank in moved}
+
+        events.extend({'machine': machine, 'name': names[row], 'old_rank': old_ranks[row] + 1,
+                       'new_rank': new_ranks[row] + 1} for row in after if row in old_ranks)
+
+    return events
+
+
+def subscribe(feed, callback):
+    """
+    Registers a callback receiving every rank change event of the feed.
+
+    Args:
+        feed (dict): Feed state from `start_feed`.
+        callback (Callable[[dict], None]): Called with each event of `update_rankings`.
+    """
+    feed['subscribers'].append(callback)
+
+
+def start_feed(config_file="config.yaml", sort_criterion='profit_per_minute'):
+    """
+    Loads the preprocessed data and ranks every machine, ready to apply a feed.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+        sort_criterion (str | list[str] | dict[str, float]): Ranking criterion, as
+            returned by `parse_sort`.
+
+    Returns:
+        dict: Feed state with the 'config', the 'items_df', 'recipes_df' and
+        'plants_df' tables, the dependency 'index', the live 'rankings', the
+        'positions' of the items by name and the 'subscribers'.
+    """
+    config, items_df, recipes_df, _ = cached_preprocessing(config_file)
+    _, _, plants_df = load_data(config)
+    items_df = items_df.reset_index(drop=True)
+
+    return {
+        'config': config,
+        'items_df': items_df,
+        'recipes_df': recipes_df,
+        'plants_df': plants_df,
+        'index': build_dependency_index(recipes_df, config),
+        'rankings': build_live_rankings(config, items_df, sort_criterion),
+        'positions': dict(zip(items_df['name'], items_df.index)),
+        'subscribers': [],
+    }
+
+
+def apply_updates(feed, deltas, errors=sys.stderr):
+    """
+    Applies a batch of changes, re-ranks the affected products and notifies subscribers.
+
+    The batch is applied at once, recomputing every affected row a single time.
+    Invalid changes are reported on `errors` and skipped.
+
+    Args:
+        feed (dict): Feed state from `start_feed`.
+        deltas (list[tuple[str, str, float]]): Name, field and new value of each change.
+        errors (TextIO): Stream invalid changes are reported to.
+
+    Returns:
+        list[dict]: The rank change events sent to the subscribers.
+    """
+    invalid = find_invalid_deltas(feed['items_df'], feed['plants_df'], deltas)
+    for (name, field, _), error in invalid:
+        print(f"Update '{name}' {field}: {error}", file=errors)
+
+    skipped = {delta for delta, _ in invalid}
+    affected = apply_deltas(feed['items_df'], feed['recipes_df'], feed['plants_df'], feed['index'],
+                            [delta for delta in deltas if delta not in skipped])
+
+    events = update_rankings(feed['rankings'], feed['items_df'],
+                             [feed['positions'][name] for name in affected if name in feed['positions']])
+
+    for callback in feed['subscribers']:
+        for event in events:
+            callback(event)
+
+    return events
+
+
+def open_feed(source):
+    """
+    Opens a feed and returns a function reading the bytes received so far.
+
+    Args:
+        source (str): "-" for standard input (e.g. a pipe), "tcp://HOST:PORT" or
+            "unix://PATH" for a local socket to connect to, or the path of a file.
+
+    Returns:
+        Callable[[int], bytes]: Reads up to the given number of bytes, blocking until
+        some are available, and returns b"" at the end of the feed.
+    """
+    if source == '-':
+        return lambda size: os.read(sys.stdin.fileno(), size)
+
+    if source.startswith('tcp://'):
+        host, port = source[len('tcp://'):].rsplit(':', 1)
+        return socket.create_connection((host, int(port))).recv
+
+    if source.startswith('unix://'):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(source[len('unix://'):])
+        return connection.recv
+
+    file = open(source, 'rb')
+    return file.read1
+
+
+def read_batches(read, read_size=READ_SIZE):
+    """
+    Groups the lines of a feed by the reads that completed them.
+
+    A slow feed yields each line as it arrives, while a fast one yields every line
+    received since the last read at once, so batches grow with the feed rate.
+
+    Args:
+        read (Callable[[int], bytes]): Reader from `open_feed`.
+        read_size (int): Maximum number of bytes read at once.
+
+    Yields:
+        list[str]: The non-blank lines completed by a read.
+    """
+    pending = b''
+
+    while chunk := read(read_size):
+        *lines, pending = (pending + chunk).split(b'\n')
+        if lines := [line.decode() for line in lines if line.strip()]:
+            yield lines
+
+    if pending.strip():
+        yield [pending.decode()]
+
+
+def run_feed(feed, source, errors=sys.stderr):
+    """
+    Applies a feed of updates until it ends.
+
+    Args:
+        feed (dict): Feed state from `start_feed`.
+        source (str): Feed to read, see `open_feed`.
+        errors (TextIO): Stream invalid lines and changes are reported to.
+
+    Returns:
+        dict: Number of 'updates' applied, 'invalid' lines, rank change 'events' and
+        'seconds' spent.
+    """
+    stats = {'updates': 0, 'invalid': 0, 'events': 0}
+    start = time.perf_counter()
+
+    for lines in read_batches(open_feed(source)):
+        deltas = []
+        for line in lines:
+            try:
+                deltas.extend(parse_update(line))
+            except ValueError as error:
+                print(f"Invalid update {line!r}: {error}", file=errors)
+                stats['invalid'] += 1
+
+        stats['events'] += len(apply_updates(feed, deltas, errors))
+        stats['updates'] += len(lines)
+
+    stats['seconds'] = time.perf_counter() - start
+
+    return stats
+
+
+def print_event(event):
+    """
+    Prints a rank change event, e.g. "Bakery: Bread 3 -> 1".
+    """
+    print(f"{event['machine']}: {event['name']} {event['old_rank']} -> {event['new_rank']}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-rank products live from a feed of price and time updates.")
+    parser.add_argument('source', nargs='?', default='-',
+                        help="Feed to read: a file, '-' for standard input, tcp://HOST:PORT or unix://PATH.")
+    parser.add_argument('--config', default='config.yaml', help="Path to the YAML configuration file.")
+    parser.add_argument('--sort', default='profit_per_minute', help="Sort column, columns or weighted score.")
+    parser.add_argument('--quiet', action='store_true', help="Only print a summary when the feed ends.")
+    args = parser.parse_args()
+
+    feed = start_feed(args.config, parse_sort(args.sort, SORT_MAPPING.values()))
+    if not args.quiet:
+        subscribe(feed, print_event)
+
+    stats = run_feed(feed, args.source)
+    print(f"{stats['updates']} updates ({stats['invalid']} invalid), {stats['events']} rank changes "
+          f"in {stats['seconds']:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from columnar import export_tables, load_tables
+from machine import SORT_MAPPING, sort_machine_products
+from preprocessing import load_config, load_data, convert_time, process_items
+from queries import DISPLAY_COLUMNS
+from ranking import parse_sort
+
+# Settings a profile may override; any other one is taken from the base config
+PROFILE_SETTINGS = ['rare_ingredients', 'ignore_machines', 'animal_feed', 'true_cost', 'prices']
+
+# Tables of the base data, exported for the worker processes to memory-map
+BASE_TABLES = ['items_df', 'recipes_df', 'plants_df']
+
+# Base data of the worker processes, set once per worker by `_init_worker`
+_base = None
+
+
+def load_base(config_file="config.yaml"):
+    """
+    Loads and parses the data shared by every profile.
+
+    Reading the files and converting the times do not depend on the profile, so they
+    are done once for all profiles.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+
+    Returns:
+        dict: The base 'config', and the 'items_df', 'recipes_df' and 'plants_df' tables.
+    """
+    config = load_config(config_file)
+    items_df, recipes_df, plants_df = load_data(config)
+
+    return {
+        'config': config,
+        'items_df': convert_time(items_df),
+        'recipes_df': recipes_df,
+        'plants_df': plants_df,
+    }
+
+
+def check_profiles(base, profiles):
+    """
+    Raises a ValueError if some profiles cannot be evaluated.
+
+    Every problem of every profile is reported together: missing or duplicate names,
+    unknown settings and price overrides of unknown items.
+
+    Args:
+        base (dict): Base data from `load_base`.
+        profiles (list[dict]): Profiles to check.
+    """
+    errors = []
+    names = [profile.get('name') for profile in profiles]
+    item_names = set(base['items_df']['name'])
+
+    if None in names:
+        errors.append(f"Profiles without a name at positions: {', '.join(str(i) for i, name in enumerate(names) if name is None)}")
+
+    if duplicates := sorted({name for name in names if name is not None and names.count(name) > 1}):
+        errors.append(f"Duplicate profile names: {', '.join(duplicates)}")
+
+    for profile in profiles:
+        if unknown_settings := [key for key in profile if key not in PROFILE_SETTINGS + ['name']]:
+            errors.append(f"Unknown settings in profile '{profile.get('name')}': {', '.join(unknown_settings)}")
+
+        if unknown_items := [item for item in profile.get('prices', {}) if item not in item_names]:
+            errors.append(f"Price overrides for unknown items in profile '{profile.get('name')}': "
+                          f"{', '.join(unknown_items)}")
+
+    if errors:
+        raise ValueError('\n'.join(errors))
+
+
+def evaluate_profile(base, profile, sort_criterion='profit_per_minute', limit=None):
+    """
+    Runs the configuration-dependent pipeline for one profile and ranks its products.
+
+    Args:
+        base (dict): Base data from `load_base`. It is not modified.
+        profile (dict): Profile with a 'name' and any of `PROFILE_SETTINGS`. 'prices'
+            maps item names to the market cost to use instead of the catalogue one.
+        sort_criterion (str | list[str] | dict[str, float]): Ranking criterion, as
+            returned by `parse_sort`.
+        limit (int | None): Maximum number of products to return per machine.
+
+    Returns:
+        pd.DataFrame: The products of the available machines, by machine and then best
+        first, with the columns of `DISPLAY_COLUMNS`.
+    """
+    config = {**base['config'], **{key: value for key, value in profile.items() if key in PROFILE_SETTINGS}}
+
+    items_df = base['items_df'].copy()
+    if prices := profile.get('prices'):
+        overrides = items_df['name'].astype(object).map(prices)
+        items_df['cost'] = overrides.fillna(items_df['cost'])
+
+    items_df, _ = process_items(items_df, base['recipes_df'], base['plants_df'], config)
+
+    ranked = sort_machine_products(config, items_df, None, sort_criterion)
+    if limit is not None:
+        ranked = ranked.groupby('machine', sort=False, observed=True).head(limit)
+
+    return ranked[DISPLAY_COLUMNS].reset_index(drop=True)
+
+
+def _init_worker(config, directory):
+    """
+    Memory-maps the exported base tables in a worker process, so every worker shares
+    the same copy of the base data.
+    """
+    global _base
+    _base = {'config': config, **load_tables(directory, decode_text=False)}
+
+
+def _evaluate_in_worker(args):
+    """
+    Evaluates a profile against the base data of the worker process.
+    """
+    profile, sort_criterion, limit = args
+
+    return evaluate_profile(_base, profile, sort_criterion, limit)
+
+
+def evaluate_profiles(base, profiles, sort_criterion='profit_per_minute', limit=None, workers=None):
+    """
+    Evaluates many profiles against the same base data, in parallel.
+
+    The base data is parsed once by the caller and exported with
+    `columnar.export_tables` to a temporary directory, which every worker process
+    memory-maps when it starts: the workers share one read-only copy of the base
+    tables instead of each receiving its own. Each task only carries its profile and
+    each worker only rebuilds what depends on the profile. Profiles are independent,
+    so the work scales with the number of workers until they outnumber the cores.
+
+    Args:
+        base (dict): Base data from `load_base`.
+        profiles (list[dict]): Profiles with a 'name' and any of `PROFILE_SETTINGS`.
+        sort_criterion (str | list[str] | dict[str, float]): Ranking criterion, as
+            returned by `parse_sort`.
+        limit (int | None): Maximum number of products to return per machine.
+        workers (int | None): Number of worker processes. Defaults to the number of
+            cores; with 1, the profiles are evaluated in the current process.
+
+    Returns:
+        dict[str, pd.DataFrame]: Ranked products of each profile, in the order of `profiles`.
+
+    Raises:
+        ValueError: If some profiles are invalid. All problems are reported together.
+    """
+    check_profiles(base, profiles)
+
+    workers = min(workers or os.cpu_count() or 1, max(len(profiles), 1))
+    tasks = [(profile, sort_criterion, limit) for profile in profiles]
+
+    if workers == 1:
+        tables = [evaluate_profile(base, *task) for task in tasks]
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            export_tables({table: base[table] for table in BASE_TABLES}, directory)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(base['config'], directory)) as executor:
+                tables = list(executor.map(_evaluate_in_worker, tasks,
+                                           chunksize=max(len(tasks) // (4 * workers), 1)))
+
+    return {profile['name']: table for profile, table in zip(profiles, tables)}
+
+
+def load_profiles(path):
+    """
+    Loads a list of profiles from a YAML file.
+
+    Args:
+        path (str): Path of a YAML file holding a list of profiles.
+
+    Returns:
+        list[dict]: The profiles.
+
+    Raises:
+        ValueError: If the file does not hold a list of mappings.
+    """
+    with open(path) as file:
+        profiles = yaml.safe_load(file)
+
+    if not isinstance(profiles, list) or not all(isinstance(profile, dict) for profile in profiles):
+        raise ValueError(f"Expected a list of profiles in {path}")
+
+    return profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank the products of many farm profiles at once.")
+    parser.add_argument('profiles', help="YAML file with a list of profiles.")
+    parser.add_argument('--config', default='config.yaml', help="Path to the base YAML configuration file.")
+    parser.add_argument('--sort', default='profit_per_minute', help="Sort column, columns or weighted score.")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum number of products per machine.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args()
+
+    tables = evaluate_profiles(load_base(args.config), load_profiles(args.profiles),
+                               parse_sort(args.sort, SORT_MAPPING.values()), args.limit, args.workers)
+
+    for name, table in tables.items():
+        print(f"\n{name}")
+        print(table.to_string())
+
+
+if __name__ == "__main__":
+    main()
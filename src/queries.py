@@ -0,0 +1,78 @@
+from cache import cached_preprocessing
+from ingredient import build_ingredient_index, sort_ingredient_products
+from machine import SORT_MAPPING, get_available_machines
+from ranking import build_rankings, parse_sort, top_products
+
+DISPLAY_COLUMNS = ['name', 'machine', 'total_profit', 'profit_per_minute',
+                   'experience_per_minute', 'experience', 'serial_profit_per_minute',
+                   'parallel_profit_per_minute', 'rare_ingredients']
+
+VIEWS = ['machine', 'ingredient']
+
+
+def load_state(config_file="config.yaml"):
+    """
+    Preprocesses the data and prepares everything the non-interactive queries need.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+
+    Returns:
+        dict: Preprocessed tables together with the available machines and ingredients, 
+        the ingredient index and the precomputed machine rankings.
+    """
+    config, items_df, recipes_df, rare_ingredients = cached_preprocessing(config_file)
+    ingredient_index = build_ingredient_index(recipes_df, items_df, config.get('animal_feed', {}))
+
+    return {
+        'config': config,
+        'items_df': items_df,
+        'recipes_df': recipes_df,
+        'rare_ingredients': rare_ingredients,
+        'machines': get_available_machines(config, items_df).tolist(),
+        'ingredients': ingredient_index['ingredients'],
+        'ingredient_index': ingredient_index,
+        'rankings': build_rankings(config, items_df, SORT_MAPPING.values()),
+    }
+
+
+def query_products(state, view, name=None, sort_criterion='profit_per_minute', limit=None, transitive=False):
+    """
+    Answers a By Machine or By Ingredient query without prompting the user.
+
+    Args:
+        state (dict): Preprocessed data from `load_state`.
+        view (str): Either 'machine' or 'ingredient'.
+        name (str | None): Machine or ingredient name. For the machine view, None
+            returns the products of all available machines.
+        sort_criterion (str): Column to sort the products by, in descending order, or a 
+            multi-key or weighted specification understood by `ranking.parse_sort`.
+        limit (int | None): Maximum number of products to return.
+        transitive (bool): For the ingredient view, whether to include products that 
+            use the ingredient anywhere in their recipe chain.
+
+    Returns:
+        pd.DataFrame: The sorted products, restricted to `DISPLAY_COLUMNS`.
+
+    Raises:
+        ValueError: If the view, name, sort criterion or limit is invalid.
+    """
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view '{view}'. Expected one of: {', '.join(VIEWS)}")
+
+    criterion = parse_sort(sort_criterion, list(SORT_MAPPING.values()))
+
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+        raise ValueError(f"Limit must be a non-negative integer, got {limit!r}")
+
+    if view == 'machine':
+        if name is not None and name not in state['machines']:
+            raise ValueError(f"Unknown machine '{name}'")
+        products = top_products(state['items_df'], state['rankings'], name, criterion, limit)
+    else:
+        if name not in state['ingredients']:
+            raise ValueError(f"Unknown ingredient '{name}'")
+        products = sort_ingredient_products(state['items_df'], state['ingredient_index'], name, criterion, 
+                                            transitive, limit)
+
+    return products[DISPLAY_COLUMNS]
@@ -0,0 +1,176 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+SORT_TERM_PATTERN = re.compile(r'^\s*(?:(?P<weight>[-+]?(?:\d+\.?\d*|\.\d+))\s*\*\s*)?(?P<column>\w+)\s*$')
+
+
+def parse_sort(spec, columns):
+    """
+    Parses a sort specification into a ranking criterion.
+
+    Three forms are supported:
+    - a single column, e.g. "profit_per_minute".
+    - several columns separated by commas, compared one after the other, e.g.
+      "profit_per_minute,experience".
+    - a weighted score, e.g. "0.7*profit_per_minute + 0.3*experience_per_minute".
+
+    Args:
+        spec (str): Sort specification.
+        columns (Iterable[str]): Columns that may be sorted on.
+
+    Returns:
+        str | list[str] | dict[str, float]: The column, the list of columns, or the
+        weight of each column.
+
+    Raises:
+        ValueError: If the specification is malformed or uses unknown columns. All
+            unknown columns are reported together.
+    """
+    if '*' in spec or '+' in spec:
+        criterion = {}
+        for term in re.split(r'\+(?=\s*[\d.\w])', spec):
+            if (match := SORT_TERM_PATTERN.match(term)) is None:
+                raise ValueError(f"Unrecognized sort term '{term.strip()}'")
+            criterion[match['column']] = criterion.get(match['column'], 0) + float(match['weight'] or 1)
+        names = list(criterion)
+    elif ',' in spec:
+        criterion = names = [name.strip() for name in spec.split(',')]
+    else:
+        criterion = spec.strip()
+        names = [criterion]
+
+    if unknown_columns := [name for name in names if name not in columns]:
+        raise ValueError(f"Unknown sort columns: {', '.join(unknown_columns)}. Expected any of: {', '.join(columns)}")
+
+    return criterion
+
+
+def ranking_keys(items_df, rows, criterion):
+    """
+    Returns the ascending sort keys of the given rows, most significant first.
+
+    Values are negated so that larger values come first, and missing values are sent
+    to the end like `sort_values` does.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing the columns of the criterion.
+        rows (np.ndarray): Positions of the rows in `items_df`.
+        criterion (str | list[str] | dict[str, float]): Column, list of columns or
+            weight of each column, as returned by `parse_sort`.
+
+    Returns:
+        list[np.ndarray]: One key per column of the criterion, or a single key for a
+        weighted criterion.
+    """
+    if isinstance(criterion, dict):
+        columns = [sum(weight * items_df[column].to_numpy(dtype=np.float64)[rows]
+                       for column, weight in criterion.items())]
+    else:
+        columns = [items_df[column].to_numpy(dtype=np.float64)[rows]
+                   for column in ([criterion] if isinstance(criterion, str) else criterion)]
+
+    return [np.where(np.isnan(values), np.inf, -values) for values in columns]
+
+
+def rank_rows(items_df, rows, criterion, limit=None, by_machine=False):
+    """
+    Orders rows of `items_df` by a criterion, best first.
+
+    With a limit, the rows are first narrowed down with a partial selection on the
+    most significant key (keeping every tie with the last selected row), so only
+    about `limit` rows are fully sorted. Ties are broken by position in `items_df`.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing the columns of the criterion.
+        rows (np.ndarray): Positions of the candidate rows in `items_df`.
+        criterion (str | list[str] | dict[str, float]): Column, list of columns or
+            weight of each column, as returned by `parse_sort`.
+        limit (int | None): Maximum number of rows to return.
+        by_machine (bool): Whether to order by machine name first, then by the criterion.
+
+    Returns:
+        np.ndarray: Positions of the ranked rows.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    keys = ranking_keys(items_df, rows, criterion)
+
+    if by_machine:
+        keys = [pd.factorize(items_df['machine'].to_numpy()[rows], sort=True)[0]] + keys
+    elif limit is not None and limit < len(rows):
+        primary = keys[0]
+        candidates = np.flatnonzero(primary <= np.partition(primary, limit - 1)[limit - 1]) if limit > 0 else []
+        rows = rows[candidates]
+        keys = [key[candidates] for key in keys]
+
+    return rows[np.lexsort([rows] + keys[::-1])][:limit]
+
+
+def build_rankings(config, items_df, sort_keys):
+    """
+    Precomputes the ranking of every machine for every sort key.
+
+    Each ranking is an array of row positions, best first, so the top `k` products of
+    a machine are read in O(k). The products of all available machines are also ranked
+    together, by machine and then by the sort key.
+
+    Args:
+        config (dict): Configuration containing settings like which machines to ignore.
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        sort_keys (Iterable[str]): Columns to precompute rankings for.
+
+    Returns:
+        dict: A dictionary containing:
+            - machines (dict[str, dict[str, np.ndarray]]): Ranking of each machine
+              for each sort key.
+            - all (dict[str, np.ndarray]): Ranking of the available machines for each
+              sort key.
+            - rows (dict[str, np.ndarray]): Positions of the products of each machine.
+            - available_rows (np.ndarray): Positions of the products of the available machines.
+    """
+    ignore_machines = config.get('ignore_machines', [])
+    machine_rows = {machine: np.asarray(positions) for machine, positions
+                    in items_df.groupby('machine', sort=False, observed=True).indices.items()}
+    available_rows = np.flatnonzero(~items_df['machine'].isin(ignore_machines).to_numpy())
+
+    return {
+        'machines': {
+            machine: {key: rank_rows(items_df, positions, key) for key in sort_keys}
+            for machine, positions in machine_rows.items()
+        },
+        'all': {key: rank_rows(items_df, available_rows, key, by_machine=True) for key in sort_keys},
+        'rows': machine_rows,
+        'available_rows': available_rows,
+    }
+
+
+def top_products(items_df, rankings, machine, criterion, limit=None):
+    """
+    Returns the best products of a machine, from the precomputed rankings if possible.
+
+    Single sort keys are read from the precomputed rankings in O(limit). Multi-key and
+    weighted criteria are ranked on the fly with `rank_rows`.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame the rankings were built from.
+        rankings (dict): Precomputed rankings from `build_rankings`.
+        machine (str | None): Name of the machine, or None for all available machines,
+            ordered by machine first.
+        criterion (str | list[str] | dict[str, float]): Ranking criterion.
+        limit (int | None): Maximum number of products to return.
+
+    Returns:
+        pd.DataFrame: The ranked product data.
+    """
+    if machine is None:
+        precomputed = rankings['all']
+        rows = rankings['available_rows']
+    else:
+        precomputed = rankings['machines'].get(machine, {})
+        rows = rankings['rows'].get(machine, np.array([], dtype=np.int64))
+
+    if isinstance(criterion, str) and criterion in precomputed:
+        return items_df.iloc[precomputed[criterion][:limit]]
+
+    return items_df.iloc[rank_rows(items_df, rows, criterion, limit, by_machine=machine is None)]
@@ -0,0 +1,220 @@
+import numpy as np
+
+from graph import build_dependency_graph, topological_order
+from preprocessing import FEED_YIELD, HONEYCOMB_COST, TREE_YIELD, update_items_with_no_cost
+
+# Number of scenarios evaluated together, bounding the (scenarios x recipe rows) buffer
+CHUNK_SIZE = 1024
+
+
+def compile_scenario_model(items_df, recipes_df, plants_df, config):
+    """
+    Compiles the recipes once into a sparse product x ingredient quantity matrix.
+
+    The matrix is stored in CSR form over the rows of `items_df`: the recipe of the
+    `i`-th product spans `indices[indptr[i]:indptr[i + 1]]` (ingredient rows) and the
+    matching `quantities`. Products are ordered by depth in the recipe graph so that
+    each depth is a contiguous block, which `true_cost` evaluation walks level by level.
+
+    Args:
+        items_df (pd.DataFrame): DataFrame containing item details, including 'name',
+            'machine', 'time' (in minutes) and 'experience'.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        plants_df (pd.DataFrame): DataFrame containing plant details, including 'fruit'
+            and 'plantprice'.
+        config (dict): Configuration dictionary containing 'animal_feed' and 'true_cost'.
+
+    Returns:
+        dict: Compiled model holding the item names, the CSR recipe matrix, the rows of
+        products, fruits, feeds and no-cost items, and the time of every item.
+
+    Raises:
+        ValueError: If an ingredient, fruit or feed is missing from `items_df`, or if the
+            recipes contain a cycle.
+    """
+    names = items_df['name'].tolist()
+    position = {name: row for row, name in enumerate(names)}
+    true_cost = config.get('true_cost', False)
+    feed_to_item_map = config.get('animal_feed', {})
+
+    if (missing_ingredients := recipes_df.loc[~recipes_df['ingredient'].isin(position), 'ingredient'].unique()).size > 0:
+        raise ValueError(f"Ingredients in recipes_df missing from items_df: {', '.join(missing_ingredients)}")
+
+    if (missing_fruits := plants_df.loc[~plants_df['fruit'].isin(position), 'fruit'].unique()).size > 0:
+        raise ValueError(f"Fruits in plants_df not found in items_df: {', '.join(missing_fruits)}")
+
+    if len(missing_feeds := set(feed_to_item_map) - set(position)) > 0:
+        raise ValueError(f"Feeds missing from items_df: {', '.join(missing_feeds)}")
+
+    no_cost_df = update_items_with_no_cost(items_df[['machine']].assign(production_cost=float('nan')))
+    no_cost = no_cost_df['production_cost'].notna().to_numpy()
+    fruit_rows = np.array([position[fruit] for fruit in plants_df['fruit']], dtype=np.int64)
+    honeycomb_rows = np.array([position[name] for name in ['Honeycomb'] if name in position], dtype=np.int64)
+
+    leaves = no_cost.copy()
+    leaves[fruit_rows] = True
+    leaves[honeycomb_rows] = True
+
+    # Animal products are nodes of the graph only when costs follow the full bill of materials
+    graph = build_dependency_graph(recipes_df, feed_to_item_map if true_cost else None)
+
+    depth = {}
+    for node in topological_order(graph):
+        depth[node] = 1 + max((depth[ingredient] for ingredient, _ in graph.get(node, [])), default=-1)
+
+    products = [
+        node for node in sorted(graph, key=depth.get)
+        if node in position and not (true_cost and leaves[position[node]])
+    ]
+
+    indptr = np.zeros(len(products) + 1, dtype=np.int64)
+    indices = []
+    quantities = []
+
+    for row, product in enumerate(products):
+        for ingredient, quantity in graph[product]:
+            indices.append(position[ingredient])
+            quantities.append(quantity)
+        indptr[row + 1] = len(indices)
+
+    product_depths = np.array([depth[product] for product in products], dtype=np.int64)
+
+    return {
+        'names': names,
+        'true_cost': true_cost,
+        'product_rows': np.array([position[product] for product in products], dtype=np.int64),
+        'level_bounds': np.searchsorted(product_depths, np.unique(product_depths).tolist() + [np.inf]),
+        'indptr': indptr,
+        'indices': np.array(indices, dtype=np.int64),
+        'quantities': np.array(quantities, dtype=np.float64),
+        'fruit_rows': fruit_rows,
+        'plant_prices': plants_df['plantprice'].to_numpy(dtype=np.float64),
+        'honeycomb_rows': honeycomb_rows,
+        'feed_rows': np.array([position[feed] for feed in feed_to_item_map], dtype=np.int64),
+        'feed_item_rows': np.array([position[item_name] for item_name in feed_to_item_map.values()], dtype=np.int64),
+        'no_cost': no_cost,
+        'leaves': leaves,
+        'time': items_df['time'].to_numpy(dtype=np.float64),
+        'market_prices': items_df['cost'].to_numpy(dtype=np.float64),
+    }
+
+
+def _recipe_sums(model, values, start, stop):
+    """
+    Multiplies the ingredient values by the recipe matrix rows `start` to `stop`.
+
+    Args:
+        model (dict): Compiled model from `compile_scenario_model`.
+        values (np.ndarray): Ingredient values, one row per scenario and one column per item.
+        start (int): First product row of the matrix.
+        stop (int): Product row after the last one.
+
+    Returns:
+        np.ndarray: Recipe cost of each product, one row per scenario.
+    """
+    first_edge, last_edge = model['indptr'][start], model['indptr'][stop]
+    contributions = values[:, model['indices'][first_edge:last_edge]] * model['quantities'][first_edge:last_edge]
+
+    return np.add.reduceat(contributions, model['indptr'][start:stop] - first_edge, axis=1)
+
+
+def _evaluate_chunk(model, prices, plant_prices, tree_yield, feed_yield):
+    """
+    Evaluates the production cost of a chunk of scenarios.
+
+    Mirrors `update_costs`: recipe sums, then tree and bush fruits, then feeds and their
+    animal products, then no-cost machines, rounded to whole coins. With `true_cost`,
+    the recipe levels are evaluated in order so that each level is priced from the
+    costs of the previous ones, as in `evaluate_true_costs`.
+
+    Args:
+        model (dict): Compiled model from `compile_scenario_model`.
+        prices (np.ndarray): Market cost of every item, one row per scenario.
+        plant_prices (np.ndarray): Plant price of every tree or bush, one row per scenario.
+        tree_yield (np.ndarray): Fruits per tree or bush, one row per scenario.
+        feed_yield (np.ndarray): Feeds per feed recipe, one row per scenario.
+
+    Returns:
+        np.ndarray: Production cost of every item, one row per scenario.
+    """
+    production_cost = np.full(prices.shape, np.nan)
+    product_rows = model['product_rows']
+    is_feed = np.isin(product_rows, model['feed_rows'])
+
+    if model['true_cost']:
+        production_cost[:, model['fruit_rows']] = np.round(plant_prices / tree_yield)
+        production_cost[:, model['honeycomb_rows']] = np.round(HONEYCOMB_COST)
+        production_cost[:, model['no_cost']] = 0
+
+        values = np.where(model['leaves'], production_cost, prices)
+
+        for start, stop in zip(model['level_bounds'][:-1], model['level_bounds'][1:]):
+            level_costs = _recipe_sums(model, values, start, stop)
+            level_costs = np.where(is_feed[start:stop], level_costs / feed_yield, level_costs)
+            level_costs = np.round(level_costs)
+
+            production_cost[:, product_rows[start:stop]] = level_costs
+            values[:, product_rows[start:stop]] = level_costs
+
+        return production_cost
+
+    production_cost[:, product_rows] = _recipe_sums(model, prices, 0, len(product_rows))
+    production_cost[:, model['fruit_rows']] = plant_prices / tree_yield
+    production_cost[:, model['honeycomb_rows']] = HONEYCOMB_COST
+    production_cost[:, model['feed_rows']] /= feed_yield
+    production_cost[:, model['feed_item_rows']] = production_cost[:, model['feed_rows']]
+    production_cost[:, model['no_cost']] = 0
+
+    return np.round(production_cost)
+
+
+def evaluate_scenarios(model, prices, plant_prices=None, tree_yield=TREE_YIELD, feed_yield=FEED_YIELD):
+    """
+    Evaluates many price scenarios in one vectorized pass.
+
+    Each scenario is one row of `prices` (the market cost of every item, in the order
+    of `model['names']`), optionally with its own plant prices, tree yield and feed
+    yield. For a single scenario with the current prices, the results match the
+    `production_cost`, `total_profit` and `profit_per_minute` columns of
+    `run_preprocessing`.
+
+    Args:
+        model (dict): Compiled model from `compile_scenario_model`.
+        prices (np.ndarray): N x items matrix of market costs.
+        plant_prices (np.ndarray): N x plants matrix of plant prices, in the order of
+            `plants_df`. Defaults to the current plant prices.
+        tree_yield (float | np.ndarray): Fruits per tree or bush, scalar or one per scenario.
+        feed_yield (float | np.ndarray): Feeds per feed recipe, scalar or one per scenario.
+
+    Returns:
+        dict[str, np.ndarray]: N x items arrays for 'production_cost', 'total_profit'
+        and 'profit_per_minute'.
+    """
+    prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+    scenarios = prices.shape[0]
+
+    if plant_prices is None:
+        plant_prices = model['plant_prices']
+    plant_prices = np.broadcast_to(np.asarray(plant_prices, dtype=np.float64), (scenarios, len(model['plant_prices'])))
+    tree_yield = np.broadcast_to(np.asarray(tree_yield, dtype=np.float64).reshape(-1, 1), (scenarios, 1))
+    feed_yield = np.broadcast_to(np.asarray(feed_yield, dtype=np.float64).reshape(-1, 1), (scenarios, 1))
+
+    production_cost = np.empty(prices.shape)
+
+    for start in range(0, scenarios, CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        production_cost[chunk] = _evaluate_chunk(model, prices[chunk], plant_prices[chunk],
+                                                 tree_yield[chunk], feed_yield[chunk])
+
+    total_profit = prices - production_cost
+
+    # Items with zero production time get a per-minute value of zero
+    time = model['time']
+    profit_per_minute = np.zeros_like(total_profit)
+    np.divide(total_profit, time, out=profit_per_minute, where=time > 0)
+
+    return {
+        'production_cost': production_cost,
+        'total_profit': total_profit,
+        'profit_per_minute': profit_per_minute,
+    }
@@ -0,0 +1,149 @@
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from cache import cached_preprocessing
+from machine import get_available_machines
+from preprocessing import convert_time
+
+OBJECTIVES = ['total_profit', 'experience']
+
+
+def plan_machine_queue(items_df, machine, slots, session_minutes, objective='total_profit'):
+    """
+    Plans the most valuable production queue of a machine for one play session.
+
+    A machine works through its queue one product at a time, so the queue may hold at
+    most `slots` products whose times add up to at most `session_minutes`. Products can
+    be queued more than once. The queue is found with a dynamic program over
+    (queued products, minutes used), where `best[k, t]` is the highest value of at most
+    `k` products fitting in `t` minutes. Each slot is vectorized over all minutes, so
+    the cost is O(slots x products) array operations of length `session_minutes`.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details, including
+            'name', 'machine', 'time' (in minutes) and the objective column.
+        machine (str): Name of the machine.
+        slots (int): Number of queue slots of the machine.
+        session_minutes (int): Length of the session, in minutes.
+        objective (str): Value to maximize, either 'total_profit' or 'experience'.
+
+    Returns:
+        dict: A dictionary containing:
+            - machine (str): Name of the machine.
+            - queue (list[str]): Names of the queued products, one entry per slot used.
+            - total_value (float): Total objective value of the queue.
+            - total_time (int): Minutes the machine is busy with the queue.
+
+    Raises:
+        ValueError: If the objective is unknown.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}'. Expected one of: {', '.join(OBJECTIVES)}")
+
+    products = items_df[(items_df['machine'] == machine)
+                        & (items_df['time'] <= session_minutes)
+                        & items_df[objective].notna()]
+    names = products['name'].tolist()
+    times = products['time'].to_numpy(dtype=np.int64)
+    values = products[objective].to_numpy(dtype=np.float64)
+
+    best = np.zeros((slots + 1, session_minutes + 1))
+    choice = np.full((slots + 1, session_minutes + 1), -1, dtype=np.int64)
+
+    for slot in range(1, slots + 1):
+        best[slot] = best[slot - 1]
+
+        for product, (product_time, value) in enumerate(zip(times, values)):
+            candidate = best[slot - 1, :session_minutes + 1 - product_time] + value
+            improved = candidate > best[slot, product_time:]
+
+            best[slot, product_time:][improved] = candidate[improved]
+            choice[slot, product_time:][improved] = product
+
+    queue = []
+    minutes_left = session_minutes
+
+    for slot in range(slots, 0, -1):
+        if (product := choice[slot, minutes_left]) >= 0:
+            queue.append(names[product])
+            minutes_left -= times[product]
+
+    return {
+        'machine': machine,
+        'queue': queue,
+        'total_value': float(best[slots, session_minutes]),
+        'total_time': int(session_minutes - minutes_left),
+    }
+
+
+def plan_all_machines(config, items_df, slots, session_minutes, objective='total_profit'):
+    """
+    Plans the production queue of every machine that is not ignored in the config.
+
+    Args:
+        config (dict): Configuration containing settings like which machines to ignore.
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details.
+        slots (int | dict[str, int]): Number of queue slots, either for every machine or
+            per machine name. Machines missing from the dictionary are skipped.
+        session_minutes (int): Length of the session, in minutes.
+        objective (str): Value to maximize, either 'total_profit' or 'experience'.
+
+    Returns:
+        pd.DataFrame: One row per machine with its queue, total value and busy time,
+        sorted by total value.
+    """
+    plans = []
+
+    for machine in get_available_machines(config, items_df):
+        machine_slots = slots.get(machine) if isinstance(slots, dict) else slots
+        if machine_slots is None:
+            continue
+
+        plan = plan_machine_queue(items_df, machine, machine_slots, session_minutes, objective)
+        plan['queue'] = ', '.join(f"{count} {name}" for name, count in Counter(plan['queue']).items())
+        plans.append(plan)
+
+    return pd.DataFrame(plans, columns=['machine', 'queue', 'total_value', 'total_time']) \
+        .sort_values(by='total_value', ascending=False)
+
+
+def parse_session(session):
+    """
+    Converts a session length such as "8h", "2h 30min" or "90" into minutes.
+
+    Args:
+        session (str): Session length in any format supported by `convert_time`, or a
+            plain number of minutes.
+
+    Returns:
+        int: Session length in minutes.
+    """
+    if session.strip().isdigit():
+        return int(session)
+
+    return int(convert_time(pd.DataFrame({'time': [session]}))['time'].iloc[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan the best production queue of every machine for a session.")
+    parser.add_argument('--slots', type=int, default=6, help="Number of queue slots per machine.")
+    parser.add_argument('--session', default='8h', help="Session length, e.g. '2h', '8h' or '90' (minutes).")
+    parser.add_argument('--objective', choices=OBJECTIVES, default='total_profit', help="Value to maximize.")
+    args = parser.parse_args()
+
+    config, items_df, _, _ = cached_preprocessing()
+
+    start = time.perf_counter()
+    plans = plan_all_machines(config, items_df, args.slots, parse_session(args.session), args.objective)
+    elapsed = time.perf_counter() - start
+
+    print(plans.to_string(index=False))
+    print(f"\nPlanned {len(plans)} machines in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from preprocessing import load_config
+from queries import load_state as load_query_state, query_products
+
+# Seconds between two checks of the input files for changes
+RELOAD_INTERVAL = 1.0
+
+# Most recently used responses kept in the memo
+MAX_RESPONSES = 1024
+
+QUERY_PATHS = ('/machine', '/ingredient')
+
+
+def get_input_mtimes(config_file):
+    """
+    Returns the modification times of the config file and every data file it references.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+
+    Returns:
+        tuple[int, ...]: Modification times of the input files, in nanoseconds.
+    """
+    config = load_config(config_file)
+    paths = [config_file] + [config['files'][key] for key in sorted(config['files'])]
+
+    return tuple(os.stat(path).st_mtime_ns for path in paths)
+
+
+def load_state(config_file):
+    """
+    Preprocesses the data and prepares everything the server needs.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+
+    Returns:
+        dict: Query state from `queries.load_state`, with the input modification
+        times, an empty response memo and the lock guarding it.
+    """
+    mtimes = get_input_mtimes(config_file)
+
+    return {**load_query_state(config_file), 'mtimes': mtimes, 'responses': OrderedDict(),
+            'responses_lock': threading.Lock()}
+
+
+def parse_query(path, params):
+    """
+    Extracts the arguments of a `/machine` or `/ingredient` query from its parameters.
+
+    Parameters other than `name`, `sort`, `limit` and `transitive` are ignored.
+
+    Args:
+        path (str): Path of the query.
+        params (dict[str, str]): Query parameters.
+
+    Returns:
+        tuple: The view, name, sort, limit and transitive flag of the query.
+
+    Raises:
+        ValueError: If the limit is not an integer.
+    """
+    try:
+        limit = int(params['limit']) if 'limit' in params else None
+    except ValueError:
+        raise ValueError(f"Limit must be an integer, got {params['limit']!r}")
+
+    return (path.lstrip('/'),
+            params.get('name'),
+            params.get('sort', 'profit_per_minute'),
+            limit,
+            params.get('transitive', '0').lower() in ('1', 'true'))
+
+
+def answer_query(state, path, params):
+    """
+    Answers an HTTP query against the preprocessed data.
+
+    Supported paths are `/machines`, `/ingredients`, `/machine` (with optional `name`,
+    `sort` and `limit` parameters) and `/ingredient` (with `name` and optional `sort`,
+    `limit` and `transitive` parameters).
+
+    Args:
+        state (dict): Server state from `load_state`.
+        path (str): Path of the query.
+        params (dict[str, str]): Query parameters.
+
+    Returns:
+        tuple[int, dict | list]: HTTP status code and JSON-serializable body.
+    """
+    if path == '/machines':
+        return 200, state['machines']
+
+    if path == '/ingredients':
+        return 200, state['ingredients']
+
+    if path not in QUERY_PATHS:
+        return 404, {'error': f"Unknown path '{path}'"}
+
+    try:
+        products = query_products(state, *parse_query(path, params))
+    except ValueError as error:
+        return 400, {'error': str(error)}
+
+    return 200, json.loads(products.to_json(orient='records'))
+
+
+def respond(state, path, params):
+    """
+    Answers an HTTP query, from the response memo when it was already answered.
+
+    Successful responses are memoized by path and query arguments, so parameters the
+    queries ignore do not add entries. Only the `MAX_RESPONSES` most recently used
+    responses are kept.
+
+    Args:
+        state (dict): Server state from `load_state`.
+        path (str): Path of the query.
+        params (dict[str, str]): Query parameters.
+
+    Returns:
+        tuple[int, bytes]: HTTP status code and JSON body.
+    """
+    try:
+        response_key = (path, *parse_query(path, params)) if path in QUERY_PATHS else (path,)
+    except ValueError as error:
+        return 400, json.dumps({'error': str(error)}).encode()
+
+    responses = state['responses']
+    with state['responses_lock']:
+        if (response := responses.get(response_key)) is not None:
+            responses.move_to_end(response_key)
+            return response
+
+    status, body = answer_query(state, path, params)
+    response = (status, json.dumps(body).encode())
+
+    if status == 200:
+        with state['responses_lock']:
+            responses[response_key] = response
+            if len(responses) > MAX_RESPONSES:
+                responses.popitem(last=False)
+
+    return response
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Serves the queries of `answer_query` as JSON over HTTP GET requests.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, payload = respond(self.server.state, url.path, params)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self):
+        # Unix socket clients have no host address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server listening on a Unix socket instead of a TCP port.
+    """
+    daemon_threads = True
+
+
+def watch_inputs(server, config_file, interval=RELOAD_INTERVAL):
+    """
+    Reloads the server state whenever the config file or a data file changes.
+
+    Runs forever, so it is meant to be started in a daemon thread. The new state is
+    built aside and swapped in at once, so queries never see a partial reload. If the
+    files cannot be loaded, e.g. while they are being saved, the previous data keeps
+    being served and the reload is retried once they change again.
+
+    Args:
+        server (socketserver.BaseServer): Server holding the state to refresh.
+        config_file (str): Path to the YAML configuration file.
+        interval (float): Seconds between two checks.
+    """
+    failed_mtimes = None
+    last_error = None
+
+    while True:
+        time.sleep(interval)
+        mtimes = None
+        try:
+            mtimes = get_input_mtimes(config_file)
+            if mtimes not in (server.state['mtimes'], failed_mtimes):
+                server.state = load_state(config_file)
+                print("Input files changed, data reloaded.")
+            last_error = None
+        except Exception as error:
+            # Report a failure once, not on every check until the files change
+            if (message := f"{type(error).__name__}: {error}") != last_error:
+                print(f"Reload failed, keeping the previous data: {message}")
+            last_error = message
+            failed_mtimes = mtimes
+
+
+def serve(config_file="config.yaml", host="127.0.0.1", port=8765, socket_path=None, verbose=False):
+    """
+    Preprocesses the data once and serves queries until interrupted.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+        host (str): Host to bind the HTTP server to.
+        port (int): Port to bind the HTTP server to.
+        socket_path (str | None): Path of a Unix socket to listen on instead of a port.
+        verbose (bool): Whether to log every request.
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, QueryHandler)
+        address = socket_path
+    else:
+        server = ThreadingHTTPServer((host, port), QueryHandler)
+        address = f"http://{host}:{port}"
+
+    server.state = load_state(config_file)
+    server.verbose = verbose
+
+    threading.Thread(target=watch_inputs, args=(server, config_file), daemon=True).start()
+
+    print(f"Serving on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Hay Day product queries as JSON.")
+    parser.add_argument('--config', default='config.yaml', help="Path to the YAML configuration file.")
+    parser.add_argument('--host', default='127.0.0.1', help="Host to bind to.")
+    parser.add_argument('--port', type=int, default=8765, help="Port to bind to.")
+    parser.add_argument('--socket', help="Listen on this Unix socket instead of a TCP port.")
+    parser.add_argument('--verbose', action='store_true', help="Log every request.")
+    args = parser.parse_args()
+
+    serve(args.config, args.host, args.port, args.socket, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import statistics
+import time
+
+from ingredient import get_ingredient_choice
+from machine import get_machine_choice, get_sort
+from queries import DISPLAY_COLUMNS, load_state, query_products
+
+
+def start_session(config_file="config.yaml"):
+    """
+    Preprocesses the data once for a session of many queries.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+
+    Returns:
+        dict: Session with the query 'state' from `queries.load_state`, the memoized
+        'results' of each query, the 'log' of every query answered and the seconds
+        spent loading the data ('load_time').
+    """
+    start = time.perf_counter()
+    state = load_state(config_file)
+
+    return {'state': state, 'results': {}, 'log': [], 'load_time': time.perf_counter() - start}
+
+
+def run_query(session, view, name=None, sort_criterion='profit_per_minute', limit=None, transitive=False):
+    """
+    Answers a query, from the session memo when it was already asked.
+
+    Args:
+        session (dict): Session from `start_session`.
+        view (str): Either 'machine' or 'ingredient'.
+        name (str | None): Machine or ingredient name. For the machine view, None
+            returns the products of all available machines.
+        sort_criterion (str): Sort specification understood by `ranking.parse_sort`.
+        limit (int | None): Maximum number of products to return.
+        transitive (bool): For the ingredient view, whether to include products that
+            use the ingredient anywhere in their recipe chain.
+
+    Returns:
+        tuple[pd.DataFrame, float, bool]: The sorted products, the seconds taken to
+        answer and whether the answer was memoized.
+
+    Raises:
+        ValueError: If the query is invalid.
+    """
+    start = time.perf_counter()
+    query_key = (view, name, sort_criterion, limit, transitive)
+
+    if memoized := query_key in session['results']:
+        products = session['results'][query_key]
+    else:
+        products = session['results'][query_key] = query_products(session['state'], *query_key)
+
+    latency = time.perf_counter() - start
+    session['log'].append({'query': query_key, 'seconds': latency, 'memoized': memoized})
+
+    return products, latency, memoized
+
+
+def summarize_latencies(log):
+    """
+    Summarizes the latency of the queries answered in a session.
+
+    Args:
+        log (list[dict]): Session log from `run_query`.
+
+    Returns:
+        dict[str, dict[str, float]]: Number of queries and median and maximum latency
+        in seconds, for the 'computed' and the 'memoized' answers.
+    """
+    summary = {}
+
+    for label, memoized in [('computed', False), ('memoized', True)]:
+        latencies = [entry['seconds'] for entry in log if entry['memoized'] == memoized]
+        if latencies:
+            summary[label] = {'queries': len(latencies), 'median': statistics.median(latencies),
+                              'max': max(latencies)}
+
+    return summary
+
+
+def prompt_query(session):
+    """
+    Prompts the user for a query in the By Machine or By Ingredient view.
+
+    Returns:
+        tuple | None: The view, name and sort of the query, or None to go back.
+    """
+    state = session['state']
+
+    view = input("\n1. By Machine  2. By Ingredient  (Enter to go back): ").strip()
+
+    if view == '1':
+        machine_choice = get_machine_choice(state['machines'])
+        name = state['machines'][machine_choice] if machine_choice != -1 else None
+        return 'machine', name, get_sort()
+
+    if view == '2':
+        return 'ingredient', get_ingredient_choice(state['ingredients']), get_sort()
+
+    return None
+
+
+def print_result(products, latency, memoized):
+    """
+    Prints the products of a query followed by its latency.
+    """
+    print(products[DISPLAY_COLUMNS].to_string())
+    print(f"\n{len(products)} products in {latency * 1000:.2f} ms{' (memoized)' if memoized else ''}")
+
+
+def print_summary(session):
+    """
+    Prints the load time and the latency summary of a session.
+    """
+    print(f"\nData loaded in {session['load_time'] * 1000:.0f} ms")
+    for label, stats in summarize_latencies(session['log']).items():
+        print(f"{label.capitalize():<9} {stats['queries']:>4} queries, median {stats['median'] * 1000:.3f} ms, "
+              f"max {stats['max'] * 1000:.3f} ms")
+
+
+def run_session(session):
+    """
+    Runs an interactive loop of queries until the user quits.
+
+    The user can ask a new query, re-sort the last one, or print the latency summary.
+    Every answer is memoized, so asking a query again is answered from memory.
+
+    Args:
+        session (dict): Session from `start_session`.
+    """
+    last_query = None
+
+    while True:
+        print("\n1. New query")
+        print("2. Change the sort of the last query")
+        print("3. Latency summary")
+        print("4. Quit")
+        choice = input("Enter the number corresponding to your choice (1/2/3/4): ").strip()
+
+        if choice == '1':
+            if (query := prompt_query(session)) is None:
+                continue
+            last_query = query
+        elif choice == '2':
+            if last_query is None:
+                print("No query yet.")
+                continue
+            last_query = (*last_query[:2], get_sort())
+        elif choice == '3':
+            print_summary(session)
+            continue
+        elif choice == '4':
+            print_summary(session)
+            return
+        else:
+            print("Invalid choice. Please enter 1, 2, 3 or 4.")
+            continue
+
+        print_result(*run_query(session, *last_query))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explore the products in one session, loading the data once.")
+    parser.add_argument('--config', default='config.yaml', help="Path to the YAML configuration file.")
+    args = parser.parse_args()
+
+    run_session(start_session(args.config))
+
+
+if __name__ == "__main__":
+    main()
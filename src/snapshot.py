@@ -0,0 +1,251 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+
+# Only the standard library is imported here, so queries answered from a snapshot
+# start fast. Building a snapshot imports the pipeline (and pandas) on demand.
+
+SNAPSHOT_FILE = os.path.join(".cache", "snapshot.json")
+
+SNAPSHOT_VIEWS = ['machine', 'ingredient']
+
+OUTPUT_FORMATS = ['csv', 'jsonl']
+
+# Source files of the rankings, columns and sort keys baked into the snapshot
+SNAPSHOT_SOURCES = ['ingredient.py', 'machine.py', 'queries.py', 'ranking.py']
+
+
+def hash_files(paths):
+    """
+    Hashes the names and contents of files.
+
+    Args:
+        paths (Iterable[str]): Paths of the files, in a fixed order.
+
+    Returns:
+        str: Hex digest of the files.
+    """
+    digest = hashlib.sha256()
+
+    for path in paths:
+        with open(path, 'rb') as file:
+            digest.update(path.encode())
+            digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+def build_snapshot(config_file="config.yaml"):
+    """
+    Precomputes the answers of the machine and ingredient queries.
+
+    The snapshot holds the displayed columns of every item, the ranking of every
+    machine (and of all machines together) for every sort option, and the products
+    using each ingredient directly and transitively. It also records the files it was
+    built from and their hash, so a stale snapshot can be detected without pandas.
+
+    Args:
+        config_file (str): Path to the YAML configuration file.
+
+    Returns:
+        dict: The snapshot, made of JSON types only.
+    """
+    from cache import PIPELINE_SOURCES
+    from queries import DISPLAY_COLUMNS, load_state
+
+    state = load_state(config_file)
+    items_df = state['items_df']
+    index = state['ingredient_index']
+    rankings = state['rankings']
+    positions = items_df.index.get_indexer
+
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    inputs = [os.path.abspath(config_file)]
+    inputs += [os.path.abspath(state['config']['files'][key]) for key in sorted(state['config']['files'])]
+    inputs += [os.path.join(source_dir, source) for source in PIPELINE_SOURCES + SNAPSHOT_SOURCES]
+
+    return {
+        'inputs': inputs,
+        'digest': hash_files(inputs),
+        'columns': DISPLAY_COLUMNS,
+        'products': json.loads(items_df[DISPLAY_COLUMNS].to_json(orient='values')),
+        'machines': {machine: {key: rankings['machines'][machine][key].tolist() for key in rankings['all']}
+                     for machine in state['machines']},
+        'all': {key: ranking.tolist() for key, ranking in rankings['all'].items()},
+        'ingredients': {
+            ingredient: {
+                'direct': positions([index['rows'][product] for product in index['consumers'][ingredient]
+                                     if product in index['rows']]).tolist(),
+                'transitive': positions([index['rows'][product] for product in index['closure'][ingredient]
+                                         if product in index['rows']]).tolist(),
+            }
+            for ingredient in state['ingredients']
+        },
+    }
+
+
+def save_snapshot(snapshot, path=SNAPSHOT_FILE):
+    """
+    Writes a snapshot to a JSON file, replacing it atomically.
+
+    Args:
+        snapshot (dict): Snapshot from `build_snapshot`.
+        path (str): Path of the snapshot file. Its directory is created if missing.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    temporary_file = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_file, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temporary_file, path)
+
+
+def is_fresh(snapshot):
+    """
+    Checks that none of the files a snapshot was built from changed since.
+
+    Args:
+        snapshot (dict): Snapshot from `build_snapshot` or `load_snapshot`.
+
+    Returns:
+        bool: Whether the snapshot still matches its input files.
+    """
+    try:
+        return hash_files(snapshot['inputs']) == snapshot['digest']
+    except OSError:
+        return False
+
+
+def load_snapshot(path=SNAPSHOT_FILE, config_file="config.yaml"):
+    """
+    Loads a snapshot, building it first if it is missing or stale.
+
+    Args:
+        path (str): Path of the snapshot file.
+        config_file (str): Path to the YAML configuration file, used to rebuild.
+
+    Returns:
+        dict: The snapshot.
+    """
+    if os.path.exists(path):
+        with open(path) as file:
+            snapshot = json.load(file)
+        if is_fresh(snapshot):
+            return snapshot
+
+    snapshot = build_snapshot(config_file)
+    save_snapshot(snapshot, path)
+
+    return snapshot
+
+
+def query_snapshot(snapshot, view, name=None, sort_criterion='profit_per_minute', limit=None, transitive=False):
+    """
+    Answers a By Machine or By Ingredient query from a snapshot.
+
+    Results match `queries.query_products` for single sort columns. Multi-key and
+    weighted sorts need the full query path.
+
+    Args:
+        snapshot (dict): Snapshot from `load_snapshot`.
+        view (str): Either 'machine' or 'ingredient'.
+        name (str | None): Machine or ingredient name. For the machine view, None
+            returns the products of all available machines.
+        sort_criterion (str): Column to sort the products by, in descending order.
+        limit (int | None): Maximum number of products to return.
+        transitive (bool): For the ingredient view, whether to include products that
+            use the ingredient anywhere in their recipe chain.
+
+    Returns:
+        list[dict]: The sorted products, with the snapshot columns.
+
+    Raises:
+        ValueError: If the view, name, sort column or limit is invalid.
+    """
+    if view not in SNAPSHOT_VIEWS:
+        raise ValueError(f"Unknown view '{view}'. Expected one of: {', '.join(SNAPSHOT_VIEWS)}")
+
+    if sort_criterion not in snapshot['all']:
+        raise ValueError(f"Unknown sort column '{sort_criterion}'. Expected one of: {', '.join(snapshot['all'])}")
+
+    if limit is not None and (not isinstance(limit, int) or limit < 0):
+        raise ValueError(f"Limit must be a non-negative integer, got {limit!r}")
+
+    columns = snapshot['columns']
+    products = snapshot['products']
+
+    if view == 'machine':
+        if name is None:
+            rows = snapshot['all'][sort_criterion]
+        elif name in snapshot['machines']:
+            rows = snapshot['machines'][name][sort_criterion]
+        else:
+            raise ValueError(f"Unknown machine '{name}'")
+    else:
+        if name not in snapshot['ingredients']:
+            raise ValueError(f"Unknown ingredient '{name}'")
+
+        # Missing values last and ties by catalogue order, like `ranking.rank_rows`
+        column = columns.index(sort_criterion)
+        rows = sorted(snapshot['ingredients'][name]['transitive' if transitive else 'direct'],
+                      key=lambda row: (float('inf') if products[row][column] is None else -products[row][column],
+                                       row))
+
+    return [dict(zip(columns, products[row])) for row in rows[:limit]]
+
+
+def write_products(products, columns, output, output_format='csv'):
+    """
+    Writes query results as CSV with a header, or as JSON lines.
+
+    Args:
+        products (list[dict]): Results from `query_snapshot`.
+        columns (list[str]): Columns to write, in order.
+        output (TextIO): Stream the results are written to.
+        output_format (str): Either 'csv' or 'jsonl'.
+    """
+    if output_format == 'jsonl':
+        for product in products:
+            output.write(json.dumps(product) + '\n')
+        return
+
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(columns)
+    writer.writerows([product[column] for column in columns] for product in products)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer product queries from a precomputed snapshot.")
+    parser.add_argument('view', choices=SNAPSHOT_VIEWS + ['build'],
+                        help="Query view, or 'build' to rebuild the snapshot.")
+    parser.add_argument('name', nargs='?', default=None, help="Machine or ingredient name.")
+    parser.add_argument('--sort', default='profit_per_minute', help="Column to sort the products by.")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum number of products to return.")
+    parser.add_argument('--transitive', action='store_true',
+                        help="Include products using the ingredient anywhere in their recipe chain.")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help="Output format.")
+    parser.add_argument('--snapshot', default=SNAPSHOT_FILE, help="Path of the snapshot file.")
+    parser.add_argument('--config', default='config.yaml', help="Path to the YAML configuration file.")
+    args = parser.parse_args()
+
+    if args.view == 'build':
+        save_snapshot(build_snapshot(args.config), args.snapshot)
+        print(f"Snapshot saved to {args.snapshot}")
+        return
+
+    snapshot = load_snapshot(args.snapshot, args.config)
+
+    try:
+        products = query_snapshot(snapshot, args.view, args.name, args.sort, args.limit, args.transitive)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+
+    write_products(products, snapshot['columns'], sys.stdout, args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# Share of the catalogue made of raw items: field crops, ores and fruits
+CROP_SHARE = 0.10
+ORE_SHARE = 0.01
+FRUIT_SHARE = 0.02
+
+# Products per production machine, close to the shipped catalogue
+PRODUCTS_PER_MACHINE = 12
+
+# Number of ingredients of a recipe and their probabilities, close to the shipped catalogue
+FAN_IN = [1, 2, 3, 4]
+FAN_IN_PROBABILITIES = [0.10, 0.25, 0.40, 0.25]
+
+# Probability that an ingredient is a raw item rather than a lower-layer product
+RAW_INGREDIENT_SHARE = 0.4
+
+
+def _time_strings(rng, count):
+    """
+    Draws production times in the formats of items.csv (e.g. "1h 30min", "2d").
+    """
+    minutes = rng.choice([2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240, 360, 480, 720, 1440, 2880], count)
+    days, rest = np.divmod(minutes, 1440)
+    hours, mins = np.divmod(rest, 60)
+
+    return np.where(
+        days > 0,
+        pd.Series(days).astype(str) + 'd',
+        np.where(
+            (hours > 0) & (mins > 0),
+            pd.Series(hours).astype(str) + 'h ' + pd.Series(mins).astype(str) + 'min',
+            np.where(hours > 0, pd.Series(hours).astype(str) + 'h', pd.Series(mins).astype(str) + ' min'),
+        ),
+    )
+
+
+def generate_catalogue(items, layers=6, seed=0):
+    """
+    Generates a synthetic catalogue with the structure of the shipped data.
+
+    The catalogue has field crops and ores (from no-cost machines), fruits (from trees
+    and bushes), feeds with their animal products, and products spread over `layers`
+    recipe layers. A product of layer `k` has 1 to 4 ingredients, drawn from the raw
+    items and from the products of layers below `k` (mostly `k - 1`), so the recipes
+    form a layered DAG whose depth is `layers`. Products are grouped into machines of
+    about `PRODUCTS_PER_MACHINE` products.
+
+    Args:
+        items (int): Approximate number of items to generate.
+        layers (int): Number of product layers in the recipe graph.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        tuple: A tuple containing:
+            - items_df (pd.DataFrame): Items as in items.csv, with times as strings.
+            - recipes_df (pd.DataFrame): Recipes as in recipes.csv.
+            - plants_df (pd.DataFrame): Trees and bushes as in treesnbush.csv.
+            - config (dict): Configuration with the 'animal_feed', 'rare_ingredients'
+              and 'ignore_machines' sections of the catalogue, without 'files'.
+    """
+    rng = np.random.default_rng(seed)
+
+    crops = max(int(items * CROP_SHARE), 2)
+    ores = max(int(items * ORE_SHARE), 1)
+    fruits = max(int(items * FRUIT_SHARE), 1)
+    feeds = max(items // 2000, 5)
+    products = max(items - crops - ores - fruits - 2 * feeds, layers)
+
+    names = np.concatenate([
+        [f"Crop {i}" for i in range(crops)],
+        [f"Ore {i}" for i in range(ores)],
+        [f"Fruit {i}" for i in range(fruits)],
+        [f"Feed {i}" for i in range(feeds)],
+        [f"Animal product {i}" for i in range(feeds)],
+        [f"Product {i}" for i in range(products)],
+    ]).astype(object)
+    machines = np.concatenate([
+        np.repeat('Field', crops),
+        np.repeat('Mine', ores),
+        [f"Fruit {i} tree" for i in range(fruits)],
+        np.repeat('Feed Mill', feeds),
+        [f"Animal {i}" for i in range(feeds)],
+        [f"Machine {i}" for i in np.arange(products) // PRODUCTS_PER_MACHINE],
+    ]).astype(object)
+    raw_count = crops + ores + fruits
+    feed_start = raw_count
+    animal_start = feed_start + feeds
+    product_start = animal_start + feeds
+    total = product_start + products
+
+    items_df = pd.DataFrame({
+        'item_id': np.arange(1, total + 1),
+        'name': names,
+        'cost': rng.integers(1, 40, total) * np.where(np.arange(total) >= product_start, 10, 1),
+        'time': _time_strings(rng, total),
+        'experience': rng.integers(1, 100, total),
+        'machine': machines,
+    })
+
+    # Feeds are made from crops, products from raw items, animal products and lower layers
+    feed_rows = np.repeat(np.arange(feed_start, animal_start), 2)
+    feed_ingredients = rng.integers(0, crops, len(feed_rows))
+
+    layer_bounds = product_start + np.linspace(0, products, layers + 1).astype(np.int64)
+    fan_in = rng.choice(FAN_IN, products, p=FAN_IN_PROBABILITIES)
+    product_rows = np.repeat(np.arange(product_start, total), fan_in)
+    layer = np.searchsorted(layer_bounds, product_rows, side='right') - 1
+
+    raw_pool = np.concatenate([np.arange(raw_count), np.arange(animal_start, product_start)])
+    from_raw = (layer == 0) | (rng.random(len(product_rows)) < RAW_INGREDIENT_SHARE)
+    source_layer = np.maximum(layer - rng.geometric(0.6, len(product_rows)), 0)
+    lower_bound, upper_bound = layer_bounds[source_layer], layer_bounds[source_layer + 1]
+    product_ingredients = np.where(
+        from_raw,
+        raw_pool[rng.integers(0, len(raw_pool), len(product_rows))],
+        lower_bound + (rng.random(len(product_rows)) * (upper_bound - lower_bound)).astype(np.int64),
+    )
+
+    recipes_df = pd.DataFrame({
+        'product': names[np.concatenate([feed_rows, product_rows])],
+        'ingredient': names[np.concatenate([feed_ingredients, product_ingredients])],
+        'quantity': np.minimum(rng.geometric(0.45, len(feed_rows) + len(product_rows)), 10),
+    }).drop_duplicates(subset=['product', 'ingredient'], ignore_index=True)
+    recipes_df.insert(0, 'recipe_id', np.arange(1, len(recipes_df) + 1))
+
+    fruit_rows = np.arange(crops + ores, raw_count)
+    plants_df = pd.DataFrame({
+        'plant_id': np.arange(1, fruits + 1),
+        'item_id': fruit_rows + 1,
+        'fruit': names[fruit_rows],
+        'type': rng.choice(['tree', 'bush'], fruits),
+        'plantprice': rng.integers(100, 1500, fruits),
+    })
+
+    config = {
+        'true_cost': False,
+        'animal_feed': {names[feed_start + i]: names[animal_start + i] for i in range(feeds)},
+        'rare_ingredients': {'fruits': {name: True for name in names[fruit_rows[:50]]}},
+        'ignore_machines': ['Field', 'Mine'] + list(machines[fruit_rows]) + list(machines[animal_start:product_start]),
+    }
+
+    return items_df, recipes_df, plants_df, config
+
+
+def write_catalogue(directory, items_df, recipes_df, plants_df, config):
+    """
+    Writes a catalogue as CSV files with a config file pointing to them.
+
+    Args:
+        directory (str): Directory to write the files to. Created if missing.
+        items_df (pd.DataFrame): Items, as in items.csv.
+        recipes_df (pd.DataFrame): Recipes, as in recipes.csv.
+        plants_df (pd.DataFrame): Trees and bushes, as in treesnbush.csv.
+        config (dict): Configuration without the 'files' section.
+
+    Returns:
+        str: Path of the written config file.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    files = {
+        'items_csv': os.path.join(directory, 'items.csv'),
+        'recipes_csv': os.path.join(directory, 'recipes.csv'),
+        'plants_csv': os.path.join(directory, 'treesnbush.csv'),
+    }
+    items_df.to_csv(files['items_csv'], index=False)
+    recipes_df.to_csv(files['recipes_csv'], index=False)
+    plants_df.to_csv(files['plants_csv'], index=False)
+
+    config_file = os.path.join(directory, 'config.yaml')
+    with open(config_file, 'w') as file:
+        yaml.safe_dump({'files': files, **config}, file, sort_keys=False)
+
+    return config_file
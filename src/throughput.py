@@ -0,0 +1,352 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache import cached_preprocessing
+from graph import build_dependency_graph
+from preprocessing import FEED_YIELD
+from scheduler import OBJECTIVES
+
+# Tolerance below which tableau entries, rates and shadow prices are treated as zero
+EPSILON = 1e-9
+
+# Consecutive pivots without improvement after which the simplex switches to Bland's rule
+DEGENERATE_PIVOTS = 50
+
+
+def build_throughput_model(items_df, recipes_df, config, machine_counts=None, capacity=None):
+    """
+    Compiles the recipes into a linear program over hourly production rates.
+
+    Every item is either made or supplied. An item is made when it has a recipe (or is
+    an animal product with a feed in the `animal_feed` config) and its machine has at
+    least one unit. Its rate is the number of recipes run per hour, each yielding one
+    item, or `FEED_YIELD` items for feeds. Every other item is supplied from outside
+    the recipes (Fields, trees, animals that are not modelled...) at up to
+    `capacity[name]` items per hour.
+
+    The program has three kinds of constraints:
+        - machine: the products of a machine use at most 60 minutes per hour per unit.
+        - item: an ingredient is not consumed faster than it is made or supplied.
+        - capacity: a supplied item is not supplied faster than its capacity.
+
+    Whatever is made or supplied and not consumed is sold, which is why the objective
+    only depends on the rates and can be rebuilt for new prices by `solve_throughput`
+    without compiling the model again.
+
+    Args:
+        items_df (pd.DataFrame): Preprocessed DataFrame containing item details, including
+            'name', 'machine', 'time' (in minutes), 'cost', 'experience' and 'production_cost'.
+        recipes_df (pd.DataFrame): DataFrame with 'product', 'ingredient' and 'quantity' columns.
+        config (dict): Configuration dictionary containing 'animal_feed' and 'ignore_machines'.
+        machine_counts (dict[str, int] | None): Number of units of each machine. Machines
+            not listed have one unit, except ignored machines, which have none.
+        capacity (dict[str, float] | None): Items supplied per hour, by item name. Items
+            not listed cannot be supplied.
+
+    Returns:
+        dict: Compiled model holding the constraint matrix and bounds, the made and
+        supplied items, and the prices, costs and experience of every item.
+
+    Raises:
+        ValueError: If an ingredient or a capacity item is missing from `items_df`, or
+            if a made item takes no time (e.g. 'Instant'), since no machine would limit it.
+    """
+    machine_counts = machine_counts or {}
+    capacity = capacity or {}
+    feed_to_item_map = config.get('animal_feed', {})
+
+    names = items_df['name'].tolist()
+    position = {name: row for row, name in enumerate(names)}
+    machines = items_df['machine'].tolist()
+    ignored = set(config.get('ignore_machines', []))
+
+    if (missing_ingredients := recipes_df.loc[~recipes_df['ingredient'].isin(position), 'ingredient'].unique()).size > 0:
+        raise ValueError(f"Ingredients in recipes_df missing from items_df: {', '.join(missing_ingredients)}")
+
+    if missing_capacity := [name for name in capacity if name not in position]:
+        raise ValueError(f"Capacity items missing from items_df: {', '.join(missing_capacity)}")
+
+    def count(machine):
+        return machine_counts.get(machine, 0 if machine in ignored else 1)
+
+    graph = build_dependency_graph(recipes_df, feed_to_item_map)
+    made = [position[product] for product in graph if product in position and count(machines[position[product]]) > 0]
+    times = items_df['time'].to_numpy(dtype=np.float64)
+
+    if instant_items := [names[row] for row in made if not times[row] > 0]:
+        raise ValueError(f"Made items must take some time on their machine: {', '.join(instant_items)}")
+
+    is_made = np.zeros(len(names), dtype=bool)
+    is_made[made] = True
+    supplied = [position[name] for name, rate in capacity.items() if rate > 0 and not is_made[position[name]]]
+
+    # Items consumed by recipe, one column per made item
+    consumption = np.zeros((len(names), len(made)))
+    for column, row in enumerate(made):
+        for ingredient, quantity in graph[names[row]]:
+            consumption[position[ingredient], column] += quantity
+
+    yields = np.where(np.isin(made, [position[feed] for feed in feed_to_item_map if feed in position]), FEED_YIELD, 1.0)
+    production = np.zeros((len(names), len(made)))
+    production[made, np.arange(len(made))] = yields
+
+    supply = np.zeros((len(names), len(supplied)))
+    supply[supplied, np.arange(len(supplied))] = 1.0
+
+    item_rows = np.flatnonzero(consumption.any(axis=1))
+    machine_names = sorted({machines[row] for row in made})
+
+    machine_matrix = np.zeros((len(machine_names), len(made)))
+    for column, row in enumerate(made):
+        machine_matrix[machine_names.index(machines[row]), column] = times[row]
+
+    constraints = np.block([
+        [machine_matrix, np.zeros((len(machine_names), len(supplied)))],
+        [(consumption - production)[item_rows], -supply[item_rows]],
+        [np.zeros((len(supplied), len(made))), np.eye(len(supplied))],
+    ])
+    bounds = np.concatenate([
+        [60.0 * count(machine) for machine in machine_names],
+        np.zeros(len(item_rows)),
+        [capacity[names[row]] for row in supplied],
+    ])
+    labels = (
+        [('machine', machine) for machine in machine_names]
+        + [('item', names[row]) for row in item_rows]
+        + [('capacity', names[row]) for row in supplied]
+    )
+
+    return {
+        'names': names,
+        'machines': machines,
+        'made': np.array(made, dtype=np.int64),
+        'supplied': np.array(supplied, dtype=np.int64),
+        'yields': yields,
+        'consumption': consumption,
+        'production': production,
+        'supply': supply,
+        'constraints': constraints,
+        'bounds': bounds,
+        'labels': labels,
+        'machine_names': machine_names,
+        'machine_counts': {machine: count(machine) for machine in machine_names},
+        'time': times,
+        'market_prices': items_df['cost'].to_numpy(dtype=np.float64),
+        'supply_costs': items_df['production_cost'].fillna(0).to_numpy(dtype=np.float64),
+        'experience': items_df['experience'].to_numpy(dtype=np.float64),
+    }
+
+
+def _simplex(objective, constraints, bounds, variables):
+    """
+    Maximizes `objective @ x` subject to `constraints @ x <= bounds` and `x >= 0`.
+
+    Runs the tableau simplex method starting from the all-slack basis, which is feasible
+    because every bound is non-negative. Pivots follow the steepest objective
+    coefficient, falling back to Bland's rule on long degenerate stretches to avoid
+    cycling.
+
+    Args:
+        objective (np.ndarray): Objective coefficient of every variable.
+        constraints (np.ndarray): Constraint matrix, one row per constraint.
+        bounds (np.ndarray): Non-negative upper bound of every constraint.
+        variables (list[str]): Name of every variable, used in error messages.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, float]: Optimal variables, shadow price of every
+        constraint and optimal objective value.
+
+    Raises:
+        ValueError: If the objective is unbounded.
+    """
+    rows, columns = constraints.shape
+    tableau = np.zeros((rows + 1, columns + rows + 1))
+    tableau[:rows, :columns] = constraints
+    tableau[:rows, columns:columns + rows] = np.eye(rows)
+    tableau[:rows, -1] = bounds
+    tableau[-1, :columns] = -objective
+    basis = np.arange(columns, columns + rows)
+
+    stalled = 0
+    value = 0.0
+
+    while True:
+        reduced_costs = tableau[-1, :-1]
+        if stalled < DEGENERATE_PIVOTS:
+            entering = int(np.argmin(reduced_costs))
+            if reduced_costs[entering] >= -EPSILON:
+                break
+        else:
+            if (candidates := np.flatnonzero(reduced_costs < -EPSILON)).size == 0:
+                break
+            entering = int(candidates[0])
+
+        column = tableau[:rows, entering]
+        if not (positive := column > EPSILON).any():
+            raise ValueError(f"Objective is unbounded: '{variables[entering]}' is not limited by any machine or capacity")
+
+        ratios = np.full(rows, np.inf)
+        ratios[positive] = tableau[:rows, -1][positive] / column[positive]
+        ties = np.flatnonzero(ratios <= ratios.min() + EPSILON)
+        leaving = int(ties[np.argmin(basis[ties])])
+
+        tableau[leaving] /= tableau[leaving, entering]
+        pivot_column = tableau[:, entering].copy()
+        pivot_column[leaving] = 0
+        tableau -= np.outer(pivot_column, tableau[leaving])
+        basis[leaving] = entering
+
+        stalled = stalled + 1 if tableau[-1, -1] <= value + EPSILON else 0
+        value = tableau[-1, -1]
+
+    solution = np.zeros(columns + rows)
+    solution[basis] = tableau[:rows, -1]
+
+    return solution[:columns], tableau[-1, columns:columns + rows], float(tableau[-1, -1])
+
+
+def solve_throughput(model, objective='total_profit', prices=None):
+    """
+    Finds the hourly production rates maximizing the farm-wide profit or experience.
+
+    Profit counts the market price of everything sold, minus the production cost of
+    supplied items. Experience counts every item made or supplied.
+
+    Args:
+        model (dict): Compiled model from `build_throughput_model`.
+        objective (str): Value to maximize, either 'total_profit' or 'experience'.
+        prices (np.ndarray | None): Market cost of every item, in the order of
+            `model['names']`. Defaults to the current market costs.
+
+    Returns:
+        dict: A dictionary containing:
+            - value (float): Optimal profit or experience per hour.
+            - rates (pd.DataFrame): Recipes run per hour of every product made, with
+              its machine and the machine minutes it uses per hour.
+            - machines (pd.DataFrame): Units, busy minutes per hour and utilization of
+              every machine.
+            - sales (pd.DataFrame): Items sold per hour.
+            - binding (pd.DataFrame): Constraints limiting the objective, with their
+              shadow price (objective gained per extra machine minute or item per hour).
+              A constraint is binding when it has no slack and a nonzero shadow price,
+              and some item it involves is made or supplied; constraints only tight
+              because nothing they involve runs have no meaningful shadow price.
+
+    Raises:
+        ValueError: If the objective is unknown or unbounded.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}'. Expected one of: {', '.join(OBJECTIVES)}")
+
+    made, supplied = model['made'], model['supplied']
+
+    if objective == 'total_profit':
+        prices = model['market_prices'] if prices is None else np.asarray(prices, dtype=np.float64)
+        coefficients = np.concatenate([
+            (model['production'] - model['consumption']).T @ prices,
+            prices[supplied] - model['supply_costs'][supplied],
+        ])
+    else:
+        coefficients = np.concatenate([
+            model['yields'] * model['experience'][made],
+            model['experience'][supplied],
+        ])
+
+    variables = [model['names'][row] for row in np.concatenate([made, supplied])]
+    solution, shadow_prices, value = _simplex(coefficients, model['constraints'], model['bounds'], variables)
+
+    rates, supply_rates = solution[:len(made)], solution[len(made):]
+    machine_minutes = rates * model['time'][made]
+
+    rates_df = pd.DataFrame({
+        'name': [model['names'][row] for row in made],
+        'machine': [model['machines'][row] for row in made],
+        'rate': rates,
+        'machine_minutes': machine_minutes,
+    })
+    rates_df = rates_df[rates_df['rate'] > EPSILON].sort_values(by=['machine', 'rate'], ascending=[True, False])
+
+    machines_df = pd.DataFrame({
+        'machine': model['machine_names'],
+        'count': [model['machine_counts'][machine] for machine in model['machine_names']],
+    })
+    machines_df['busy_minutes'] = machines_df['machine'].map(rates_df.groupby('machine', observed=True)['machine_minutes'].sum()).fillna(0)
+    machines_df['utilization'] = machines_df['busy_minutes'] / (60 * machines_df['count'])
+
+    sold = model['production'] @ rates + model['supply'] @ supply_rates - model['consumption'] @ rates
+    sales_df = pd.DataFrame({'name': model['names'], 'sold': sold})
+    sales_df = sales_df[sales_df['sold'] > EPSILON].sort_values(by='sold', ascending=False)
+
+    slack = model['bounds'] - model['constraints'] @ solution
+    in_use = (np.abs(model['constraints']) > EPSILON) @ (solution > EPSILON)
+    binding = np.flatnonzero((slack <= EPSILON) & (np.abs(shadow_prices) > EPSILON) & in_use)
+    binding_df = pd.DataFrame({
+        'kind': [model['labels'][row][0] for row in binding],
+        'name': [model['labels'][row][1] for row in binding],
+        'shadow_price': shadow_prices[binding],
+    }).sort_values(by='shadow_price', ascending=False)
+
+    return {
+        'value': value,
+        'rates': rates_df.reset_index(drop=True),
+        'machines': machines_df,
+        'sales': sales_df.reset_index(drop=True),
+        'binding': binding_df.reset_index(drop=True),
+    }
+
+
+def parse_assignments(assignments):
+    """
+    Parses `NAME=VALUE` command line arguments into a dictionary.
+
+    Args:
+        assignments (list[str]): Arguments such as "Bakery=2" or "Wheat=120".
+
+    Returns:
+        dict[str, float]: Value of each name.
+
+    Raises:
+        ValueError: If an argument is not of the form `NAME=VALUE` with a numeric value.
+    """
+    parsed = {}
+
+    for assignment in assignments:
+        name, separator, value = assignment.rpartition('=')
+        if not separator or not name:
+            raise ValueError(f"Expected NAME=VALUE, got '{assignment}'")
+        parsed[name] = float(value)
+
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the farm-wide production rates maximizing profit or experience per hour.")
+    parser.add_argument('--objective', choices=OBJECTIVES, default='total_profit', help="Value to maximize.")
+    parser.add_argument('--count', action='append', default=[], metavar='MACHINE=N',
+                        help="Number of units of a machine, e.g. 'Chicken=6'. Repeatable.")
+    parser.add_argument('--capacity', action='append', default=[], metavar='ITEM=N',
+                        help="Items supplied per hour, e.g. 'Wheat=120'. Repeatable.")
+    args = parser.parse_args()
+
+    config, items_df, recipes_df, _ = cached_preprocessing()
+    machine_counts = {machine: int(count) for machine, count in parse_assignments(args.count).items()}
+
+    start = time.perf_counter()
+    model = build_throughput_model(items_df, recipes_df, config, machine_counts, parse_assignments(args.capacity))
+    result = solve_throughput(model, args.objective)
+    elapsed = time.perf_counter() - start
+
+    print(f"Optimal {args.objective.replace('_', ' ')} per hour: {result['value']:.1f}\n")
+    if result['rates'].empty:
+        print("Nothing can be made: give the raw ingredients a supply with --capacity, e.g. 'Wheat=120'.\n")
+    print(result['rates'].to_string(index=False))
+    print("\nBinding constraints:")
+    print(result['binding'].to_string(index=False))
+    print(f"\nSolved in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
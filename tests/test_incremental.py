@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from incremental import apply_deltas, build_dependency_index
+from preprocessing import convert_time, load_config, load_data, process_items
+
+
+def process(config, items_df, recipes_df, plants_df):
+    """
+    Runs the full pipeline on copies of the loaded data.
+    """
+    items_df, _ = process_items(items_df.copy(), recipes_df, plants_df.copy(), config)
+
+    return items_df
+
+
+@pytest.mark.parametrize('true_cost', [False, True])
+@pytest.mark.parametrize('name', ['Rice omelet', 'Wheat', 'Bread'])
+def test_time_delta_matches_full_pipeline(monkeypatch, true_cost, name):
+    monkeypatch.chdir(ROOT)
+    config = {**load_config('config.yaml'), 'true_cost': true_cost}
+    items_df, recipes_df, plants_df = load_data(config)
+    items_df = convert_time(items_df)
+
+    current_df = process(config, items_df, recipes_df, plants_df)
+    apply_deltas(current_df, recipes_df, plants_df.copy(), build_dependency_index(recipes_df, config),
+                 [(name, 'time', 300)])
+
+    items_df.loc[items_df['name'] == name, 'time'] = 300
+    expected_df = process(config, items_df, recipes_df, plants_df)
+
+    pd.testing.assert_frame_equal(current_df, expected_df, check_dtype=False)
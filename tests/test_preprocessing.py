@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+import yaml
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from preprocessing import run_preprocessing
+
+
+def write_catalogue(directory, true_cost):
+    """
+    Writes a catalogue where every item is in the recipe graph, so that mapping item
+    names gives one distinct value per item.
+    """
+    (directory / 'items.csv').write_text(
+        "item_id,name,cost,time,experience,machine\n"
+        "1,Wheat,3,2 min,1,Field\n"
+        "2,Bread,21,5 min,3,Bakery\n"
+        "3,Cake,100,1h,10,Bakery\n"
+    )
+    (directory / 'recipes.csv').write_text(
+        "recipe_id,product,ingredient,quantity\n"
+        "1,Bread,Wheat,3\n"
+        "2,Cake,Bread,2\n"
+        "3,Cake,Wheat,1\n"
+    )
+    (directory / 'treesnbush.csv').write_text("plant_id,item_id,fruit,type,plantprice\n")
+
+    config_file = directory / 'config.yaml'
+    config_file.write_text(yaml.safe_dump({
+        'files': {key: str(directory / file) for key, file in [('items_csv', 'items.csv'),
+                                                                ('recipes_csv', 'recipes.csv'),
+                                                                ('plants_csv', 'treesnbush.csv')]},
+        'true_cost': true_cost,
+        'animal_feed': {},
+        'rare_ingredients': {'grains': {'Wheat': True}},
+        'ignore_machines': ['Field'],
+    }))
+
+    return str(config_file)
+
+
+@pytest.mark.parametrize('true_cost', [False, True])
+def test_every_item_in_recipe_graph(tmp_path, true_cost):
+    _, items_df, _, _ = run_preprocessing(write_catalogue(tmp_path, true_cost))
+    items = items_df.set_index(items_df['name'].astype(str))
+
+    assert items.loc['Bread', 'serial_chain_time'] == 5 + 3 * 2
+    assert items.loc['Cake', 'serial_chain_time'] == 60 + 2 * 11 + 2
+    assert items.loc['Cake', 'rare_ingredients'] == '1 Wheat'
+    assert items.loc['Wheat', 'rare_ingredients'] == ''
+    assert items_df['serial_profit_per_minute'].notna().all()